@@ -0,0 +1,182 @@
+"""
+Адаптивные повторы набора тестов.
+
+Вместо фиксированного числа повторов задания выполняются раундами:
+- пара (модель, тест) повторяется, пока не наберет min_repeats прогонов,
+  а затем - пока 95% доверительный интервал балла или процента правильных ответов
+  шире ±precision (но не больше max_repeats прогонов);
+- после каждого раунда модели, которые уже не могут догнать лидера набора
+  (верхняя граница интервала среднего балла ниже нижней границы лидера),
+  исключаются из оставшихся раундов.
+"""
+import re
+from math import sqrt
+from statistics import mean, stdev
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+from tabulate import tabulate
+
+from scheduler import Job, JobRunner
+
+# Квантили t-распределения Стьюдента для двустороннего 95% интервала, по числу степеней свободы 1..30
+_T_95 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+
+
+@dataclass
+class AdaptiveRepeats:
+    """Настройки адаптивных повторов набора."""
+    min_repeats: int = 2  # Прогонов каждой пары до первой проверки интервала (не меньше 2)
+    max_repeats: int = 10  # Максимум прогонов пары
+    precision: float = 5.0  # Допустимая полуширина интервала, баллов и процентов
+
+
+def parse_repeats_range(value: str) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает диапазон повторов вида "2-10".
+
+    :return: (минимум, максимум) или None, если значение не диапазон
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*[-–]\s*(\d+)\s*", value or "")
+    if not match:
+        return None
+    low, high = int(match.group(1)), int(match.group(2))
+    return min(low, high), max(low, high)
+
+
+def half_width(values: List[float]) -> float:
+    """Полуширина 95% доверительного интервала среднего (inf, если значений меньше двух)."""
+    n = len(values)
+    if n < 2:
+        return float("inf")
+    t = _T_95[n - 2] if n - 1 <= len(_T_95) else 1.96
+    return t * stdev(values) / sqrt(n)
+
+
+class _PairStats:
+    """Итоги прогонов одной пары (модель, тест)."""
+
+    def __init__(self):
+        self.runs = 0  # Выполнено прогонов (включая неудачные)
+        self.scores: List[float] = []
+        self.percents: List[float] = []
+        self.skipped = False  # Тест не выполнялся (модель или файл не найдены) - повторять нет смысла
+
+    def add(self, job: Job) -> None:
+        self.runs += 1
+        result = job.result
+        if result is None:
+            return
+        if result.questions == 0:
+            self.skipped = True
+        elif result.completed:
+            self.scores.append(result.score)
+            self.percents.append(result.percent_correct)
+
+    def converged(self, settings: AdaptiveRepeats) -> bool:
+        return (
+            len(self.scores) >= settings.min_repeats
+            and half_width(self.scores) <= settings.precision
+            and half_width(self.percents) <= settings.precision
+        )
+
+    def needs_run(self, settings: AdaptiveRepeats) -> bool:
+        if self.skipped or self.runs >= settings.max_repeats:
+            return False
+        return self.runs < settings.min_repeats or not self.converged(settings)
+
+
+def _model_estimate(stats: Dict[str, _PairStats], min_repeats: int) -> Optional[Tuple[float, float]]:
+    """
+    Средний балл модели по тестам набора и полуширина его интервала
+    (интервалы тестов считаются независимыми).
+    None, если по какому-либо тесту еще мало прогонов.
+    """
+    pairs = [pair for pair in stats.values() if not pair.skipped]
+    if not pairs or any(len(pair.scores) < min_repeats for pair in pairs):
+        return None
+    score = mean(mean(pair.scores) for pair in pairs)
+    width = sqrt(sum(half_width(pair.scores) ** 2 for pair in pairs)) / len(pairs)
+    return score, width
+
+
+async def run_adaptive_suite(
+    runner: JobRunner,
+    suite: str,
+    models: List[str],
+    tests: List[str],
+    settings: AdaptiveRepeats,
+    config: dict,
+    concurrency: Optional[int] = None,
+) -> List[Job]:
+    """
+    Выполняет набор тестов с адаптивными повторами и отсевом моделей.
+
+    :param runner: Общий исполнитель заданий (ограничения параллельности)
+    :param suite: Заголовок набора
+    :param models: Модели набора
+    :param tests: Тесты набора
+    :param settings: Настройки адаптивных повторов
+    :param config: Конфигурация запросов
+    :param concurrency: Параллельность вопросов внутри теста
+    :return: Все выполненные задания (для подведения стоимости)
+    """
+    min_repeats = max(2, settings.min_repeats)
+    settings = replace(settings, min_repeats=min_repeats, max_repeats=max(min_repeats, settings.max_repeats))
+
+    stats = {model: {test: _PairStats() for test in tests} for model in models}
+    active = list(models)
+    eliminated: Dict[str, str] = {}  # {модель: причина}
+    jobs: List[Job] = []
+
+    while True:
+        round_jobs = [
+            Job(suite, model, test, pair.runs + 1, settings.max_repeats, config, concurrency)
+            for model in active
+            for test, pair in stats[model].items()
+            if pair.needs_run(settings)
+        ]
+        if not round_jobs:
+            break
+        await runner.run_all(round_jobs)
+        jobs += round_jobs
+        if all(job.cancelled for job in round_jobs):
+            break  # Бюджет исчерпан
+        for job in round_jobs:
+            stats[job.model][job.test].add(job)
+
+        # Отсев моделей, которые уже не могут догнать лидера
+        estimates = {model: _model_estimate(stats[model], settings.min_repeats) for model in active}
+        ranked = {model: estimate for model, estimate in estimates.items() if estimate is not None}
+        if len(ranked) < 2:
+            continue
+        leader = max(ranked, key=lambda model: ranked[model][0])
+        leader_score, leader_width = ranked[leader]
+        for model, (score, width) in ranked.items():
+            if model != leader and score + width < leader_score - leader_width:
+                active.remove(model)
+                eliminated[model] = (
+                    f"балл {score:.1f} ± {width:.1f} ниже лидера {leader} {leader_score:.1f} ± {leader_width:.1f}"
+                )
+                print(f"\n[{suite}] Модель {model} исключена из дальнейших повторов: {eliminated[model]}")
+
+    _print_summary(suite, stats, eliminated)
+    return jobs
+
+
+def _print_summary(suite: str, stats: Dict[str, Dict[str, _PairStats]], eliminated: Dict[str, str]) -> None:
+    rows = []
+    for model, tests in stats.items():
+        for test, pair in tests.items():
+            if pair.scores:
+                score = f"{mean(pair.scores):.1f} ± {half_width(pair.scores):.1f}"
+                percent = f"{mean(pair.percents):.1f} ± {half_width(pair.percents):.1f}"
+            else:
+                score = percent = "—"
+            rows.append([model, test, pair.runs, percent, score, "исключена" if model in eliminated else ""])
+    print(f"\nИтоги адаптивных повторов '{suite}' (95% доверительный интервал):")
+    print(tabulate(rows, headers=["Модель", "Тест", "Прогонов", "% верно", "Балл", ""], tablefmt="grid"))
@@ -0,0 +1,104 @@
+"""
+Сквозной бенчмарк: main.py против локального имитатора OpenRouter без задержки ответа.
+
+Во временной папке создаются синтетический тест, конфигурация и test_suites.md,
+имитатор запускается в том же цикле событий, затем main_async выполняет набор.
+Так как имитатор отвечает мгновенно, время на вопрос - это накладные расходы самого тестера
+(HTTP-клиент, разбор, проверка ответа, логи, отчет).
+"""
+import os
+import io
+import json
+import shutil
+import socket
+import asyncio
+import tempfile
+from time import perf_counter
+from contextlib import redirect_stdout
+from typing import Dict
+
+from main import main_async
+from run_settings import RunSettings
+from providers.mock_openrouter import start_mock_server
+from benchmarks.micro import TEMPLATE_REPORT, make_test_markdown
+
+SUITE = """# Набор тестов 1
+## Описание
+Сквозной бенчмарк
+## Разрешить выполнение
+да
+## Конфигурация
+bench
+## Параллельность
+{concurrency}
+## Модели
+bench/model-a, bench/model-b
+## Тесты
+bench_e2e
+"""
+
+CONFIG = {
+    "param": {"temperature": 0, "max_tokens": None},
+    "response_format": None,
+    "extra_body": None,
+    "prompt_cache": False,
+}
+
+MOCK_CONFIG = {"latency": {"type": "fixed", "value": 0}, "models": {}}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _run(directory: str) -> float:
+    port = _free_port()
+    server = await start_mock_server(port=port, config=MOCK_CONFIG, tests_dir="tests")
+    settings = RunSettings(
+        base_url=f"http://127.0.0.1:{port}/api/v1",
+        catalog_cache_path=os.path.join(directory, "cache", "models.json"),
+        judge_cache_path=os.path.join(directory, "cache", "judge.json"),
+        metrics_json_path=None,
+        metrics_prometheus_path=None,
+        results_db_path=None,
+        journal_path=None,
+        cost_preflight=False,
+        max_parallel_jobs=2,
+    )
+    try:
+        start = perf_counter()
+        with redirect_stdout(io.StringIO()):
+            await main_async(settings)
+        return perf_counter() - start
+    finally:
+        await server.cleanup()
+
+
+def run_e2e(questions: int, concurrency: int = 1) -> Dict[str, float]:
+    """
+    Выполняет сквозной прогон (2 модели x 1 тест из questions вопросов).
+
+    :return: {"seconds": время запуска, "per_question": накладные расходы на вопрос, сек}
+    """
+    directory = tempfile.mkdtemp(prefix="bench_e2e_")
+    cwd = os.getcwd()
+    try:
+        os.makedirs(os.path.join(directory, "tests"))
+        os.makedirs(os.path.join(directory, "configs"))
+        os.makedirs(os.path.join(directory, "report"))
+        shutil.copyfile(TEMPLATE_REPORT, os.path.join(directory, "report", "report.xlsx"))
+        with open(os.path.join(directory, "tests", "bench_e2e.md"), "w", encoding="utf-8") as f:
+            f.write(make_test_markdown(questions))
+        with open(os.path.join(directory, "configs", "bench.json"), "w", encoding="utf-8") as f:
+            json.dump(CONFIG, f)
+        with open(os.path.join(directory, "test_suites.md"), "w", encoding="utf-8") as f:
+            f.write(SUITE.format(concurrency=concurrency))
+
+        os.chdir(directory)
+        seconds = asyncio.run(_run(directory))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+    return {"seconds": seconds, "per_question": seconds / (2 * questions)}
@@ -0,0 +1,158 @@
+"""
+Микробенчмарки горячих функций тестера на синтетических данных разного размера.
+
+Каждый случай - функция, которая готовит данные и возвращает вызываемый объект без аргументов;
+замеряется только вызов. Размеры задаются списком SIZES (в режиме --quick - только первые два).
+"""
+import os
+import json
+import random
+import asyncio
+import shutil
+import tempfile
+from typing import Callable, Dict, List, Tuple
+
+from func import get_section
+from md_parser import parse_test_file
+from comparison_settings import ComparisonSettings
+from report.check import compare_async
+from report.calc_ball import calculate_model_score
+from report.to_excel import append_record_to_excel
+
+TEMPLATE_REPORT = "report/report.xlsx"
+
+
+def make_test_markdown(questions: int, seed: int = 1) -> str:
+    """Файл теста в формате tests/*.md с заданным числом вопросов (ответы - списки JSON)."""
+    rng = random.Random(seed)
+    parts = [
+        "# Описание\nСинтетический тест\n",
+        "# Роль\nТы — парсер текста.\n",
+        "# Промпт\nИзвлеки числа с единицами измерения.\n",
+        "# Настройки\n## Допуск при сравнении чисел\n0.01\n## Сравнение строк в списке\nСовпадение 100\n",
+        "# Тесты",
+    ]
+    for n in range(1, questions + 1):
+        answer = [{"value": rng.randint(1, 1000), "unit": rng.choice(["метр", "рубль", "градус"])} for _ in range(3)]
+        parts.append(f"## Вопрос {n}\nСкорость {rng.randint(1, 200)} километров в час, номер {n}.")
+        parts.append(f"## Ответ {n}\n{json.dumps(answer, ensure_ascii=False, indent=4)}")
+    return "\n".join(parts) + "\n"
+
+
+def make_json_answer(keys: int, seed: int = 2) -> dict:
+    """Словарь ответа: keys полей (числа, строки и вложенные словари)."""
+    rng = random.Random(seed)
+    result = {}
+    for n in range(keys):
+        kind = n % 3
+        if kind == 0:
+            result[f"number_{n}"] = rng.uniform(0, 1000)
+        elif kind == 1:
+            result[f"text_{n}"] = f"значение поля номер {n}"
+        else:
+            result[f"nested_{n}"] = {"value": rng.randint(0, 100), "unit": "метр"}
+    return result
+
+
+def make_list_answer(length: int, seed: int = 3) -> Tuple[list, list]:
+    """Эталонный список словарей и тот же список в другом порядке (ответ модели)."""
+    rng = random.Random(seed)
+    control = [{"value": n, "unit": f"единица {n % 17}", "name": f"элемент {n}"} for n in range(length)]
+    test = list(control)
+    rng.shuffle(test)
+    return control, test
+
+
+# --- Случаи --- #
+
+def bench_get_section(questions: int) -> Callable[[], object]:
+    """func.get_section: секция "Тесты" и последний вопрос в ней."""
+    text = make_test_markdown(questions)
+
+    def run():
+        tests = get_section(text, "Тесты")
+        return get_section(tests, f"Вопрос {questions}", 2)
+    return run
+
+
+def bench_parse_test_file(questions: int) -> Callable[[], object]:
+    """md_parser.parse_test_file: полный разбор файла теста."""
+    text = make_test_markdown(questions)
+    return lambda: parse_test_file(text)
+
+
+def bench_compare_dict(keys: int) -> Callable[[], object]:
+    """report.check.compare: словарь ответа из keys полей."""
+    control = make_json_answer(keys)
+    test = json.loads(json.dumps(control))
+    settings = ComparisonSettings()
+    return _compare_runner(control, test, settings)
+
+
+def bench_compare_list(length: int) -> Callable[[], object]:
+    """report.check.compare: список словарей длины length в другом порядке."""
+    control, test = make_list_answer(length)
+    settings = ComparisonSettings()
+    return _compare_runner(control, test, settings)
+
+
+def _compare_runner(control, test, settings: ComparisonSettings, calls: int = 10) -> Callable[[], object]:
+    """
+    Сравнение в одном цикле событий (calls сравнений на вызов, чтобы не замерять создание цикла).
+    Время делится на calls при выводе - см. CASES.
+    """
+    async def many():
+        for _ in range(calls):
+            result = await compare_async(control, test, settings)
+        return result
+    return lambda: asyncio.run(many())
+
+
+def bench_calc_ball(calls: int) -> Callable[[], object]:
+    """report.calc_ball.calculate_model_score: calls расчетов."""
+    rng = random.Random(4)
+    inputs = [(rng.randint(1, 100), rng.uniform(0.1, 5.0)) for _ in range(calls)]
+
+    def run():
+        total = 0
+        for right, latency in inputs:
+            total += calculate_model_score(100, right, latency)
+        return total
+    return run
+
+
+# Временные файлы отчетов, удаляются в cleanup()
+_temp_dirs: List[str] = []
+
+
+def bench_append_excel(rows: int) -> Callable[[], object]:
+    """report.to_excel.append_record_to_excel: запись в отчет, где уже rows строк."""
+    from openpyxl import load_workbook
+
+    directory = tempfile.mkdtemp(prefix="bench_xlsx_")
+    _temp_dirs.append(directory)
+    path = os.path.join(directory, "report.xlsx")
+    shutil.copyfile(TEMPLATE_REPORT, path)
+    wb = load_workbook(path)
+    ws = wb.active
+    for n in range(rows):
+        ws.append(["01.01.2025 00:00:00", f"vendor/model-{n % 20}", "get_metadata", 0.5, 90, 80, 0.001])
+    wb.save(path)
+    return lambda: append_record_to_excel("vendor/model", "bench", 0.5, 90, 80, 0.001, file_path=path)
+
+
+def cleanup() -> None:
+    for directory in _temp_dirs:
+        shutil.rmtree(directory, ignore_errors=True)
+    _temp_dirs.clear()
+
+
+# {имя случая: (фабрика, размеры, делитель времени вызова)}
+CASES: Dict[str, Tuple[Callable[[int], Callable[[], object]], List[int], Callable[[int], int]]] = {
+    "func.get_section": (bench_get_section, [10, 100, 1000], lambda size: 1),
+    "md_parser.parse_test_file": (bench_parse_test_file, [10, 100, 1000], lambda size: 1),
+    "check.compare[dict]": (bench_compare_dict, [10, 100, 1000], lambda size: 10),
+    "check.compare[list]": (bench_compare_list, [10, 50, 200], lambda size: 10),
+    "calc_ball.calculate_model_score": (bench_calc_ball, [1000], lambda size: size),
+    "to_excel.append_record_to_excel": (bench_append_excel, [100, 1000, 10000], lambda size: 1),
+}
@@ -0,0 +1,149 @@
+"""
+Запуск бенчмарков тестера и сравнение с базовыми замерами.
+
+    python -m benchmarks.run                   # все бенчмарки, сравнение с базой
+    python -m benchmarks.run --quick           # меньшие размеры, быстрее
+    python -m benchmarks.run --only compare    # только случаи, в имени которых есть "compare"
+    python -m benchmarks.run --save-baseline   # сохранить замеры как базовые
+
+Время вызова - минимум из нескольких серий (минимум меньше всего зависит от фоновой нагрузки).
+Случай считается регрессией, если он медленнее базового замера больше чем на threshold.
+При регрессии скрипт завершается с кодом 1.
+"""
+import sys
+import json
+import timeit
+import argparse
+import platform
+from datetime import datetime
+from typing import Dict, Optional
+
+from tabulate import tabulate
+
+from benchmarks import micro
+from benchmarks.e2e import run_e2e
+
+BASELINE_PATH = "benchmarks/baseline.json"
+E2E_SIZES = [20, 100]
+
+
+def measure(func, repeat: int = 5, min_time: float = 0.2) -> float:
+    """Время одного вызова, сек (минимум по repeat сериям по ~min_time сек)."""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_micro(only: Optional[str], quick: bool, repeat: int) -> Dict[str, float]:
+    results = {}
+    for name, (factory, sizes, divisor) in micro.CASES.items():
+        if only and only not in name:
+            continue
+        for size in sizes[:2] if quick else sizes:
+            key = f"{name}/{size}"
+            print(f"  {key}...", end="", flush=True)
+            try:
+                results[key] = measure(factory(size), repeat=repeat) / divisor(size)
+            finally:
+                micro.cleanup()
+            print(f" {_format_time(results[key])}")
+    return results
+
+
+def run_end_to_end(only: Optional[str], quick: bool, repeat: int) -> Dict[str, float]:
+    """Накладные расходы тестера на вопрос (минимум по repeat запускам)."""
+    results = {}
+    name = "e2e.main_per_question"
+    if only and only not in name:
+        return results
+    for size in E2E_SIZES[:1] if quick else E2E_SIZES:
+        key = f"{name}/{size}"
+        print(f"  {key}...", end="", flush=True)
+        results[key] = min(run_e2e(size)["per_question"] for _ in range(max(1, repeat // 2)))
+        print(f" {_format_time(results[key])}")
+    return results
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} с"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} мс"
+    return f"{seconds * 1e6:.2f} мкс"
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("results", {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path: str, results: Dict[str, float]) -> None:
+    baseline = load_baseline(path)
+    baseline.update(results)
+    data = {
+        "saved_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": baseline,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def report(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> int:
+    """Выводит таблицу сравнения с базой. Возвращает количество регрессий."""
+    rows = []
+    regressions = 0
+    for key, seconds in results.items():
+        base = baseline.get(key)
+        if base is None:
+            rows.append([key, _format_time(seconds), "—", "—", "нет базы"])
+            continue
+        change = seconds / base - 1
+        status = "ок"
+        if change > threshold:
+            status = "РЕГРЕССИЯ"
+            regressions += 1
+        elif change < -threshold:
+            status = "быстрее"
+        rows.append([key, _format_time(seconds), _format_time(base), f"{change * 100:+.1f}%", status])
+    print(tabulate(rows, headers=["Случай", "Время", "База", "Изменение", ""], tablefmt="outline", disable_numparse=True))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки тестера")
+    parser.add_argument("--only", help="выполнить только случаи, в имени которых есть эта строка")
+    parser.add_argument("--quick", action="store_true", help="только малые размеры")
+    parser.add_argument("--repeat", type=int, default=5, help="серий замеров на случай")
+    parser.add_argument("--no-e2e", action="store_true", help="без сквозного бенчмарка")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимое замедление (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="файл базовых замеров")
+    parser.add_argument("--save-baseline", action="store_true", help="сохранить замеры как базовые")
+    args = parser.parse_args()
+
+    print("Микробенчмарки:")
+    results = run_micro(args.only, args.quick, args.repeat)
+    if not args.no_e2e:
+        print("Сквозной бенчмарк (main.py + имитатор OpenRouter, накладные расходы на вопрос):")
+        results.update(run_end_to_end(args.only, args.quick, args.repeat))
+
+    baseline = load_baseline(args.baseline)
+    print()
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Базовые замеры сохранены в {args.baseline}")
+    elif regressions:
+        print(f"Регрессий: {regressions} (порог {args.threshold * 100:.0f}%)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Предварительная оценка стоимости запуска и ограничение расходов.
+
+Оценка: токены считаются приближенно, без токенизатора провайдера - около 4 байт UTF-8
+на токен (для латиницы это ~4 символа, для кириллицы ~2), плюс служебные токены сообщений.
+Ввод - роль, промпт и вопрос теста; вывод - длина эталонного ответа
+(но не больше max_tokens из параметров конфигурации). Цены берутся из каталога моделей.
+Кэш промпта и проверки моделью-валидатором в оценке не учитываются.
+
+Бюджет: перед каждым вопросом его оценочная стоимость резервируется в бюджете набора
+и в общем бюджете запуска, после ответа резерв заменяется фактической стоимостью.
+Если провайдер дублирует медленные запросы (providers/hedging.py), резервируется
+стоимость двух запросов. Проверки моделью-валидатором в бюджет не входят: они общие
+для всех наборов (объединяются в пакеты) и оплачиваются вне бюджета.
+Если резерв не помещается из-за резервов выполняющихся вопросов, вопрос ждет их завершения.
+Если он не помещается и без них, вопрос не задается, а ожидающие задания
+этого набора (или всех наборов, если исчерпан общий бюджет) отменяются.
+"""
+import asyncio
+from math import ceil
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from tabulate import tabulate
+
+from md_parser import load_test_file
+from report.results_db import config_hash
+
+BYTES_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4  # Служебных токенов на одно сообщение
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Приближенное количество токенов в тексте."""
+    if not text:
+        return 0
+    return ceil(len(text.encode("utf-8")) / BYTES_PER_TOKEN)
+
+
+def estimate_question(role: str, prompt: str, question: str, answer: str, max_tokens: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Оценка токенов одного вопроса.
+
+    :return: (токенов ввода, токенов вывода)
+    """
+    tokens_input = estimate_tokens(role) + estimate_tokens(prompt) + estimate_tokens(question) + 2 * MESSAGE_OVERHEAD
+    tokens_output = estimate_tokens(answer) + MESSAGE_OVERHEAD
+    if max_tokens:
+        tokens_output = min(tokens_output, max_tokens)
+    return tokens_input, tokens_output
+
+
+@dataclass
+class Estimate:
+    """Оценка одного прогона теста."""
+    tokens_input: int = 0
+    tokens_output: int = 0
+    cost: float = 0.0
+
+
+def estimate_iteration(model: str, test: str, config: dict, catalog) -> Optional[Estimate]:
+    """
+    Оценка стоимости одного прогона теста на модели.
+
+    :param catalog: Каталог моделей (providers/catalog.py или реестр провайдеров providers/registry.py)
+    :return: Оценка или None, если модели или файла теста нет
+    """
+    if catalog.get(model) is None:
+        return None
+    try:
+        test_file = load_test_file(f"tests/{test}.md")
+    except FileNotFoundError:
+        return None
+    pricing = catalog.pricing(model)
+    max_tokens = (config.get("param") or {}).get("max_tokens")
+    estimate = Estimate()
+    for item in test_file.questions:
+        tokens_input, tokens_output = estimate_question(
+            test_file.role, test_file.prompt, item.question, item.answer or "", max_tokens
+        )
+        estimate.tokens_input += tokens_input
+        estimate.tokens_output += tokens_output
+    estimate.cost = estimate.tokens_input * pricing["prompt"] + estimate.tokens_output * pricing["completion"]
+    return estimate
+
+
+def print_preflight(plan: List[Tuple[str, str, str, dict, int]], catalog) -> float:
+    """
+    Выводит оценку стоимости запуска по наборам и моделям.
+
+    :param plan: [(набор, модель, тест, конфигурация, прогонов), ...]
+    :param catalog: Каталог моделей (или реестр провайдеров)
+    :return: Оценка общей стоимости
+    """
+    rows = []
+    suite_totals: Dict[str, float] = {}
+    estimates: Dict[Tuple[str, str, str], Optional[Estimate]] = {}
+    for suite, model, test, config, runs in plan:
+        key = (model, test, config_hash(config))
+        if key not in estimates:
+            estimates[key] = estimate_iteration(model, test, config, catalog)
+        estimate = estimates[key]
+        if estimate is None:
+            rows.append([suite, model, test, runs, "—", "—", "не найдено"])
+            continue
+        cost = estimate.cost * runs
+        suite_totals[suite] = suite_totals.get(suite, 0.0) + cost
+        rows.append([suite, model, test, runs, estimate.tokens_input * runs, estimate.tokens_output * runs, f"${cost:.6f}"])
+
+    total = sum(suite_totals.values())
+    print("\nОЦЕНКА СТОИМОСТИ (приблизительно, без проверок валидатором):")
+    print(tabulate(rows, headers=["Набор", "Модель", "Тест", "Прогонов", "Токенов Ввод", "Токенов Вывод", "Цена"],
+                   tablefmt="outline", disable_numparse=True))
+    for suite, cost in suite_totals.items():
+        print(f"  - {suite}: ${cost:.6f}")
+    print(f"  - Всего: ${total:.6f}")
+    return total
+
+
+class Budget:
+    """
+    Бюджет в долларах. Расход учитывается с резервированием,
+    поэтому параллельные запросы не выходят за предел.
+    """
+
+    def __init__(self, name: str, limit: Optional[float] = None):
+        """
+        :param name: Название для сообщений
+        :param limit: Предел, $ (None - без ограничения)
+        """
+        self.name = name
+        self.limit = limit
+        self.spent = 0.0
+        self.reserved = 0.0
+        self.stopped = False  # Вопрос уже не поместился в бюджет - новые задания не начинаются
+        self._waiters: List[asyncio.Future] = []
+
+    def fits(self, amount: float) -> bool:
+        return self.limit is None or self.spent + self.reserved + amount <= self.limit
+
+    def stop(self) -> None:
+        self.stopped = True
+        print(f"Бюджет '{self.name}' исчерпан: потрачено ${self.spent:.6f} из ${self.limit:.6f}")
+        self.wake()
+
+    async def wait(self) -> None:
+        """Ждет изменения расхода или резерва."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        await future
+
+    def wake(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for future in waiters:
+            if not future.done():
+                future.set_result(None)
+
+
+class BudgetGuard:
+    """Бюджеты, из которых оплачивается одно задание (бюджет набора и общий бюджет)."""
+
+    def __init__(self, budgets: List[Budget]):
+        self.budgets = [budget for budget in budgets if budget.limit is not None]
+
+    @property
+    def exhausted(self) -> Optional[Budget]:
+        """Исчерпанный бюджет (None - можно продолжать)."""
+        for budget in self.budgets:
+            if budget.stopped:
+                return budget
+        return None
+
+    async def reserve(self, amount: float) -> bool:
+        """
+        Резервирует оценочную стоимость вопроса (при необходимости дожидаясь
+        завершения выполняющихся вопросов). False - вопрос не помещается в бюджет.
+        """
+        while self.exhausted is None:
+            blocking = next((budget for budget in self.budgets if not budget.fits(amount)), None)
+            if blocking is None:
+                for budget in self.budgets:
+                    budget.reserved += amount
+                return True
+            if blocking.reserved <= 0 or blocking.spent + amount > blocking.limit:
+                blocking.stop()
+                return False
+            await blocking.wait()
+        return False
+
+    def settle(self, reserved: float, actual: float) -> None:
+        """Заменяет резерв фактической стоимостью."""
+        for budget in self.budgets:
+            budget.reserved -= reserved
+            budget.spent += actual
+            budget.wake()
+
+
+class RunBudget:
+    """Общий бюджет запуска и бюджеты наборов."""
+
+    def __init__(self, limit: Optional[float] = None, suite_limits: Optional[Dict[str, float]] = None):
+        """
+        :param limit: Общий бюджет запуска, $ (None - без ограничения)
+        :param suite_limits: {заголовок набора: бюджет, $}
+        """
+        self.total = Budget("весь запуск", limit)
+        self.suites = {suite: Budget(suite, suite_limit) for suite, suite_limit in (suite_limits or {}).items()}
+
+    def guard(self, suite: str) -> BudgetGuard:
+        return BudgetGuard([self.suites.get(suite, Budget(suite)), self.total])
@@ -1,6 +1,8 @@
 from tabulate import tabulate
 from typing import List, Optional
 
+from result_log import get_result_log, log_file_name
+
 
 def get_section(markdown_text: str, heading: str, level: int = 1) -> Optional[str]:
     """
@@ -44,12 +46,19 @@ def get_section(markdown_text: str, heading: str, level: int = 1) -> Optional[st
 
 def output(text: str, model: str):
     """
-    Выводит текст в файл
+    Выводит текст в файл.
+    Если задан общий писатель логов (result_log.set_result_log), текст ставится
+    в его очередь и записывается фоновым потоком целиком, одним блоком.
     :param text: Текст для вывода
     :param model: Название модели, для получения имени файла
     :return:
     """
+    writer = get_result_log()
+    if writer is not None:
+        writer.write(text, model)
+        return
+
     # Запись в файл
-    with open(f"result/{model.replace("/", "_")}.txt", "a", encoding="utf-8") as f:
+    with open(f"result/{log_file_name(model)}", "a", encoding="utf-8") as f:
         f.write(text + "\n")
 
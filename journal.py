@@ -0,0 +1,163 @@
+"""
+Журнал выполнения запуска (cache/journal.jsonl) для продолжения после сбоя.
+
+Каждый завершенный вопрос и каждый завершенный прогон теста дописывается в журнал
+отдельной JSON-строкой. Запись и сброс на диск (fsync) идут в фоновом потоке, чтобы
+не задерживать цикл событий и замеры задержек: записи, накопившиеся за время
+предыдущего сброса, сбрасываются на диск вместе. Если запуск прервался
+(обрыв сети, Ctrl-C, сон ноутбука), `python3 main.py --resume` читает журнал:
+завершенные прогоны не выполняются (их итоги и стоимость берутся из журнала),
+а в незавершенных прогонах модели задаются только вопросы, на которые еще нет ответа.
+
+Прогон определяется моделью, тестом, номером повтора, хэшем конфигурации
+и хэшем файла теста: если тест или конфигурация изменились, прогон выполняется заново.
+"""
+import os
+import json
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, TextIO, Union
+
+from report.results_db import config_hash, file_hash
+
+
+def job_key(model: str, test: str, repeat: int, config: dict) -> str:
+    """Ключ прогона в журнале."""
+    return f"{model}|{test}|{repeat}|{config_hash(config)}|{file_hash(f'tests/{test}.md') or ''}"
+
+
+class RunJournal:
+    """
+    Журнал с упреждающей записью и фоновым потоком записи. Запись потокобезопасна.
+
+    Записи: {"type": "start"}, {"type": "question", "key", "number", "result"},
+    {"type": "iteration", "key", "result"}, {"type": "finish"}.
+    """
+
+    def __init__(self, file_path: str = "cache/journal.jsonl", resume: bool = False):
+        """
+        :param file_path: Путь к файлу журнала
+        :param resume: Продолжить прерванный запуск (иначе журнал начинается заново)
+        """
+        self.file_path = file_path
+        self._questions: Dict[str, Dict[int, dict]] = {}
+        self._iterations: Dict[str, dict] = {}
+        self.resume = resume
+        self.found = False  # Журнал прерванного запуска найден
+        self.finished = False  # Последний записанный запуск завершился полностью
+        self._file: Optional[TextIO] = None
+        self._queue: "queue.Queue[Union[str, threading.Event, None]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        if resume:
+            self._load()
+
+    def start(self) -> "RunJournal":
+        """Открывает журнал для записи (при resume - продолжает существующий)."""
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        self._file = open(self.file_path, "a" if self.resume else "w", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="run-journal", daemon=True)
+        self._thread.start()
+        self._append({"type": "start", "time": datetime.now().isoformat(timespec="seconds"), "resume": self.resume})
+        return self
+
+    def _load(self) -> None:
+        try:
+            f = open(self.file_path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        self.found = True
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Строка, недописанная при сбое
+                kind = record.get("type")
+                if kind == "question":
+                    self._questions.setdefault(record["key"], {})[record["number"]] = record["result"]
+                elif kind == "iteration":
+                    self._iterations[record["key"]] = record["result"]
+                self.finished = kind == "finish"
+
+    def _append(self, record: dict) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @property
+    def restored(self) -> int:
+        """Сколько завершенных прогонов восстановлено из журнала."""
+        return len(self._iterations)
+
+    def question(self, key: str, number: int) -> Optional[dict]:
+        """Результат вопроса из журнала (None - вопрос еще не выполнен)."""
+        return self._questions.get(key, {}).get(number)
+
+    def iteration(self, key: str) -> Optional[dict]:
+        """Итоги прогона из журнала (None - прогон не завершен)."""
+        return self._iterations.get(key)
+
+    def add_question(self, key: str, number: int, result: dict) -> None:
+        self._append({"type": "question", "key": key, "number": number, "result": result})
+
+    def add_iteration(self, key: str, result: dict) -> None:
+        self._append({"type": "iteration", "key": key, "result": result})
+
+    def sync(self) -> None:
+        """Дожидается, пока все записи из очереди будут сброшены на диск."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self, finished: bool = False) -> None:
+        """Записывает очередь и закрывает журнал. finished - запуск завершен полностью, продолжать нечего."""
+        if finished:
+            self._append({"type": "finish", "time": datetime.now().isoformat(timespec="seconds")})
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join()
+
+    # --- Фоновый поток --- #
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Union[str, threading.Event, None]] = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [item for item in batch if isinstance(item, str)]
+            if lines:
+                try:
+                    self._file.write("".join(lines))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except OSError as e:
+                    print(f"Ошибка записи журнала '{self.file_path}': {e}")
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                self._file.close()
+                self._file = None
+                return
+
+
+# Общий журнал на время запуска main.py (задается через set_journal)
+_journal: Optional[RunJournal] = None
+
+
+def set_journal(journal: Optional[RunJournal]) -> None:
+    """Задает общий журнал. None - журнал не ведется."""
+    global _journal
+    _journal = journal
+
+
+def get_journal() -> Optional[RunJournal]:
+    return _journal
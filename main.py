@@ -1,65 +1,110 @@
 import json
-from func import get_section
-from tester_engine import run_test_iteration
+import asyncio
+import argparse
+from md_parser import load_suites
+from scheduler import JobRunner, expand_suite
+from adaptive import AdaptiveRepeats, parse_repeats_range, run_adaptive_suite
+from run_settings import RunSettings, load_run_settings
+from providers.catalog import ModelCatalog
+from providers.response_cache import ResponseCache
+from providers.throttle import RetryPolicy, Throttle
+from providers.hedging import HedgePolicy
+from report.judge import BatchJudge, VerdictCache, set_judge
+from report.check import VerdictMemo, set_verdict_memo
+from report.to_excel import ExcelReportSink, set_report_sink
+from report.metrics import LatencyRecorder, set_metrics
+from report.results_db import ResultsDB, get_results_db, set_results_db
+from result_log import ResultLogWriter, set_result_log
+from journal import RunJournal, set_journal
+from budget import RunBudget, print_preflight
+from providers.open_router import API_KEY, OpenRouterClient, set_catalog, set_shared_client
+from providers.registry import build_registry, get_registry, set_registry
 
 
-def main():
+async def run_suites(run_settings: RunSettings, estimate_only: bool = False):
     """
-    Главный управляющий скрипт.
     Читает `test_suites.md`, парсит его и запускает разрешенные наборы тестов.
+    Все задания (модель, тест, повтор) всех наборов выполняются параллельно
+    через планировщик, а стоимость подводится после их завершения.
+    Наборы с диапазоном повторов ("2-10") выполняются адаптивно (см. adaptive.py)
+    одновременно с остальными, с общими ограничениями параллельности.
+    В режиме incremental задания с неизменными конфигурацией и файлом теста
+    не выполняются, их итоги берутся из базы результатов.
+    Перед выполнением выводится оценка стоимости (при estimate_only - только она).
+    Расходы ограничиваются общим бюджетом (budget_usd) и бюджетами наборов (## Бюджет).
     """
     try:
-        with open("test_suites.md", "r", encoding="utf-8") as f:
-            content = f.read()
+        suites = load_suites("test_suites.md")
     except FileNotFoundError:
         print("Ошибка: Не найден файл наборов тестов 'test_suites.md'.")
         return
 
-    # --- Инициализация общих счетчиков ---
-    grand_total_cost = 0
-    model_costs = {}
+    if not suites:
+        print("В файле 'test_suites.md' не найдено ни одного набора тестов.")
 
-    suite_counter = 1
-    while True:
-        suite_heading = f"Набор тестов {suite_counter}"
-        suite_text = get_section(content, suite_heading, level=1)
-
-        if suite_text is None:
-            if suite_counter == 1:
-                print("В файле 'test_suites.md' не найдено ни одного набора тестов.")
-            break
+    # --- Сбор заданий всех наборов ---
+    suite_jobs = {}  # {заголовок набора: [задания]}
+    adaptive_suites = {}  # {заголовок набора: параметры run_adaptive_suite}
+    suite_budgets = {}  # {заголовок набора: бюджет, $}
 
+    for suite in suites:
+        suite_heading = suite.heading
         print(f"\n{'='*20} Обработка: {suite_heading} {'='*20}")
-        suite_total_cost = 0
 
         try:
             # Парсим детали набора
-            description = get_section(suite_text, "Описание", 2).strip()
-            allow_execution = get_section(suite_text, "Разрешить выполнение", 2).strip().lower()
+            description = suite.get("Описание").strip()
+            allow_execution = suite.get("Разрешить выполнение").strip().lower()
 
             print(f"Описание: {description}")
 
             if allow_execution != "да":
                 print("Статус: Пропущен (выполнение не разрешено)")
-                suite_counter += 1
                 continue
 
             print("Статус: Выполняется")
 
-            config_filename = get_section(suite_text, "Конфигурация", 2).strip()
-            models_str = get_section(suite_text, "Модели", 2).strip()
-            tests_str = get_section(suite_text, "Тесты", 2).strip()
+            config_filename = suite.get("Конфигурация").strip()
+            models_str = suite.get("Модели").strip()
+            tests_str = suite.get("Тесты").strip()
 
-            # Парсим количество повторов, по умолчанию 1
+            # Парсим количество повторов, по умолчанию 1. Диапазон "мин-макс" - адаптивные повторы
             repeats = 1
-            repeats_str = get_section(suite_text, "Повторы", 2)
-            if repeats_str:
+            adaptive = None
+            repeats_str = suite.get("Повторы")
+            repeats_range = parse_repeats_range(repeats_str)
+            if repeats_range:
+                adaptive = AdaptiveRepeats(*repeats_range)
+                precision_str = suite.get("Точность")
+                if precision_str:
+                    try:
+                        adaptive.precision = float(precision_str.strip().replace(",", "."))
+                    except ValueError:
+                        print(f"Предупреждение: неверное значение в поле 'Точность'. Используется значение по умолчанию ({adaptive.precision:g}).")
+            elif repeats_str:
                 try:
                     repeats = int(repeats_str.strip())
                 except (ValueError, TypeError):
                     print("Предупреждение: неверное значение в поле 'Повторы'. Используется значение по умолчанию (1).")
                     repeats = 1
 
+            # Параллельность вопросов внутри теста (переопределяет "concurrency" из конфигурации)
+            concurrency = None
+            concurrency_str = suite.get("Параллельность")
+            if concurrency_str:
+                try:
+                    concurrency = int(concurrency_str.strip())
+                except (ValueError, TypeError):
+                    print("Предупреждение: неверное значение в поле 'Параллельность'. Используется значение из конфигурации.")
+
+            # Бюджет набора, $
+            budget_str = suite.get("Бюджет")
+            if budget_str:
+                try:
+                    suite_budgets[suite_heading] = float(budget_str.strip().lstrip("$").replace(",", "."))
+                except ValueError:
+                    print("Предупреждение: неверное значение в поле 'Бюджет'. Набор выполняется без ограничения расходов.")
+
             # Загружаем файл конфигурации
             with open(f"configs/{config_filename}.json", "r", encoding="utf-8") as cfg_f:
                 config = json.load(cfg_f)
@@ -71,24 +116,21 @@ def main():
             print(f"  Конфигурация: {config_filename}.json")
             print(f"  Модели для теста: {', '.join(models)}")
             print(f"  Файлы тестов: {"".join(tests)}")
-            if repeats > 1:
+            if adaptive:
+                print(f"  Адаптивные повторы: от {adaptive.min_repeats} до {adaptive.max_repeats}, точность ±{adaptive.precision:g}")
+            elif repeats > 1:
                 print(f"  Количество повторов: {repeats}")
+            if concurrency:
+                print(f"  Параллельных запросов: {concurrency}")
+            if suite_heading in suite_budgets:
+                print(f"  Бюджет: ${suite_budgets[suite_heading]:g}")
 
-            # Запускаем итерации
-            for model in models:
-                for test in tests:
-                    print(f"\n--- Тестирование. Модель: {model}, Тест: {test}.md ---")
-                    for i in range(repeats):
-                        # Формируем заголовок с указанием повтора, если их больше одного
-                        repeat_header = f" (Повтор {i + 1}/{repeats})" if repeats > 1 else ""
-                        print(f"\n--- Запуск{repeat_header} ---")
-                        run_cost = run_test_iteration(model, test, config)
-                        suite_total_cost += run_cost
-                        grand_total_cost += run_cost
-                        model_costs[model] = model_costs.get(model, 0) + run_cost
-                    print(f"--- Все повторы для теста {test} завершены ---")
-            
-            print(f"\nСтоимость выполнения набора '{suite_heading}': ${suite_total_cost:.10f}".rstrip("0").rstrip("."))
+            # Разворачиваем набор в задания (модель, тест, повтор)
+            if adaptive:
+                suite_jobs[suite_heading] = []  # Заполняется по мере выполнения
+                adaptive_suites[suite_heading] = (models, tests, adaptive, config, concurrency)
+            else:
+                suite_jobs[suite_heading] = expand_suite(suite_heading, models, tests, repeats, config, concurrency)
 
         except AttributeError as e:
             print(f"Ошибка: не удалось разобрать структуру набора '{suite_heading}'. {e}")
@@ -99,8 +141,69 @@ def main():
             print(f"Ошибка: не удалось прочитать JSON из файла конфигурации -> {e}")
         except Exception as e:
             print(f"Произошла непредвиденная ошибка при обработке набора '{suite_heading}': {e}")
-        
-        suite_counter += 1
+
+    all_jobs = [job for jobs in suite_jobs.values() for job in jobs]
+
+    # --- Оценка стоимости (адаптивные наборы - по максимуму повторов) ---
+    if (run_settings.cost_preflight or estimate_only) and (all_jobs or adaptive_suites):
+        runs = {}  # {(набор, модель, тест): (конфигурация, прогонов)}
+        for job in all_jobs:
+            config, count = runs.get((job.suite, job.model, job.test), (job.config, 0))
+            runs[(job.suite, job.model, job.test)] = (config, count + 1)
+        for heading, (models, tests, adaptive, config, _) in adaptive_suites.items():
+            for model in models:
+                for test in tests:
+                    runs[(heading, model, test)] = (config, adaptive.max_repeats)
+        plan = [(suite, model, test, config, count) for (suite, model, test), (config, count) in runs.items()]
+        projected = await asyncio.to_thread(print_preflight, plan, get_registry())
+        if run_settings.budget_usd is not None and projected > run_settings.budget_usd:
+            print(f"Предупреждение: оценка стоимости превышает бюджет запуска ${run_settings.budget_usd:g}, "
+                  "часть заданий будет отменена.")
+    if estimate_only:
+        return
+
+    budget = None
+    if run_settings.budget_usd is not None or suite_budgets:
+        budget = RunBudget(run_settings.budget_usd, suite_budgets)
+
+    # --- Параллельное выполнение всех заданий ---
+    if all_jobs or adaptive_suites:
+        runner = JobRunner(
+            max_parallel=run_settings.max_parallel_jobs,
+            per_model_parallel=run_settings.per_model_parallel_jobs,
+            model_limits=run_settings.model_parallel_jobs,
+            results_db=get_results_db() if run_settings.incremental else None,
+            budget=budget,
+        )
+        adaptive_header = f", адаптивных наборов: {len(adaptive_suites)}" if adaptive_suites else ""
+        print(f"\n{'='*20} Выполнение заданий: {len(all_jobs)}{adaptive_header} {'='*20}")
+
+        async def run_adaptive(suite_heading, models, tests, adaptive, config, concurrency):
+            suite_jobs[suite_heading] = await run_adaptive_suite(
+                runner, suite_heading, models, tests, adaptive, config, concurrency
+            )
+
+        await asyncio.gather(
+            runner.run_all(all_jobs),
+            *(run_adaptive(heading, *params) for heading, params in adaptive_suites.items()),
+        )
+        if runner.reused:
+            print(f"\nЗаданий без изменений (итоги из базы результатов): {runner.reused}")
+        if runner.resumed:
+            print(f"\nЗаданий, выполненных до сбоя (итоги из журнала): {runner.resumed}")
+        if runner.cancelled:
+            print(f"\nЗаданий отменено из-за бюджета: {runner.cancelled}")
+
+    # --- Подведение стоимости (в порядке наборов -> моделей -> тестов -> повторов) ---
+    grand_total_cost = 0
+    model_costs = {}
+    for suite_heading, jobs in suite_jobs.items():
+        suite_total_cost = 0
+        for job in jobs:
+            suite_total_cost += job.cost
+            grand_total_cost += job.cost
+            model_costs[job.model] = model_costs.get(job.model, 0) + job.cost
+        print(f"\nСтоимость выполнения набора '{suite_heading}': ${suite_total_cost:.10f}".rstrip("0").rstrip("."))
 
     print(f"\n{'='*20} Все наборы тестов обработаны {'='*20}")
     print("\nОБЩАЯ СВОДКА ПО СТОИМОСТИ:")
@@ -111,5 +214,215 @@ def main():
             print(f"    - {model}: ${cost:.10f}".rstrip("0").rstrip("."))
 
 
+async def main_async(run_settings: RunSettings, resume: bool = False, estimate_only: bool = False):
+    """
+    Выполняет все наборы тестов в одном цикле событий.
+    Все запросы к провайдеру (вопросы и проверки моделью) идут через один
+    клиент с пулом keep-alive соединений, который закрывается по завершении.
+    Модели с префиксом провайдера ("local:llama3") запрашиваются у своих провайдеров
+    (providers/registry.py, настройка providers), у каждого - свой пул соединений.
+    При hedge_percentile медленные запросы к OpenRouter дублируются (providers/hedging.py).
+    Записи отчета report.xlsx копятся в памяти и сохраняются в конце запуска
+    (и каждые report_flush_interval секунд, если задано).
+    Детальные логи моделей пишутся фоновым потоком (result_log.py).
+    В конце запуска сохраняются метрики задержек по фазам (report/metrics.py).
+    Прогоны и ответы на вопросы сохраняются в базу результатов (report/results_db.py).
+    Вердикты сравнения запоминаются на время запуска (report/check.py, VerdictMemo).
+    Выполненные вопросы и прогоны записываются в журнал (journal.py); при resume
+    прерванный запуск продолжается с невыполненных вопросов.
+    При estimate_only выводится только оценка стоимости, запросы к моделям не отправляются.
+    """
+    journal = None
+    if run_settings.journal_path:
+        journal = RunJournal(run_settings.journal_path, resume=resume)
+        if resume and not journal.found:
+            print(f"Журнал '{journal.file_path}' не найден. Запуск выполняется с начала.")
+        elif resume and journal.finished:
+            print("Последний запуск завершен полностью, продолжать нечего.")
+            return
+        elif resume:
+            print(f"Продолжение прерванного запуска. Завершенных прогонов в журнале: {journal.restored}")
+    elif resume:
+        print("Предупреждение: продолжение запуска невозможно без журнала (journal_path). Запуск выполняется с начала.")
+
+    set_catalog(ModelCatalog(
+        url=f"{run_settings.base_url.rstrip('/')}/models",
+        headers={"Authorization": f"Bearer {API_KEY}"},
+        cache_path=run_settings.catalog_cache_path,
+        ttl=run_settings.catalog_ttl,
+    ))
+    if estimate_only:
+        set_registry(build_registry(run_settings.providers))
+        try:
+            await run_suites(run_settings, estimate_only=True)
+        finally:
+            set_registry(None)
+        return
+
+    cache = None
+    if run_settings.response_cache_mode != "off":
+        max_age_days = run_settings.response_cache_max_age_days
+        cache = ResponseCache(
+            path=run_settings.response_cache_path,
+            mode=run_settings.response_cache_mode,
+            max_age=max_age_days * 24 * 60 * 60 if max_age_days is not None else None,
+            max_size_mb=run_settings.response_cache_max_size_mb,
+        )
+        removed = cache.evict()
+        print(f"Кэш ответов: режим {cache.mode}" + (f", удалено устаревших записей: {removed}" if removed else ""))
+
+    # Повторы общие для OpenRouter и остальных провайдеров (общий бюджет повторов)
+    retry = RetryPolicy(
+        max_retries=run_settings.retry_max_retries,
+        base_delay=run_settings.retry_base_delay,
+        max_delay=run_settings.retry_max_delay,
+        retry_budget=run_settings.retry_budget,
+    )
+    hedge = None
+    if run_settings.hedge_percentile is not None:
+        hedge = HedgePolicy(
+            percentile=run_settings.hedge_percentile,
+            min_samples=run_settings.hedge_min_samples,
+            window=run_settings.hedge_window,
+            min_delay=run_settings.hedge_min_delay,
+            budget=run_settings.hedge_budget,
+            routing=run_settings.hedge_routing,
+        )
+    async with OpenRouterClient(
+        limit=run_settings.pool_limit,
+        limit_per_host=run_settings.pool_limit_per_host,
+        dns_cache_ttl=run_settings.dns_cache_ttl,
+        keepalive_timeout=run_settings.keepalive_timeout,
+        cache=cache,
+        base_url=run_settings.base_url,
+        throttle=Throttle(
+            default_rate=run_settings.rate_limit_rps,
+            model_rates=run_settings.model_rate_limits,
+            provider_rates=run_settings.provider_rate_limits,
+            burst=run_settings.rate_limit_burst,
+        ),
+        retry=retry,
+        hedge=hedge,
+    ) as client:
+        set_shared_client(client)
+        registry = await build_registry(run_settings.providers, cache=cache, retry=retry).start()
+        set_registry(registry)
+        judge = BatchJudge(
+            cache=VerdictCache(run_settings.judge_cache_path),
+            batch_size=run_settings.judge_batch_size,
+            batch_window=run_settings.judge_batch_window,
+        ).start()
+        set_judge(judge)
+        sink = ExcelReportSink()
+        set_report_sink(sink)
+        metrics = LatencyRecorder()
+        set_metrics(metrics)
+        memo = VerdictMemo()
+        set_verdict_memo(memo)
+        max_log_mb = run_settings.result_log_max_mb
+        result_log = ResultLogWriter(
+            max_bytes=int(max_log_mb * 1024 * 1024) if max_log_mb else None,
+            backup_count=run_settings.result_log_backups,
+        ).start()
+        set_result_log(result_log)
+        results_db = None
+        if run_settings.results_db_path:
+            results_db = ResultsDB(run_settings.results_db_path)
+            set_results_db(results_db)
+        elif run_settings.incremental:
+            print("Предупреждение: режим incremental не работает без базы результатов (results_db_path).")
+        if journal is not None:
+            set_journal(journal.start())
+        completed = False
+        flusher = None
+        if run_settings.report_flush_interval:
+            flusher = asyncio.create_task(_flush_report_periodically(sink, run_settings.report_flush_interval))
+        try:
+            await run_suites(run_settings)
+            completed = True
+            if client.retry.retries:
+                print(f"Повторных запросов к провайдеру: {client.retry.retries}")
+            if hedge is not None and hedge.hedged:
+                print(f"Дублирующих запросов: {hedge.hedged}, ответили первыми: {hedge.won}")
+        finally:
+            if flusher is not None:
+                flusher.cancel()
+            await judge.close()
+            set_judge(None)
+            set_shared_client(None)
+            await registry.close()
+            set_registry(None)
+            set_report_sink(None)
+            set_result_log(None)
+            await asyncio.to_thread(result_log.close)
+            await asyncio.to_thread(sink.flush)
+            if sink.written:
+                print(f"В отчет {sink.file_path} добавлено записей: {sink.written}")
+            set_metrics(None)
+            set_verdict_memo(None)
+            if memo.identical or memo.hits:
+                print(f"Ответов, совпавших с эталоном: {memo.identical}, вердиктов из памяти: {memo.hits}")
+            _export_metrics(metrics, run_settings)
+            if journal is not None:
+                set_journal(None)
+                journal.close(finished=completed)
+                if not completed:
+                    print("Запуск прерван. Продолжить: python3 main.py --resume")
+            if results_db is not None:
+                set_results_db(None)
+                results_db.close()
+
+
+def _export_metrics(metrics: LatencyRecorder, run_settings: RunSettings):
+    """Сохраняет метрики задержек в JSON и в формате Prometheus (пути из run_settings)."""
+    for path, export in (
+        (run_settings.metrics_json_path, metrics.export_json),
+        (run_settings.metrics_prometheus_path, metrics.export_prometheus),
+    ):
+        if not path:
+            continue
+        try:
+            export(path)
+            print(f"Метрики задержек сохранены в {path}")
+        except OSError as e:
+            print(f"Не удалось сохранить метрики в {path}: {e}")
+
+
+async def _flush_report_periodically(sink: ExcelReportSink, interval: float):
+    """Периодически сохраняет накопленные записи отчета (не блокируя цикл событий)."""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(sink.flush)
+
+
+def main():
+    """
+    Главный управляющий скрипт.
+    Загружает общие настройки запуска и выполняет наборы тестов из `test_suites.md`.
+    """
+    parser = argparse.ArgumentParser(description="Запуск наборов тестов из test_suites.md")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="не выполнять задания, для которых в базе результатов есть прогон с теми же конфигурацией и файлом теста",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="продолжить прерванный запуск по журналу: выполнить только невыполненные вопросы",
+    )
+    parser.add_argument(
+        "--estimate", action="store_true",
+        help="только оценить стоимость запуска, не отправляя запросов к моделям",
+    )
+    parser.add_argument("--budget", type=float, help="общий бюджет запуска, $ (переопределяет budget_usd)")
+    args = parser.parse_args()
+
+    run_settings = load_run_settings()
+    if args.incremental:
+        run_settings.incremental = True
+    if args.budget is not None:
+        run_settings.budget_usd = args.budget
+    asyncio.run(main_async(run_settings, resume=args.resume, estimate_only=args.estimate))
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,229 @@
+"""
+Однопроходный разбор файлов тестов (tests/*.md) и наборов тестов (test_suites.md).
+
+В отличие от func.get_section, который заново просматривает весь текст при каждом
+обращении, файл разбирается один раз за линейное время в структуру с готовыми
+секциями, настройками сравнения и списком вопросов с уже разобранными JSON-ответами.
+Результат кэшируется по пути файла и сбрасывается при изменении файла.
+"""
+import os
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from comparison_settings import ComparisonSettings
+
+
+def parse_sections(markdown_text: str, level: int = 1) -> Dict[str, str]:
+    """
+    Разбивает Markdown на секции указанного уровня за один проход.
+    Содержимое секции такое же, как у func.get_section: от заголовка до следующего
+    заголовка того же уровня, включая подзаголовки. Пустые секции не попадают в результат,
+    при повторе заголовка берется первая секция.
+
+    :param markdown_text: Исходный текст в формате Markdown.
+    :param level: Уровень заголовков (1 = #, 2 = ## и т.д.).
+    :return: {заголовок: содержимое}
+    """
+    prefix = "#" * level + " "
+    sections: Dict[str, str] = {}
+    seen = set()
+    heading: Optional[str] = None
+    collected: List[str] = []
+
+    def close():
+        if heading is not None and heading not in seen:
+            seen.add(heading)
+            if collected:
+                sections[heading] = "\n".join(collected)
+
+    for line in markdown_text.splitlines():
+        if line.startswith(prefix):
+            close()
+            heading = line[len(prefix):].strip()
+            collected = []
+            continue
+        if heading is not None:
+            collected.append(line)
+    close()
+    return sections
+
+
+# --- Файл теста --- #
+
+@dataclass
+class QuestionAnswer:
+    """
+    Один вопрос теста с эталонным ответом.
+    """
+    number: int
+    question: str
+    answer: Optional[str]  # Текст эталонного ответа (без обработки)
+    expected: Any = None  # Эталонный ответ, разобранный как JSON (None, если это не JSON)
+
+
+@dataclass
+class TestFile:
+    """
+    Разобранный файл теста.
+    """
+    description: str = ""
+    role: str = ""
+    prompt: str = ""
+    settings: ComparisonSettings = field(default_factory=ComparisonSettings)
+    questions: List[QuestionAnswer] = field(default_factory=list)
+
+
+def _parse_comparison_settings(settings_text: Optional[str]) -> ComparisonSettings:
+    """
+    Разбирает секцию "# Настройки" в объект настроек сравнения.
+    Неверные или отсутствующие значения оставляют настройки по умолчанию.
+    """
+    comparison_settings = ComparisonSettings()
+    if not settings_text:
+        return comparison_settings
+    settings = parse_sections(settings_text, 2)
+
+    try:
+        for_numbers = float(settings["Допуск при сравнении чисел"].strip())
+        if for_numbers:
+            comparison_settings.num_tolerance = for_numbers
+    except (KeyError, ValueError):
+        pass
+
+    # Поле настроек -> (атрибут метода, атрибут порога)
+    str_fields = {
+        "Сравнение ответа модели текстом": ("text_comparison_method", "text_similarity_threshold"),
+        "Сравнение строк в словаре": ("dict_str_comparison_method", "dict_str_similarity_threshold"),
+        "Сравнение строк в списке": ("list_str_comparison_method", "list_str_similarity_threshold"),
+    }
+    for heading, (method_attr, threshold_attr) in str_fields.items():
+        try:
+            value = settings[heading].strip()
+            if value:
+                if value.lower() == "модель":
+                    setattr(comparison_settings, method_attr, "model")
+                else:
+                    _, threshold = value.split()
+                    setattr(comparison_settings, method_attr, "similarity")  # Метод сравнения
+                    setattr(comparison_settings, threshold_attr, int(threshold))  # Процент похожести
+        except (KeyError, ValueError):
+            pass
+
+    return comparison_settings
+
+
+def _parse_questions(question_answer: Optional[str]) -> List[QuestionAnswer]:
+    """
+    Разбирает секцию "# Тесты" в список вопросов.
+    Вопросы нумеруются подряд с 1, список заканчивается на первом отсутствующем номере.
+    """
+    if not question_answer or not question_answer.strip():
+        return []
+    sections = parse_sections(question_answer, 2)
+
+    questions = []
+    i = 1
+    while True:
+        question = sections.get(f"Вопрос {i}")
+        if not question:
+            break
+        answer = sections.get(f"Ответ {i}")
+        try:
+            expected = json.loads(answer.strip())
+        except (AttributeError, ValueError):
+            expected = None
+        questions.append(QuestionAnswer(i, question.strip(), answer, expected))
+        i += 1
+    return questions
+
+
+def parse_test_file(markdown_text: str) -> TestFile:
+    """
+    Разбирает текст файла теста.
+
+    :param markdown_text: Содержимое tests/*.md
+    :return: Объект TestFile
+    """
+    sections = parse_sections(markdown_text, 1)
+    return TestFile(
+        description=(sections.get("Описание") or "").strip(),
+        role=(sections.get("Роль") or "").strip(),
+        prompt=sections.get("Промпт") or "",
+        settings=_parse_comparison_settings(sections.get("Настройки")),
+        questions=_parse_questions(sections.get("Тесты")),
+    )
+
+
+# --- Файл наборов тестов --- #
+
+@dataclass
+class Suite:
+    """
+    Набор тестов из test_suites.md: заголовок и поля (секции второго уровня).
+    """
+    heading: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+    def get(self, name: str) -> Optional[str]:
+        """Содержимое поля или None, как у get_section(suite_text, name, 2)."""
+        return self.fields.get(name)
+
+
+def parse_suites(markdown_text: str) -> List[Suite]:
+    """
+    Разбирает текст файла наборов тестов.
+    Наборы нумеруются подряд с 1 ("# Набор тестов N"), список заканчивается
+    на первом отсутствующем номере.
+
+    :param markdown_text: Содержимое test_suites.md
+    :return: Список наборов по порядку
+    """
+    sections = parse_sections(markdown_text, 1)
+    suites = []
+    suite_counter = 1
+    while True:
+        heading = f"Набор тестов {suite_counter}"
+        if heading not in sections:
+            break
+        suites.append(Suite(heading, parse_sections(sections[heading], 2)))
+        suite_counter += 1
+    return suites
+
+
+# --- Загрузка с кэшем --- #
+
+# {(вид файла, путь): ((mtime_ns, размер), результат разбора)}
+_cache: Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]] = {}
+
+
+def _load_cached(file_path: str, kind: str, parse):
+    """Читает и разбирает файл, повторно используя результат, пока файл не изменился."""
+    stat = os.stat(file_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get((kind, file_path))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(file_path, "r", encoding="utf-8") as f:
+        result = parse(f.read())
+    _cache[(kind, file_path)] = (stamp, result)
+    return result
+
+
+def load_test_file(file_path: str) -> TestFile:
+    """
+    Загружает и разбирает файл теста (с кэшем по времени изменения файла).
+    Результат общий для всех вызовов - его нельзя изменять.
+
+    :raises FileNotFoundError: Если файла нет
+    """
+    return _load_cached(file_path, "test", parse_test_file)
+
+
+def load_suites(file_path: str = "test_suites.md") -> List[Suite]:
+    """
+    Загружает и разбирает файл наборов тестов (с кэшем по времени изменения файла).
+
+    :raises FileNotFoundError: Если файла нет
+    """
+    return _load_cached(file_path, "suites", parse_suites)
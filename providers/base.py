@@ -0,0 +1,52 @@
+"""
+Интерфейс провайдера моделей.
+Провайдер выполняет запросы chat/completions и отвечает за каталог своих моделей с ценами.
+Провайдеры регистрируются в providers/registry.py и выбираются по префиксу id модели
+("local:llama3" - модель "llama3" провайдера "local"); модели без префикса - OpenRouter.
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+
+class Provider(ABC):
+    """
+    Базовый класс провайдера. Подкласс без catalog или chat нельзя создать.
+    Каталог (catalog) - объект с методами get(id), pricing(id) и context_length(id),
+    как у providers/catalog.ModelCatalog; id в нем - без префикса провайдера.
+    """
+    name: str = ""  # Префикс провайдера в id модели ("" - провайдер по умолчанию)
+
+    @property
+    @abstractmethod
+    def catalog(self):
+        """Каталог моделей провайдера."""
+
+    @abstractmethod
+    async def chat(
+        self,
+        model: str = "",
+        role: str = "",
+        prompt: str = "",
+        param: Optional[Dict] = None,
+        response_format: Optional[Dict] = None,
+        extra_body: Optional[Dict] = None,
+        suffix: Optional[str] = None,
+        cache_prompt: bool = False,
+        guard=None,
+    ) -> Dict:
+        """
+        Запрос к модели. Параметры и результат - как у providers/open_router.openrouter_async.
+
+        :param model: id модели без префикса провайдера
+        """
+
+    def hedging(self) -> bool:
+        """Может ли провайдер отправить дублирующий запрос (providers/hedging.py)."""
+        return False
+
+    async def start(self) -> "Provider":
+        """Открывает соединения провайдера в текущем цикле событий."""
+        return self
+
+    async def close(self) -> None:
+        """Закрывает соединения провайдера."""
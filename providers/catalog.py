@@ -0,0 +1,140 @@
+"""
+Каталог моделей провайдера.
+Список моделей скачивается один раз, индексируется по id и сохраняется на диск,
+чтобы последующие запуски не скачивали его заново, пока не истечет TTL.
+"""
+import os
+import json
+import threading
+from time import time
+from typing import Dict, Optional
+
+import requests
+
+
+class ModelCatalog:
+    """
+    Каталог моделей с индексом по id и дисковым кэшем.
+
+    Порядок загрузки: память -> файл кэша (если не старше ttl) -> запрос к API.
+    Если модель не найдена, каталог один раз за запуск перезагружается из API
+    (модель могла появиться после сохранения кэша).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict] = None,
+        cache_path: Optional[str] = "cache/models.json",
+        ttl: float = 24 * 60 * 60,
+    ):
+        """
+        :param url: Адрес списка моделей, например https://openrouter.ai/api/v1/models
+        :param headers: Заголовки запроса (авторизация)
+        :param cache_path: Файл дискового кэша, None - не сохранять на диск
+        :param ttl: Время жизни кэша на диске, сек
+        """
+        self.url = url
+        self.headers = headers or {}
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self._index: Optional[Dict[str, Dict]] = None
+        self._fetched = False  # Каталог уже скачивался в этом запуске
+        self._lock = threading.Lock()
+
+    # --- Загрузка --- #
+
+    def _load_from_disk(self) -> bool:
+        """Загружает индекс из файла кэша, если он есть и не устарел."""
+        if not self.cache_path:
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        # Кэш другого адреса (например, локального имитатора) не подходит
+        if data.get("url") != self.url or time() - data.get("fetched_at", 0) > self.ttl:
+            return False
+        self._index = data.get("models", {})
+        return True
+
+    def _save_to_disk(self) -> None:
+        """Сохраняет индекс в файл кэша (через временный файл, чтобы не повредить кэш)."""
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"url": self.url, "fetched_at": time(), "models": self._index}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def _fetch(self) -> bool:
+        """Скачивает список моделей и строит индекс по id."""
+        self._fetched = True
+        try:
+            response = requests.get(self.url, headers=self.headers)
+            response.raise_for_status()
+            models = response.json().get("data", [])
+        except requests.exceptions.RequestException as e:
+            print(f"Ошибка API: {e}")
+            return False
+
+        self._index = {model["id"]: _model_details(model) for model in models}
+        self._save_to_disk()
+        return True
+
+    def refresh(self) -> bool:
+        """Принудительно скачивает каталог заново."""
+        with self._lock:
+            return self._fetch()
+
+    # --- Поиск --- #
+
+    def get(self, model_id: str) -> Optional[Dict]:
+        """
+        Возвращает детали модели по id или None, если модель не найдена.
+
+        :param model_id: Название модели, например: "openai/gpt-3.5-turbo"
+        """
+        with self._lock:
+            if self._index is None and not self._load_from_disk():
+                self._fetch()
+            index = self._index or {}
+            if model_id not in index and not self._fetched:
+                # Промах по кэшу - модель могла появиться позже, обновляем каталог
+                self._fetch()
+                index = self._index or {}
+            return index.get(model_id)
+
+    def pricing(self, model_id: str) -> Dict[str, float]:
+        """
+        Цены модели за один токен в долларах.
+        Всегда содержит ключи "prompt" и "completion" (0, если модель не найдена).
+        """
+        details = self.get(model_id) or {}
+        prices = {"prompt": 0.0, "completion": 0.0}
+        for key, value in details.get("pricing", {}).items():
+            try:
+                prices[key] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return prices
+
+    def context_length(self, model_id: str) -> int:
+        """Размер контекста модели в токенах (0, если неизвестен)."""
+        details = self.get(model_id) or {}
+        return int(details.get("context_length") or 0)
+
+
+def _model_details(model: Dict) -> Dict:
+    """Оставляет из описания модели только используемые поля."""
+    return {
+        "id": model["id"],
+        "name": model.get("name", "Неизвестно"),
+        "context_length": model.get("context_length", 0),
+        "pricing": model.get("pricing", {}),
+        "capabilities": model.get("capabilities", {}),
+        "provider": (model.get("provider") or {}).get("name", "Неизвестно"),
+        "updated": model.get("updated", "Неизвестно")
+    }
@@ -0,0 +1,76 @@
+"""
+Дублирующие запросы (hedging) для сокращения хвостовых задержек.
+
+Если ответ на запрос не пришел за время, в которое укладываются percentile процентов
+недавних ответов той же модели, отправляется такой же дублирующий запрос
+(при необходимости - к другому провайдеру OpenRouter через extra_body.provider).
+Берется первый успешный ответ, второй запрос отменяется.
+Пока ответов модели меньше min_samples, запросы не дублируются.
+"""
+from collections import deque
+from math import ceil
+from typing import Deque, Dict, Optional
+
+
+class HedgePolicy:
+    """
+    Правила дублирования запросов и недавние задержки моделей.
+    Дублирующих запросов - не больше budget на весь запуск (None - без ограничения).
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_samples: int = 10,
+        window: int = 100,
+        min_delay: float = 0.0,
+        budget: Optional[int] = None,
+        routing: Optional[Dict[str, Dict]] = None,
+    ):
+        """
+        :param percentile: Перцентиль недавних задержек модели, после которого отправляется дубль
+        :param min_samples: Сколько ответов модели нужно, чтобы начать дублировать запросы
+        :param window: Сколько последних ответов модели учитывать
+        :param min_delay: Не отправлять дубль раньше, сек
+        :param budget: Дублирующих запросов на весь запуск (None - без ограничения)
+        :param routing: Провайдеры OpenRouter для дубля: {"id модели" или "*": {"order": [...], ...}}
+                        (значение extra_body.provider дублирующего запроса)
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay
+        self.budget = budget
+        self.routing = routing or {}
+        self.hedged = 0  # Сколько дублирующих запросов отправлено за запуск
+        self.won = 0  # Сколько из них ответили первыми
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    def observe(self, model: str, latency: float) -> None:
+        """Запоминает задержку успешного ответа модели."""
+        if model not in self._latencies:
+            self._latencies[model] = deque(maxlen=self.window)
+        self._latencies[model].append(latency)
+
+    def delay(self, model: str) -> Optional[float]:
+        """Через сколько секунд дублировать запрос к модели (None - не дублировать)."""
+        latencies = self._latencies.get(model)
+        if not latencies or len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        rank = max(1, ceil(self.percentile / 100 * len(ordered)))
+        return max(self.min_delay, ordered[rank - 1])
+
+    def allow(self) -> bool:
+        """Можно ли отправить дублирующий запрос. Если можно, он списывается из бюджета."""
+        if self.budget is not None and self.hedged >= self.budget:
+            return False
+        self.hedged += 1
+        return True
+
+    def hedge_args(self, args: Dict) -> Dict:
+        """Тело дублирующего запроса: с другим провайдером, если он задан для модели."""
+        routing = self.routing.get(args.get("model"), self.routing.get("*"))
+        if not routing:
+            return args
+        return {**args, "extra_body": {**(args.get("extra_body") or {}), "provider": routing}}
@@ -0,0 +1,331 @@
+"""
+Локальный имитатор OpenRouter для проверки самого тестера без сети.
+
+Отвечает в тех же JSON-форматах, что и https://openrouter.ai/api/v1:
+- POST /api/v1/chat/completions - ответ модели;
+- GET /api/v1/models - каталог моделей с ценами.
+
+Ответы берутся из файлов тестов (tests/*.md): вопрос извлекается из промпта
+после "Вопрос:" и ищется среди секций "## Вопрос N" теста, роль и промпт которого
+совпадают с запросом (если такого теста нет - любого теста), в ответ отдается "## Ответ N".
+Задержка, доля ошибок и ответов 429, количество токенов и доля правильных ответов
+настраиваются JSON-файлом (см. DEFAULT_CONFIG), в том числе отдельно для каждой модели.
+Запрос с "stream": true получает ответ потоком (SSE) по фрагменту на токен:
+задержка "latency" - до первого фрагмента, "token_interval" - между фрагментами;
+если клиент закрыл соединение, генерация прекращается (как у провайдера при отмене запроса).
+Кэш промпта имитируется: часть сообщений до метки cache_control при первом запросе
+считается записанной в кэш, при повторе - прочитанной из него (usage.prompt_tokens_details).
+
+Запуск:
+    python -m providers.mock_openrouter --port 8000 --config mock.json
+и в run_settings.json:
+    {"base_url": "http://127.0.0.1:8000/api/v1"}
+"""
+import os
+import re
+import json
+import random
+import asyncio
+import argparse
+from glob import glob
+from time import time
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from md_parser import load_suites, load_test_file
+
+# Настройки по умолчанию. Любое поле можно переопределить для модели в "models".
+DEFAULT_CONFIG = {
+    # Распределение задержки ответа, сек:
+    # {"type": "fixed", "value": 0.5}
+    # {"type": "uniform", "min": 0.2, "max": 1.0}
+    # {"type": "normal", "mean": 0.5, "std": 0.1}
+    # {"type": "lognormal", "median": 0.5, "sigma": 0.4}
+    "latency": {"type": "lognormal", "median": 0.5, "sigma": 0.4},
+    "token_interval": 0.0,  # Задержка между фрагментами ответа в режиме stream, сек
+    "error_rate": 0.0,  # Доля ответов 500
+    "rate_limit_rate": 0.0,  # Доля ответов 429
+    "retry_after": 1,  # Значение заголовка Retry-After для 429, сек
+    "accuracy": 1.0,  # Доля правильных (взятых из теста) ответов
+    "wrong_answer": "Не знаю",  # Ответ вместо правильного
+    "default_answer": "1",  # Ответ на неизвестный вопрос (в т.ч. на запрос модели-валидатора)
+    "chars_per_token": 4,  # Для подсчета токенов по длине текста
+    "prompt_tokens": None,  # Фиксированное число токенов промпта (None - по длине текста)
+    "completion_tokens": None,  # Фиксированное число токенов ответа (None - по длине текста)
+    # Цены для каталога (input_cache_read/input_cache_write - токены промпта из кэша и в кэш)
+    "pricing": {
+        "prompt": "0.0000001",
+        "completion": "0.0000002",
+        "input_cache_read": "0.00000001",
+        "input_cache_write": "0.000000125",
+    },
+    "context_length": 32768,
+    "models": {},  # {"id модели": {поля выше}}
+}
+
+
+def load_scripts(tests_dir: str = "tests") -> Dict[str, Dict]:
+    """
+    Загружает ответы из файлов тестов.
+
+    :param tests_dir: Папка с файлами тестов
+    :return: {имя теста: {"role": роль, "prompt": промпт, "answers": {текст вопроса: эталонный ответ}}}
+    """
+    scripts = {}
+    for file_path in sorted(glob(os.path.join(tests_dir, "*.md"))):
+        test_file = load_test_file(file_path)
+        scripts[os.path.splitext(os.path.basename(file_path))[0]] = {
+            "role": test_file.role.strip(),
+            "prompt": test_file.prompt.strip(),
+            "answers": {item.question: (item.answer or "").strip() for item in test_file.questions},
+        }
+    return scripts
+
+
+def load_suite_models(suites_path: str = "test_suites.md") -> list:
+    """Список моделей из test_suites.md, чтобы каталог имитатора содержал их все."""
+    try:
+        suites = load_suites(suites_path)
+    except FileNotFoundError:
+        return []
+    models = []
+    for suite in suites:
+        models_str = suite.get("Модели") or ""
+        models += [m.strip() for m in models_str.split(",") if m.strip() and m.strip() not in models]
+    return models
+
+
+class MockOpenRouter:
+    """
+    Имитатор OpenRouter: хранит настройки и заготовленные ответы, обрабатывает запросы.
+    """
+
+    def __init__(self, config: Optional[Dict] = None, tests_dir: str = "tests", suites_path: str = "test_suites.md"):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.scripts = load_scripts(tests_dir)
+        self.catalog_models = list(self.config["models"]) + [
+            m for m in load_suite_models(suites_path) if m not in self.config["models"]
+        ]
+        self.requests_count = 0
+        self._prompt_cache = set()  # (модель, закэшированный префикс)
+
+    def settings(self, model: str) -> Dict:
+        """Настройки для модели: общие, переопределенные полями из "models"."""
+        return {**self.config, **self.config["models"].get(model, {})}
+
+    @staticmethod
+    def sample_latency(latency: Dict) -> float:
+        """Случайная задержка по заданному распределению (не меньше 0)."""
+        kind = latency.get("type", "fixed")
+        if kind == "uniform":
+            value = random.uniform(latency["min"], latency["max"])
+        elif kind == "normal":
+            value = random.gauss(latency["mean"], latency["std"])
+        elif kind == "lognormal":
+            value = random.lognormvariate(0, latency["sigma"]) * latency["median"]
+        else:
+            value = latency.get("value", 0)
+        return max(0.0, value)
+
+    @staticmethod
+    def _text(content) -> str:
+        """Текст сообщения (строка или список частей)."""
+        if isinstance(content, list):
+            return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        return content or ""
+
+    def find_answer(self, role: str, prompt: str, question: str) -> Optional[str]:
+        """
+        Эталонный ответ на вопрос теста с такими же ролью и промптом,
+        а если такого теста нет - первого по имени файла теста с этим вопросом.
+        """
+        found = None
+        for script in self.scripts.values():
+            answer = script["answers"].get(question)
+            if answer is None:
+                continue
+            if script["role"] == role and script["prompt"] == prompt:
+                return answer
+            if found is None:
+                found = answer
+        return found
+
+    def answer_for(self, prompt: str, settings: Dict, role: str = "") -> str:
+        """Ответ на промпт: заготовленный ответ теста, неверный ответ или ответ по умолчанию."""
+        # Пакетный запрос модели-валидатора (report/judge.py) - массив вердиктов по умолчанию
+        batch = re.search(r'"verdicts".*?ровно (\d+) чисел', prompt, re.S)
+        if batch:
+            return json.dumps({"verdicts": [int(settings["default_answer"] == "1")] * int(batch.group(1))})
+
+        if "Вопрос:\n" not in prompt:
+            return settings["default_answer"]
+        test_prompt, _, question = prompt.rpartition("Вопрос:\n")
+        answer = self.find_answer(role.strip(), test_prompt.strip(), question.strip())
+        if answer is None:
+            return settings["default_answer"]
+        if random.random() < settings["accuracy"]:
+            return answer
+        return settings["wrong_answer"]
+
+    def count_tokens(self, text: str, settings: Dict) -> int:
+        return max(1, len(text) // max(1, settings["chars_per_token"]))
+
+    def prompt_cache_tokens(self, model: str, messages: list, settings: Dict) -> Dict[str, int]:
+        """Имитация кэша промпта: токены префикса до последней метки cache_control, прочитанные или записанные."""
+        texts = []
+        prefix = None
+        for message in messages:
+            content = message.get("content")
+            for part in content if isinstance(content, list) else [{"text": content or ""}]:
+                if not isinstance(part, dict):
+                    continue
+                texts.append(part.get("text", ""))
+                if part.get("cache_control"):
+                    prefix = "\n".join(texts)
+        if prefix is None:
+            return {}
+        tokens = self.count_tokens(prefix, settings)
+        if (model, prefix) in self._prompt_cache:
+            return {"cached_tokens": tokens}
+        self._prompt_cache.add((model, prefix))
+        return {"cache_write_tokens": tokens}
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        self.requests_count += 1
+        body = await request.json()
+        model = body.get("model", "")
+        settings = self.settings(model)
+        messages = body.get("messages", [])
+
+        await asyncio.sleep(self.sample_latency(settings["latency"]))
+
+        roll = random.random()
+        if roll < settings["rate_limit_rate"]:
+            return web.json_response(
+                {"error": {"code": 429, "message": "Rate limit exceeded (mock)"}},
+                status=429,
+                headers={"Retry-After": str(settings["retry_after"])},
+            )
+        if roll < settings["rate_limit_rate"] + settings["error_rate"]:
+            return web.json_response({"error": {"code": 500, "message": "Internal error (mock)"}}, status=500)
+
+        prompt_text = "\n".join(self._text(m.get("content")) for m in messages)
+        user_text = self._text(messages[-1].get("content")) if messages else ""
+        role = next((self._text(m.get("content")) for m in messages if m.get("role") == "system"), "")
+        answer = self.answer_for(user_text, settings, role)
+        prompt_tokens = settings["prompt_tokens"] or self.count_tokens(prompt_text, settings)
+        completion_tokens = settings["completion_tokens"] or self.count_tokens(answer, settings)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        cache_tokens = self.prompt_cache_tokens(model, messages, settings)
+        if cache_tokens:
+            usage["prompt_tokens_details"] = {k: min(v, prompt_tokens) for k, v in cache_tokens.items()}
+
+        if body.get("stream"):
+            return await self._stream(request, model, answer, usage, settings)
+
+        return web.json_response({
+            "id": f"mock-{self.requests_count}",
+            "object": "chat.completion",
+            "created": int(time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    async def _stream(self, request: web.Request, model: str, answer: str, usage: Dict, settings: Dict) -> web.StreamResponse:
+        """Ответ потоком Server-Sent Events: фрагменты по chars_per_token символов, в конце usage и [DONE]."""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        def event(delta: Dict, finish_reason: Optional[str] = None, **extra) -> bytes:
+            chunk = {
+                "id": f"mock-{self.requests_count}",
+                "object": "chat.completion.chunk",
+                "created": int(time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        step = max(1, settings["chars_per_token"])
+        pieces = [answer[i:i + step] for i in range(0, len(answer), step)] or [""]
+        try:
+            await response.write(b": OPENROUTER PROCESSING\n\n")
+            for n, piece in enumerate(pieces):
+                if n and settings["token_interval"]:
+                    await asyncio.sleep(settings["token_interval"])
+                await response.write(event({"role": "assistant", "content": piece} if n == 0 else {"content": piece}))
+            await response.write(event({}, "stop", usage=usage))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # Клиент прервал поток
+        return response
+
+    async def models(self, request: web.Request) -> web.Response:
+        data = []
+        for model in self.catalog_models:
+            settings = self.settings(model)
+            data.append({
+                "id": model,
+                "name": f"{model} (mock)",
+                "context_length": settings["context_length"],
+                "pricing": settings["pricing"],
+                "created": 0,
+            })
+        return web.json_response({"data": data})
+
+    def app(self) -> web.Application:
+        application = web.Application()
+        application.router.add_post("/api/v1/chat/completions", self.chat_completions)
+        application.router.add_get("/api/v1/models", self.models)
+        return application
+
+
+async def start_mock_server(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    config: Optional[Dict] = None,
+    tests_dir: str = "tests",
+) -> web.AppRunner:
+    """
+    Запускает имитатор в текущем цикле событий (например, для бенчмарков).
+    Остановка - await runner.cleanup().
+    """
+    runner = web.AppRunner(MockOpenRouter(config, tests_dir).app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный имитатор OpenRouter")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--config", help="JSON-файл с настройками имитатора")
+    parser.add_argument("--tests-dir", default="tests", help="Папка с файлами тестов для ответов")
+    args = parser.parse_args()
+
+    config = None
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+    mock = MockOpenRouter(config, args.tests_dir)
+    print(f"Имитатор OpenRouter: http://{args.host}:{args.port}/api/v1 "
+          f"(вопросов: {sum(len(script['answers']) for script in mock.scripts.values())}, моделей в каталоге: {len(mock.catalog_models)})")
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,494 @@
 """
 Асинхронный запрос к OpenRouter через aiohttp (без библиотеки openai).
 Поддерживает те же параметры: model, role, prompt, param, response_format, extra_body.
+Запросы идут через OpenRouterClient с общим пулом keep-alive соединений.
+При "stream": true в параметрах ответ читается потоком (SSE) с замером
+времени до первого токена и скорости генерации; поток можно прервать досрочно,
+если ответ уже не может быть верным (guard, см. report/json_guard.py).
+Неизменная часть промпта может помечаться для кэширования у провайдера (cache_control).
+Медленный запрос может дублироваться (providers/hedging.py), берется первый ответ.
 """
 import os
+import copy
+import json
+import asyncio
 import aiohttp
-import requests
-from typing import Dict, Optional
+from time import time
+from typing import Any, Coroutine, Dict, Optional, Tuple, TypeVar
 from dotenv import load_dotenv
 
+from providers.base import Provider
+from providers.catalog import ModelCatalog
+from providers.hedging import HedgePolicy
+from providers.response_cache import ResponseCache
+from providers.throttle import RETRY_STATUSES, RetryPolicy, Throttle, parse_retry_after
+
 # Загрузка переменных окружения
 load_dotenv()
 
 API_KEY = os.getenv("OPENROUTER_API_KEY")  # Получи на: https://openrouter.ai/keys
 
+API_URL = "https://openrouter.ai/api/v1"
+
+T = TypeVar("T")
+
+
+class OpenRouterClient:
+    """
+    Долгоживущий клиент OpenRouter с пулом keep-alive соединений.
+
+    Одна сессия aiohttp (и один пул TCP/TLS-соединений) используется для всех
+    запросов, поэтому рукопожатие выполняется один раз, а не на каждый вопрос.
+    Сессия привязана к циклу событий, в котором вызван start().
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30.0,
+        cache: Optional[ResponseCache] = None,
+        base_url: str = API_URL,
+        throttle: Optional[Throttle] = None,
+        retry: Optional[RetryPolicy] = None,
+        api_key: Optional[str] = API_KEY,
+        cache_scope: Optional[str] = None,
+        hedge: Optional[HedgePolicy] = None,
+    ):
+        """
+        :param limit: Всего одновременных соединений (0 - без ограничений)
+        :param limit_per_host: Соединений к одному хосту (0 - без ограничений)
+        :param dns_cache_ttl: Время жизни DNS-кэша, сек
+        :param keepalive_timeout: Сколько держать простаивающее соединение, сек
+        :param cache: Кэш ответов (None - не использовать)
+        :param base_url: Адрес API (например, локального имитатора providers/mock_openrouter.py)
+        :param throttle: Ограничение частоты запросов (None - без ограничения)
+        :param retry: Правила повтора при 429 и временных ошибках (None - без повторов)
+        :param api_key: Ключ API (None - без заголовка Authorization)
+        :param cache_scope: Пространство ключей в кэше ответов, чтобы ответы разных
+                            провайдеров на одинаковый запрос не смешивались (None - общее)
+        :param hedge: Дублирование медленных запросов (None - не дублировать)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.cache_scope = cache_scope
+        self.hedge = hedge
+        self.cache = cache
+        self.throttle = throttle
+        self.retry = retry
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> "OpenRouterClient":
+        """Открывает сессию с пулом соединений в текущем цикле событий."""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[_trace_config()])
+            self.loop = asyncio.get_running_loop()
+        return self
+
+    async def close(self) -> None:
+        """Закрывает сессию и все соединения пула."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self.loop = None
+
+    async def __aenter__(self) -> "OpenRouterClient":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def chat(
+        self,
+        model: str = "",
+        role: str = "",
+        prompt: str = "",
+        param: Optional[Dict] = None,
+        response_format: Optional[Dict] = None,
+        extra_body: Optional[Dict] = None,
+        suffix: Optional[str] = None,
+        cache_prompt: bool = False,
+        guard=None,
+    ) -> Dict[str, int]:
+        """
+        Запрос к chat/completions через пул соединений клиента.
+        Параметры и результат такие же, как у openrouter_async.
+        Если задан кэш ответов, запрос сначала ищется в нем (в зависимости от режима).
+        Прерванные ответы в кэш не записываются.
+        """
+        # Сообщение пользователя: неизменная часть (prompt) и изменяемая (suffix).
+        # Для кэширования у провайдера они передаются отдельными частями, неизменная - с cache_control.
+        if suffix is None:
+            content = prompt
+        elif cache_prompt:
+            content = [
+                {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": suffix},
+            ]
+        else:
+            content = prompt + suffix
+
+        # Базовые параметры
+        param = param or {}
+        args = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": role},
+                {"role": "user", "content": content}
+            ],
+            **{k: v for k, v in param.items() if v is not None}
+        }
+
+        # Добавляем опциональные поля
+        if response_format:
+            args["response_format"] = {k: v for k, v in response_format.items() if v}
+        if extra_body:
+            args["extra_body"] = {k: v for k, v in extra_body.items() if v}
+        stream = bool(args.get("stream"))
+        if stream:
+            # Количество токенов в режиме stream приходит в последнем событии
+            args["stream_options"] = {"include_usage": True}
+
+        # Кэш ответов
+        cache = self.cache if self.cache is not None and self.cache.mode != "off" else None
+        cache_key = None
+        if cache:
+            cache_key = cache.make_key(args if self.cache_scope is None else {**args, "cache_scope": self.cache_scope})
+        if cache and cache.reads:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+            if cache.mode == "replay":
+                return {"error": "Ответ не найден в кэше ответов (режим replay)"}
+
+        # Заголовки
+        headers = {
+            "Content-Type": "application/json",
+            # Опционально: для рейтинга на openrouter.ai
+            "HTTP-Referer": "http://localhost:8000",
+            "X-Title": "Мой Бот",
+        }
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        # Отправляем запрос. При 429 и временных ошибках запрос повторяется (если задан retry),
+        # время ответа - только последней попытки, ожидание и повторы в него не входят.
+        wait_time = 0.0
+        attempt = 0
+        while True:
+            wait_start = time()
+            if self.throttle is not None:
+                await self.throttle.acquire(model)
+            wait_time += time() - wait_start
+
+            result, retryable, retry_after = await self._send_hedged(args, headers, stream, guard)
+            if not retryable or self.retry is None or not self.retry.allow(attempt):
+                break
+            if retry_after is not None and self.throttle is not None:
+                self.throttle.pause(model, retry_after)
+            attempt += 1
+            wait_start = time()
+            await asyncio.sleep(self.retry.delay(attempt - 1, retry_after))
+            wait_time += time() - wait_start
+
+        if "error" in result:
+            if attempt:
+                result["error"] += f" (повторов: {attempt})"
+            return result
+        result["retries"] = attempt
+        result["timings"]["throttle_wait"] = wait_time
+
+        if cache and cache.writes and not result.get("aborted"):
+            cache.put(cache_key, result)
+        return result
+
+    async def _send_hedged(self, args: Dict, headers: Dict, stream: bool, guard=None) -> Tuple[Dict, bool, Optional[float]]:
+        """
+        Попытка запроса с дублированием (если задано hedge): если ответа нет дольше
+        перцентиля недавних задержек модели, отправляется дублирующий запрос,
+        берется первый успешный ответ, другой запрос отменяется.
+        В результат добавляется "hedge": {"winner": "primary" или "hedge", "delay": через сколько сек
+        отправлен дубль, "prompt_tokens", "cached_tokens", "cache_write_tokens", "completion_tokens":
+        токены второго запроса, "estimated": токены оценены}.
+        Отмененный запрос мог быть оплачен провайдером, но его расход неизвестен: учитываются
+        только токены промпта (те же, что у ответившего запроса), вывод - 0, "estimated": True.
+        Задержка ответа дубля считается от отправки первого запроса.
+        """
+        model = args.get("model", "")
+        delay = self.hedge.delay(model) if self.hedge is not None else None
+        if delay is None:
+            outcome = await self._send(args, headers, stream, guard)
+            if self.hedge is not None and "error" not in outcome[0]:
+                self.hedge.observe(model, outcome[0]["latency"])
+            return outcome
+
+        start_time = time()
+        primary = asyncio.ensure_future(self._send(args, headers, stream, guard))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.hedge.allow():
+            outcome = await primary
+            if "error" not in outcome[0]:
+                self.hedge.observe(model, outcome[0]["latency"])
+            return outcome
+
+        hedge_guard = copy.deepcopy(guard) if guard is not None else None
+        hedge_start = time()
+        secondary = asyncio.ensure_future(self._send(self.hedge.hedge_args(args), headers, stream, hedge_guard))
+        pending = {primary, secondary}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in (primary, secondary) if task in done and "error" not in task.result()[0]), None)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        if winner is None:
+            return primary.result()  # Ошибка в обоих запросах - решение о повторе по первому
+
+        result, retryable, retry_after = winner.result()
+        loser = secondary if winner is primary else primary
+        estimated = loser.cancelled()
+        if estimated:
+            extra = {key: result.get(key, 0) for key in ("prompt_tokens", "cached_tokens", "cache_write_tokens")}
+        else:
+            extra = loser.result()[0]  # Ответ пришел одновременно или с ошибкой (без токенов)
+        result["hedge"] = {
+            "winner": "primary" if winner is primary else "hedge",
+            "delay": hedge_start - start_time,
+            "prompt_tokens": int(extra.get("prompt_tokens", 0)),
+            "cached_tokens": int(extra.get("cached_tokens", 0)),
+            "cache_write_tokens": int(extra.get("cache_write_tokens", 0)),
+            "completion_tokens": int(extra.get("completion_tokens", 0)),
+            "estimated": estimated,
+        }
+        if winner is secondary:
+            self.hedge.won += 1
+            result["latency"] += hedge_start - start_time
+            if result.get("ttft") is not None:
+                result["ttft"] += hedge_start - start_time
+        # Задержка с начала первого запроса: первый запрос не быстрее ее,
+        # поэтому медленные ответы не пропадают из статистики из-за отмены
+        self.hedge.observe(model, result["latency"])
+        return result, retryable, retry_after
+
+    async def _send(self, args: Dict, headers: Dict, stream: bool, guard=None) -> Tuple[Dict, bool, Optional[float]]:
+        """
+        Одна попытка запроса.
+
+        :return: (результат или {"error": ...}, можно ли повторить запрос, Retry-After в секундах)
+        """
+        try:
+            await self.start()
+            marks = {}  # Отметки времени фаз запроса (заполняются трассировкой aiohttp)
+            parse_time = None
+            start_time = time()
+            async with self._session.post(
+                f"{self.base_url}/chat/completions",
+                json=args,
+                headers=headers,
+                trace_request_ctx=marks,
+            ) as response:
+                if stream and response.status == 200:
+                    result = await _read_stream(response, start_time, guard)
+                    body_read_time = time() - marks.get("request_end", start_time)
+                else:
+                    body = await response.read()
+                    body_read_time = time() - marks.get("request_end", start_time)
+                    if response.status != 200:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        try:
+                            data = json.loads(body)
+                            error_message = data.get("error", {}).get("message", str(data))
+                        except (ValueError, AttributeError):
+                            error_message = f"HTTP {response.status}"
+                        return {"error": error_message}, response.status in RETRY_STATUSES, retry_after
+                    parse_start = time()
+                    data = json.loads(body)
+                    parse_time = time() - parse_start
+                    result = None
+            latency = time() - start_time
+
+            if result is None:
+                if "error" in data:
+                    # Ошибка модели у провайдера может прийти с кодом 200
+                    error = data["error"]
+                    code = error.get("code") if isinstance(error, dict) else None
+                    message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+                    return {"error": message}, code in RETRY_STATUSES, None
+
+                # Извлекаем ответ
+                answer = data["choices"][0]["message"]["content"]
+                prompt_tokens = data["usage"]["prompt_tokens"]
+                completion_tokens = data["usage"]["completion_tokens"]
+
+                result = {
+                    "answer": answer,
+                    "prompt_tokens": int(prompt_tokens),
+                    "completion_tokens": int(completion_tokens),
+                    **_prompt_cache_tokens(data["usage"]),
+                }
+            elif "error" in result:
+                return result, False, None
+            result["latency"] = latency
+            result["timings"] = _phase_timings(marks, body_read_time, parse_time)
+            return result, False, None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Обрыв соединения, таймаут - запрос можно повторить
+            return {"error": str(e) or type(e).__name__}, True, None
+        except Exception as e:
+            return {"error": str(e)}, False, None
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    """
+    Трассировка фаз запроса aiohttp: отметки времени пишутся в словарь,
+    переданный в запрос как trace_request_ctx.
+    """
+    trace = aiohttp.TraceConfig()
+
+    def mark(name: str):
+        async def handler(session, context, params):
+            marks = context.trace_request_ctx
+            if isinstance(marks, dict):
+                marks.setdefault(name, time())
+        return handler
+
+    trace.on_connection_queued_start.append(mark("queued_start"))
+    trace.on_connection_queued_end.append(mark("queued_end"))
+    trace.on_connection_create_start.append(mark("connect_start"))
+    trace.on_connection_create_end.append(mark("connect_end"))
+    trace.on_request_headers_sent.append(mark("headers_sent"))
+    trace.on_request_end.append(mark("request_end"))
+    return trace
+
+
+def _phase_timings(marks: Dict[str, float], body_read_time: float, parse_time: Optional[float]) -> Dict[str, Optional[float]]:
+    """
+    Длительность фаз запроса, сек (см. report/metrics.py):
+    pool_wait, connect (0 для keep-alive соединения), server, body_read, parse.
+    """
+    def span(start: str, end: str) -> float:
+        return marks[end] - marks[start] if start in marks and end in marks else 0.0
+
+    return {
+        "pool_wait": span("queued_start", "queued_end"),
+        "connect": span("connect_start", "connect_end"),
+        "server": span("headers_sent", "request_end"),
+        "body_read": body_read_time,
+        "parse": parse_time,
+    }
+
+
+def _prompt_cache_tokens(usage: Dict) -> Dict[str, int]:
+    """
+    Токены промпта, прочитанные из кэша провайдера и записанные в него.
+    OpenRouter возвращает их в usage.prompt_tokens_details, Anthropic-совместимые API - в usage.
+    """
+    details = usage.get("prompt_tokens_details") or {}
+    return {
+        "cached_tokens": int(details.get("cached_tokens") or usage.get("cache_read_input_tokens") or 0),
+        "cache_write_tokens": int(details.get("cache_write_tokens") or usage.get("cache_creation_input_tokens") or 0),
+    }
+
+
+async def _read_stream(response: aiohttp.ClientResponse, start_time: float, guard=None) -> Dict:
+    """
+    Читает ответ в режиме stream (Server-Sent Events) и замеряет:
+    - ttft - время от отправки запроса до первого фрагмента текста, сек;
+    - inter_token_latency - средний интервал между фрагментами текста, сек;
+    - tokens_per_second - скорость генерации после первого фрагмента, токенов/сек.
+    Метрики, которые нельзя посчитать (например, ответ одним фрагментом), равны None.
+    Если задан guard (объект с методами reset() и feed(текст) -> причина или None),
+    каждый фрагмент передается ему; при первой причине соединение закрывается
+    (провайдер прекращает генерацию), а в результат добавляется "aborted" с причиной.
+    Usage в прерванном потоке не приходит: токенов ответа - по числу фрагментов, токенов промпта - 0.
+    """
+    parts = []
+    times = []
+    usage = {}
+    aborted = None
+    if guard is not None:
+        guard.reset()
+    async for raw_line in response.content:
+        line = raw_line.decode("utf-8").strip()
+        if not line.startswith("data:"):
+            continue  # Пустые строки и комментарии вида ": OPENROUTER PROCESSING"
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            break
+        chunk = json.loads(payload)
+        if "error" in chunk:
+            error = chunk["error"]
+            return {"error": error.get("message", str(error)) if isinstance(error, dict) else str(error)}
+        if chunk.get("usage"):
+            usage = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                parts.append(content)
+                times.append(time())
+                if guard is not None:
+                    aborted = guard.feed(content)
+        if aborted:
+            response.close()
+            break
+
+    completion_tokens = int(usage.get("completion_tokens") or len(parts))
+    decode_time = times[-1] - times[0] if times else 0
+    return {
+        "answer": "".join(parts),
+        "prompt_tokens": int(usage.get("prompt_tokens") or 0),
+        "completion_tokens": completion_tokens,
+        **_prompt_cache_tokens(usage),
+        "ttft": times[0] - start_time if times else None,
+        "inter_token_latency": decode_time / (len(times) - 1) if len(times) > 1 else None,
+        "tokens_per_second": (completion_tokens - 1) / decode_time if decode_time > 0 and completion_tokens > 1 else None,
+        **({"aborted": aborted} if aborted else {}),
+    }
+
+
+# Общий клиент на весь запуск main.py (задается через set_shared_client)
+_shared_client: Optional[OpenRouterClient] = None
+
+
+def set_shared_client(client: Optional[OpenRouterClient]) -> None:
+    """
+    Задает общий клиент, который будут использовать openrouter_async и проверка моделью.
+    None - вернуться к отдельной сессии на каждый запрос.
+    """
+    global _shared_client
+    _shared_client = client
+
+
+def get_shared_client() -> Optional[OpenRouterClient]:
+    """Возвращает общий клиент или None, если он не задан."""
+    return _shared_client
+
+
+def _client_for_current_loop() -> Optional[OpenRouterClient]:
+    """Общий клиент, если его сессия принадлежит текущему циклу событий."""
+    client = _shared_client
+    if client is None or client.loop is None:
+        return client
+    return client if client.loop is asyncio.get_running_loop() else None
+
+
 async def openrouter_async(
     model: str = "",
     role: str = "",
@@ -20,9 +496,14 @@ async def openrouter_async(
     param: Optional[Dict] = None,
     response_format: Optional[Dict] = None,
     extra_body: Optional[Dict] = None,
+    suffix: Optional[str] = None,
+    cache_prompt: bool = False,
+    guard=None,
 ) -> Dict[str, int]:
     """
     Асинхронный запрос к OpenRouter через aiohttp.
+    Использует общий клиент (set_shared_client), если он задан,
+    иначе открывает отдельную сессию на один запрос.
 
     :param model: Название модели (обязательно)
     :param role: Системный промпт
@@ -30,90 +511,105 @@ async def openrouter_async(
     :param param: Доп. параметры (temperature, max_tokens и т.п.)
     :param response_format: Для JSON-ответов, например {"type": "json_object"}
     :param extra_body: Доп. поля, например {"provider": {"id": "baseten"}}
-    :return: {"answer": "...", "prompt_tokens": "...", "completion_tokens": "..."}
-    """
-    # Базовые параметры
-    param = param or {}
-    args = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": role},
-            {"role": "user", "content": prompt}
-        ],
-        **{k: v for k, v in param.items() if v is not None}
-    }
+    :param suffix: Изменяемая часть сообщения пользователя (вопрос), добавляется после prompt
+    :param cache_prompt: Пометить role и prompt для кэширования у провайдера (cache_control),
+                         suffix передается отдельной частью сообщения
+    :param guard: Проверка ответа по мере получения (режим stream, например report/json_guard.JsonGuard):
+                  поток прерывается, как только ответ уже не может быть верным
+    :return: {"answer": "...", "prompt_tokens": "...", "completion_tokens": "...", "latency": "..."},
+             для ответа из кэша дополнительно "cached": True, а latency - исходное время ответа,
+             в режиме stream дополнительно "ttft", "inter_token_latency", "tokens_per_second",
+             для ответа от провайдера - "timings" с длительностью фаз запроса
+             и "retries" - количество повторов запроса;
+             "cached_tokens", "cache_write_tokens" - токены промпта, прочитанные из кэша провайдера и записанные в него;
+             для прерванного потока - "aborted" с причиной и частичный ответ
+    """
+    kwargs = dict(
+        model=model,
+        role=role,
+        prompt=prompt,
+        param=param,
+        response_format=response_format,
+        extra_body=extra_body,
+        suffix=suffix,
+        cache_prompt=cache_prompt,
+        guard=guard,
+    )
+    client = _client_for_current_loop()
+    if client is not None:
+        return await client.chat(**kwargs)
 
-    # Добавляем опциональные поля
-    if response_format:
-        args["response_format"] = {k: v for k, v in response_format.items() if v}
-    if extra_body:
-        args["extra_body"] = {k: v for k, v in extra_body.items() if v}
-
-    # Заголовки
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",  # ← Замени на свой
-        "Content-Type": "application/json",
-        # Опционально: для рейтинга на openrouter.ai
-        "HTTP-Referer": "http://localhost:8000",
-        "X-Title": "Мой Бот",
-    }
+    async with OpenRouterClient() as client:
+        return await client.chat(**kwargs)
 
-    # Отправляем запрос
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                json=args,
-                headers=headers
-            ) as response:
-                data = await response.json()
-                if response.status != 200:
-                    error_message = data.get("error", {}).get("message", str(data))
-                    return {"error": error_message}
-
-        # Извлекаем ответ
-        answer = data["choices"][0]["message"]["content"]
-        prompt_tokens = data["usage"]["prompt_tokens"]
-        completion_tokens = data["usage"]["completion_tokens"]
-
-        return {
-            "answer": answer,
-            "prompt_tokens": int(prompt_tokens),
-            "completion_tokens": int(completion_tokens),
-        }
-    except Exception as e:
-        return {"error": str(e)}
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Выполняет корутину провайдера из синхронного кода.
+    Если общий клиент работает в цикле событий другого потока, корутина
+    выполняется в этом цикле (через его пул соединений), иначе - через asyncio.run.
+
+    :param coro: Корутина, например openrouter_async(...)
+    :return: Результат корутины
+    """
+    client = _shared_client
+    loop = client.loop if client is not None else None
+    if loop is not None and loop.is_running():
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not loop:
+            return asyncio.run_coroutine_threadsafe(coro, loop).result()
+    return asyncio.run(coro)
+
+
+# Каталог моделей OpenRouter (создается при первом обращении или через set_catalog)
+_catalog: Optional[ModelCatalog] = None
+
+
+def set_catalog(catalog: Optional[ModelCatalog]) -> None:
+    """Задает каталог моделей OpenRouter (например, с другим TTL или файлом кэша)."""
+    global _catalog
+    _catalog = catalog
+
+
+def get_catalog() -> ModelCatalog:
+    """Возвращает каталог моделей OpenRouter, создавая его с настройками по умолчанию."""
+    global _catalog
+    if _catalog is None:
+        _catalog = ModelCatalog(
+            url=f"{API_URL}/models",
+            headers={"Authorization": f"Bearer {API_KEY}"},
+        )
+    return _catalog
 
 
 def get_model_details(model_name: str) -> Optional[Dict]:
     """
     Возвращает детали указанной модели с OpenRouter.
+    Список моделей берется из каталога (скачивается один раз и кэшируется на диске).
 
     :param model_name: Название модели, например: "openai/gpt-3.5-turbo"
     :return: Словарь с информацией о модели или None, если не найдена.
     """
-    url = "https://openrouter.ai/api/v1/models"
-    headers = {"Authorization": f"Bearer {API_KEY}"}
-
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        models = response.json().get("data", [])
-
-        # Ищем нужную модель по 'id'
-        for model in models:
-            if model["id"] == model_name:
-                return {
-                    "id": model["id"],
-                    "name": model.get("name", "Неизвестно"),
-                    "context_length": model.get("context_length", 0),
-                    "pricing": model.get("pricing", {}),
-                    "capabilities": model.get("capabilities", {}),
-                    "provider": model.get("provider", {}).get("name", "Неизвестно"),
-                    "updated": model.get("updated", "Неизвестно")
-                }
-        return None  # Модель не найдена
+    return get_catalog().get(model_name)
+
+
+class OpenRouterProvider(Provider):
+    """
+    Провайдер по умолчанию (модели без префикса): запросы через openrouter_async
+    (общий клиент set_shared_client), каталог - get_catalog().
+    """
+    name = ""
+
+    @property
+    def catalog(self) -> ModelCatalog:
+        return get_catalog()
+
+    def hedging(self) -> bool:
+        client = get_shared_client()
+        return client is not None and client.hedge is not None
 
-    except requests.exceptions.RequestException as e:
-        print(f"Ошибка API: {e}")
-        return None
+    async def chat(self, **kwargs) -> Dict:
+        return await openrouter_async(**kwargs)
@@ -0,0 +1,161 @@
+"""
+Провайдер для OpenAI-совместимых серверов (llama.cpp, vLLM, Ollama и т.п.),
+например для локальных моделей на своем оборудовании.
+
+Запросы идут на {base_url}/chat/completions тем же клиентом, что и к OpenRouter
+(пул соединений, режим stream, повторы, кэш ответов). Каталог моделей - список
+{base_url}/models с сервера или заданный в настройках; цены за токен задаются
+в настройках (по умолчанию 0), так как сервер их не сообщает.
+
+Настройки в run_settings.json (поле "providers"):
+    "local": {
+        "base_url": "http://127.0.0.1:8080/v1",
+        "api_key_env": "LOCAL_API_KEY",
+        "models": ["llama3"],
+        "pricing": {"prompt": "0.00000002", "completion": "0.00000006"},
+        "model_pricing": {"llama3": {"prompt": "0", "completion": "0"}},
+        "pool_limit": 4
+    }
+"""
+import os
+import asyncio
+from typing import Dict, List, Optional
+
+from providers.base import Provider
+from providers.catalog import ModelCatalog
+from providers.open_router import OpenRouterClient
+from providers.response_cache import ResponseCache
+from providers.throttle import RetryPolicy
+
+
+class LocalModelCatalog(ModelCatalog):
+    """
+    Каталог OpenAI-совместимого сервера: модели - из {base_url}/models
+    (или заданный список, тогда сервер не опрашивается), цены - из настроек.
+    На диск не сохраняется: список моделей своего сервера запрашивается один раз за запуск.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict] = None,
+        models: Optional[List[str]] = None,
+        pricing: Optional[Dict] = None,
+        model_pricing: Optional[Dict[str, Dict]] = None,
+    ):
+        """
+        :param url: Адрес списка моделей, например http://127.0.0.1:8080/v1/models
+        :param headers: Заголовки запроса (авторизация)
+        :param models: Список id моделей (None - запросить у сервера)
+        :param pricing: Цены за токен по умолчанию: {"prompt": ..., "completion": ...}
+        :param model_pricing: Цены отдельных моделей: {"id модели": {"prompt": ..., "completion": ...}}
+        """
+        super().__init__(url, headers=headers, cache_path=None)
+        self.models = models
+        self.default_pricing = pricing or {}
+        self.model_pricing = model_pricing or {}
+
+    def _fetch(self) -> bool:
+        if self.models is None:
+            return super()._fetch()
+        self._fetched = True
+        self._index = {model_id: {"id": model_id, "name": model_id} for model_id in self.models}
+        return True
+
+    def get(self, model_id: str) -> Optional[Dict]:
+        details = super().get(model_id)
+        if details is None:
+            return None
+        return {**details, "pricing": self.model_pricing.get(model_id, self.default_pricing)}
+
+
+class OpenAICompatProvider(Provider):
+    """Провайдер OpenAI-совместимого сервера с префиксом name ("local:llama3")."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        api_key: Optional[str] = None,
+        models: Optional[List[str]] = None,
+        pricing: Optional[Dict] = None,
+        model_pricing: Optional[Dict[str, Dict]] = None,
+        pool_limit: int = 100,
+        cache: Optional[ResponseCache] = None,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        """
+        :param name: Префикс провайдера в id модели
+        :param base_url: Адрес API сервера, например http://127.0.0.1:8080/v1
+        :param api_key: Ключ API (None - без авторизации)
+        :param models: Список id моделей (None - запросить у сервера)
+        :param pricing: Цены за токен по умолчанию
+        :param model_pricing: Цены отдельных моделей
+        :param pool_limit: Одновременных соединений с сервером (0 - без ограничений)
+        :param cache: Кэш ответов (None - не использовать)
+        :param retry: Правила повтора при 429 и временных ошибках (None - без повторов)
+        """
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.pool_limit = pool_limit
+        self.cache = cache
+        self.retry = retry
+        self._catalog = LocalModelCatalog(
+            url=f"{base_url.rstrip('/')}/models",
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else None,
+            models=models,
+            pricing=pricing,
+            model_pricing=model_pricing,
+        )
+        self.client = self._make_client()
+
+    @classmethod
+    def from_settings(
+        cls, name: str, settings: Dict, cache: Optional[ResponseCache] = None, retry: Optional[RetryPolicy] = None
+    ) -> "OpenAICompatProvider":
+        """
+        Провайдер по настройкам из run_settings.json (см. описание модуля).
+        Ключ API берется из переменной окружения api_key_env.
+        """
+        api_key_env = settings.get("api_key_env")
+        return cls(
+            name=name,
+            base_url=settings["base_url"],
+            api_key=os.getenv(api_key_env) if api_key_env else None,
+            models=settings.get("models"),
+            pricing=settings.get("pricing"),
+            model_pricing=settings.get("model_pricing"),
+            pool_limit=settings.get("pool_limit", 100),
+            cache=cache,
+            retry=retry,
+        )
+
+    def _make_client(self) -> OpenRouterClient:
+        return OpenRouterClient(
+            limit=self.pool_limit,
+            cache=self.cache,
+            base_url=self.base_url,
+            retry=self.retry,
+            api_key=self.api_key,
+            cache_scope=self.name,
+        )
+
+    @property
+    def catalog(self) -> LocalModelCatalog:
+        return self._catalog
+
+    async def chat(self, **kwargs) -> Dict:
+        client = self.client
+        if client.loop is None or client.loop is asyncio.get_running_loop():
+            return await client.chat(**kwargs)
+        # Сессия клиента принадлежит другому циклу событий (синхронный вызов через asyncio.run)
+        async with self._make_client() as client:
+            return await client.chat(**kwargs)
+
+    async def start(self) -> "OpenAICompatProvider":
+        await self.client.start()
+        return self
+
+    async def close(self) -> None:
+        await self.client.close()
@@ -0,0 +1,123 @@
+"""
+Реестр провайдеров моделей.
+Провайдер выбирается по префиксу id модели в наборе тестов: "local:llama3" -
+модель "llama3" провайдера "local". Модели без префикса (и с префиксом,
+для которого нет провайдера, например "vendor/model:free") запрашиваются у OpenRouter.
+В отчетах, базе результатов и журнале модель везде записывается с префиксом.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from providers.base import Provider
+from providers.open_router import OpenRouterProvider
+from providers.openai_compat import OpenAICompatProvider
+from providers.response_cache import ResponseCache
+from providers.throttle import RetryPolicy
+
+PREFIX_SEPARATOR = ":"
+
+# Типы провайдеров для настроек run_settings.json: {"type": класс}
+PROVIDER_TYPES = {
+    "openai": OpenAICompatProvider,
+}
+
+
+class ProviderRegistry:
+    """
+    Провайдеры по префиксам. Методы get, pricing и context_length работают
+    как у каталога моделей, но с полным id модели (с префиксом).
+    """
+
+    def __init__(self, default: Optional[Provider] = None, providers: Optional[List[Provider]] = None):
+        """
+        :param default: Провайдер моделей без префикса (по умолчанию - OpenRouter)
+        :param providers: Провайдеры с префиксами
+        """
+        self.default = default or OpenRouterProvider()
+        self.providers: Dict[str, Provider] = {}
+        for provider in providers or []:
+            self.register(provider)
+
+    def register(self, provider: Provider) -> None:
+        self.providers[provider.name] = provider
+
+    def resolve(self, model: str) -> Tuple[Provider, str]:
+        """
+        Провайдер модели и id модели у этого провайдера.
+
+        :param model: id модели из набора тестов, например "local:llama3"
+        :return: (провайдер, id без префикса)
+        """
+        prefix, separator, model_id = model.partition(PREFIX_SEPARATOR)
+        provider = self.providers.get(prefix) if separator else None
+        if provider is None:
+            return self.default, model
+        return provider, model_id
+
+    # --- Каталог всех провайдеров --- #
+
+    def get(self, model: str) -> Optional[Dict]:
+        provider, model_id = self.resolve(model)
+        return provider.catalog.get(model_id)
+
+    def pricing(self, model: str) -> Dict[str, float]:
+        provider, model_id = self.resolve(model)
+        return provider.catalog.pricing(model_id)
+
+    def context_length(self, model: str) -> int:
+        provider, model_id = self.resolve(model)
+        return provider.catalog.context_length(model_id)
+
+    # --- Соединения --- #
+
+    async def start(self) -> "ProviderRegistry":
+        for provider in self.providers.values():
+            await provider.start()
+        return self
+
+    async def close(self) -> None:
+        for provider in self.providers.values():
+            await provider.close()
+
+
+def build_registry(
+    provider_settings: Optional[Dict[str, Dict]],
+    cache: Optional[ResponseCache] = None,
+    retry: Optional[RetryPolicy] = None,
+) -> ProviderRegistry:
+    """
+    Реестр по настройкам run_settings.json ("providers").
+
+    :param provider_settings: {"префикс": {"type": "openai", "base_url": ..., ...}}
+    :param cache: Кэш ответов для провайдеров (None - не использовать)
+    :param retry: Правила повтора запросов (общие с OpenRouter)
+    """
+    registry = ProviderRegistry()
+    for name, settings in (provider_settings or {}).items():
+        kind = settings.get("type", "openai")
+        provider_type = PROVIDER_TYPES.get(kind)
+        if provider_type is None:
+            print(f"Предупреждение: неизвестный тип провайдера '{kind}' для префикса '{name}'. Пропускаем...")
+            continue
+        if not settings.get("base_url"):
+            print(f"Предупреждение: для провайдера '{name}' не задан base_url. Пропускаем...")
+            continue
+        registry.register(provider_type.from_settings(name, settings, cache=cache, retry=retry))
+    return registry
+
+
+# Реестр на весь запуск main.py (задается через set_registry)
+_registry: Optional[ProviderRegistry] = None
+
+
+def set_registry(registry: Optional[ProviderRegistry]) -> None:
+    """Задает реестр провайдеров. None - вернуться к реестру только с OpenRouter."""
+    global _registry
+    _registry = registry
+
+
+def get_registry() -> ProviderRegistry:
+    """Возвращает реестр провайдеров, создавая реестр только с OpenRouter."""
+    global _registry
+    if _registry is None:
+        _registry = ProviderRegistry()
+    return _registry
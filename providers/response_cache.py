@@ -0,0 +1,164 @@
+"""
+Кэш ответов провайдера с адресацией по содержимому запроса.
+
+Ключ - хэш от модели, сообщений, параметров, response_format и extra_body,
+поэтому одинаковый запрос всегда попадает в одну запись. В записи хранятся
+ответ, количество токенов и исходное время ответа.
+
+Режимы работы:
+- off - кэш не используется;
+- record - запросы всегда идут в сеть, ответы записываются в кэш;
+- replay - сеть не используется, ответы берутся только из кэша
+  (время ответа - исходное, сохраненное при записи);
+- read-through - ответ берется из кэша, а при промахе запрашивается и записывается.
+"""
+import os
+import json
+import hashlib
+from time import time
+from typing import Dict, Literal, Optional
+
+CacheMode = Literal["off", "record", "replay", "read-through"]
+CACHE_MODES = ("off", "record", "replay", "read-through")
+
+
+class ResponseCache:
+    """
+    Дисковый кэш ответов: одна запись - один JSON-файл cache/responses/<xx>/<hash>.json.
+    Устаревшие записи (старше max_age) и самые старые записи сверх max_size_mb удаляются в evict().
+    """
+
+    def __init__(
+        self,
+        path: str = "cache/responses",
+        mode: CacheMode = "off",
+        max_age: Optional[float] = None,
+        max_size_mb: Optional[float] = None,
+    ):
+        """
+        :param path: Папка кэша
+        :param mode: Режим работы (off, record, replay, read-through)
+        :param max_age: Максимальный возраст записи, сек (None - без ограничения)
+        :param max_size_mb: Максимальный размер кэша, МБ (None - без ограничения)
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Неизвестный режим кэша ответов '{mode}'. Допустимые: {', '.join(CACHE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.max_age = max_age
+        self.max_size_mb = max_size_mb
+
+    @property
+    def reads(self) -> bool:
+        """Читать ли ответы из кэша."""
+        return self.mode in ("replay", "read-through")
+
+    @property
+    def writes(self) -> bool:
+        """Записывать ли ответы в кэш."""
+        return self.mode in ("record", "read-through")
+
+    @staticmethod
+    def make_key(request: Dict) -> str:
+        """
+        Хэш запроса. Сериализация с сортировкой ключей, чтобы порядок полей не влиял на ключ.
+
+        :param request: Тело запроса (model, messages, параметры, response_format, extra_body)
+        """
+        data = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Возвращает сохраненный ответ или None.
+        Ответ содержит поле "latency" (исходное время) и отметку "cached": True.
+        """
+        file_path = self._file(key)
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if self.max_age is not None and time() - record.get("created_at", 0) > self.max_age:
+            self._remove(file_path)
+            return None
+
+        os.utime(file_path)  # Время последнего использования - для вытеснения по размеру
+        result = dict(record.get("result", {}))
+        result["cached"] = True
+        return result
+
+    def put(self, key: str, result: Dict) -> None:
+        """
+        Сохраняет ответ. Ошибочные ответы не сохраняются.
+
+        :param key: Ключ запроса (make_key)
+        :param result: Результат запроса с полями answer, prompt_tokens, completion_tokens, latency
+        """
+        if "error" in result:
+            return
+        file_path = self._file(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        record = {
+            "created_at": time(),
+            "result": {k: v for k, v in result.items() if k not in ("cached", "timings", "retries", "hedge")},
+        }
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, file_path)
+
+    def evict(self) -> int:
+        """
+        Удаляет записи старше max_age, затем самые давно использованные,
+        пока размер кэша больше max_size_mb.
+
+        :return: Количество удаленных записей
+        """
+        if not os.path.isdir(self.path):
+            return 0
+
+        entries = []  # (время использования, размер, путь)
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith(".json"):
+                    file_path = os.path.join(root, name)
+                    stat = os.stat(file_path)
+                    entries.append((stat.st_mtime, stat.st_size, file_path))
+
+        removed = 0
+        now = time()
+        if self.max_age is not None:
+            fresh = []
+            for entry in entries:
+                # Время использования не меньше времени создания, поэтому такая запись точно устарела.
+                # Используемые, но давно созданные записи удаляются при чтении в get().
+                if now - entry[0] > self.max_age:
+                    self._remove(entry[2])
+                    removed += 1
+                else:
+                    fresh.append(entry)
+            entries = fresh
+
+        if self.max_size_mb is not None:
+            limit = self.max_size_mb * 1024 * 1024
+            total = sum(size for _, size, _ in entries)
+            for _, size, file_path in sorted(entries):
+                if total <= limit:
+                    break
+                self._remove(file_path)
+                total -= size
+                removed += 1
+
+        return removed
+
+    @staticmethod
+    def _remove(file_path: str) -> None:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
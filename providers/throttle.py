@@ -0,0 +1,180 @@
+"""
+Ограничение частоты запросов и повтор запросов при ошибках провайдера.
+
+- TokenBucket - "ведро токенов": не больше rate запросов в секунду с запасом capacity;
+  после ответа 429 ведро приостанавливается на время из заголовка Retry-After.
+- Throttle - ведра по моделям и по провайдерам (префикс id модели до "/").
+- RetryPolicy - экспоненциальная задержка со случайным разбросом (full jitter),
+  учет Retry-After и общий на запуск бюджет повторов.
+"""
+import random
+import asyncio
+from time import monotonic
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+# Коды ответа, при которых запрос имеет смысл повторить
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Ведро токенов для асинхронного кода. Каждый запрос забирает один токен,
+    токены пополняются со скоростью rate в секунду до capacity.
+    rate=None - без ограничения частоты (работает только пауза после 429).
+    """
+
+    def __init__(self, rate: Optional[float] = None, capacity: Optional[float] = None):
+        """
+        :param rate: Запросов в секунду (None - без ограничения)
+        :param capacity: Сколько запросов можно отправить подряд (по умолчанию max(1, rate))
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate or 1.0)
+        self._tokens = self.capacity
+        self._updated = monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены ближайшие seconds секунд (например, по Retry-After)."""
+        self._paused_until = max(self._paused_until, monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        """Ждет, пока можно будет отправить запрос, и забирает токен."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if not self.rate:
+                    return
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Throttle:
+    """
+    Ограничение частоты запросов по моделям и по провайдерам.
+    Запрос ждет свободный токен в ведре провайдера, затем в ведре модели.
+    """
+
+    def __init__(
+        self,
+        default_rate: Optional[float] = None,
+        model_rates: Optional[Dict[str, float]] = None,
+        provider_rates: Optional[Dict[str, float]] = None,
+        burst: Optional[float] = None,
+    ):
+        """
+        :param default_rate: Запросов в секунду к одной модели по умолчанию (None - без ограничения)
+        :param model_rates: {"id модели": запросов в секунду}
+        :param provider_rates: {"провайдер": запросов в секунду}, провайдер - префикс id модели до "/"
+        :param burst: Сколько запросов можно отправить подряд (по умолчанию max(1, rate))
+        """
+        self.default_rate = default_rate
+        self.model_rates = model_rates or {}
+        self.provider_rates = provider_rates or {}
+        self.burst = burst
+        self._models: Dict[str, TokenBucket] = {}
+        self._providers: Dict[str, TokenBucket] = {}
+
+    @staticmethod
+    def provider_of(model: str) -> str:
+        return model.split("/", 1)[0]
+
+    def _model_bucket(self, model: str) -> TokenBucket:
+        if model not in self._models:
+            self._models[model] = TokenBucket(self.model_rates.get(model, self.default_rate), self.burst)
+        return self._models[model]
+
+    def _provider_bucket(self, model: str) -> Optional[TokenBucket]:
+        provider = self.provider_of(model)
+        if provider not in self.provider_rates:
+            return None
+        if provider not in self._providers:
+            self._providers[provider] = TokenBucket(self.provider_rates[provider], self.burst)
+        return self._providers[provider]
+
+    async def acquire(self, model: str) -> None:
+        """Ждет разрешения на запрос к модели."""
+        provider_bucket = self._provider_bucket(model)
+        if provider_bucket is not None:
+            await provider_bucket.acquire()
+        await self._model_bucket(model).acquire()
+
+    def pause(self, model: str, seconds: float) -> None:
+        """Приостанавливает запросы к модели (после ответа 429)."""
+        self._model_bucket(model).pause(seconds)
+
+
+class RetryPolicy:
+    """
+    Правила повтора запроса: не больше max_retries повторов на запрос
+    и не больше retry_budget повторов на весь запуск (None - без общего ограничения).
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        retry_budget: Optional[int] = None,
+    ):
+        """
+        :param max_retries: Повторов одного запроса
+        :param base_delay: Начальная задержка, сек (удваивается с каждой попыткой)
+        :param max_delay: Максимальная задержка, сек
+        :param retry_budget: Повторов на весь запуск (None - без ограничения)
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget
+        self.retries = 0  # Сколько повторов уже сделано за запуск
+
+    def allow(self, attempt: int) -> bool:
+        """
+        Можно ли повторить запрос после попытки номер attempt (с 0).
+        Если можно, повтор списывается из бюджета.
+        """
+        if attempt >= self.max_retries:
+            return False
+        if self.retry_budget is not None and self.retries >= self.retry_budget:
+            return False
+        self.retries += 1
+        return True
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Задержка перед повтором: Retry-After (с небольшим разбросом, чтобы параллельные
+        запросы не вернулись одновременно) или случайная задержка до base_delay * 2^attempt.
+        """
+        if retry_after is not None:
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Значение заголовка Retry-After в секундах (число секунд или HTTP-дата)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
@@ -1,14 +1,30 @@
 #!/usr/bin/env python
 """
 Модуль для сравнения эталонных и тестовых ответов с гибкими настройками.
+Ядро сравнения асинхронное: проверки моделью-валидатором не блокируют
+цикл событий и выполняются параллельно (compare_async).
+Перед ядром стоит compare_answer: одинаковые по каноническому JSON ответы
+засчитываются сразу, а вердикты запоминаются на время запуска (VerdictMemo).
 """
 
+import json
 import asyncio
-from typing import Dict, Any, List
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import astuple, replace
+from typing import Dict, Any, List, Optional, Tuple
 from fuzzywuzzy import fuzz
 
+try:  # Быстрая матрица схожести для длинных списков строк (numpy - в requirements.txt)
+    import numpy as np
+    from rapidfuzz import fuzz as rf_fuzz
+    from rapidfuzz.process import cdist
+except ImportError:
+    cdist = None
+
 from comparison_settings import ComparisonSettings
-from providers.open_router import openrouter_async
+from report.judge import get_judge
 
 
 # --- Вспомогательные функции --- #
@@ -24,37 +40,27 @@ def _compare_strings_by_similarity(control_str: str, test_str: str, threshold: i
     """
     return fuzz.ratio(control_str.lower(), test_str.lower()) >= threshold
 
-def _compare_by_model(control_answer: str, model_answer: str, question: str) -> bool:
+async def _compare_by_model(control_answer: str, model_answer: str, question: str) -> bool:
     """
     Сравнивает два текстовых ответа с помощью LLM,
     использует вопрос для оценки.
+    Проверки собираются в пакеты и запоминаются (см. report/judge.py).
     Возвращает True, если модель считает ответы эквивалентными.
     """
-    param = {"temperature": 0.2}
-    prompt = f"""
-    Ты должен проверить смысловую схожесть 
-    проверяемого ответа "{model_answer}"
-    с контрольным "{control_answer}".
-    Для проверки может понадобиться вопрос на который дан ответ
-    "{question}".
-    Ответь цифрой: 1 - если правильно или 0 - если не правильно.
-    Не комментируй, без знаков препинания.
-    """
-    result = asyncio.run(openrouter_async(
-        model="mistralai/codestral-2508",
-        role="Ты проверяешь правильность ответа",
-        prompt=prompt,
-        param=param,
-    ))
     try:
-        answer = result.get("answer", "")
-        return answer == "1"
-    except:
+        judge = get_judge()
+        loop = asyncio.get_running_loop()
+        if judge.loop is not None and judge.loop is not loop and judge.loop.is_running():
+            # Валидатор работает в цикле событий другого потока (вызов через синхронный compare)
+            future = asyncio.run_coroutine_threadsafe(judge.verdict(question, control_answer, model_answer), judge.loop)
+            return await asyncio.wrap_future(future)
+        return await judge.verdict(question, control_answer, model_answer)
+    except Exception:
         return False
 
 
 # --- Основные функции рекурсивного сравнения --- #
-def _compare_recursive(
+async def _compare_recursive(
     control: Any, 
     test: Any, 
     settings: ComparisonSettings, 
@@ -76,86 +82,342 @@ def _compare_recursive(
 
     # 2. Выбор обработчика в зависимости от типа
     if isinstance(control, dict):
-        return _compare_dicts(control, test, settings)
+        return await _compare_dicts(control, test, settings)
     
     if isinstance(control, list):
-        return _compare_lists(control, test, settings)
+        return await _compare_lists(control, test, settings)
 
     if isinstance(control, (int, float)):
         return abs(control - test) <= settings.num_tolerance
 
     if isinstance(control, str):
         # В зависимости от контекста, выбираем нужный метод сравнения строк
-        if context == 'dict':
-            method = settings.dict_str_comparison_method
-            threshold = settings.dict_str_similarity_threshold
-        elif context == 'list':
-            method = settings.list_str_comparison_method
-            threshold = settings.list_str_similarity_threshold
-        else: # context == 'text'
-            method = settings.text_comparison_method
-            threshold = settings.text_similarity_threshold
+        method, threshold = _string_method(context, settings)
 
         # Применяем выбранный метод
         if method == 'model':
-            return _compare_by_model(control, test, settings.question)
+            return await _compare_by_model(control, test, settings.question)
         else: # similarity
             return _compare_strings_by_similarity(control, test, threshold)
 
     # 3. Для всех остальных простых типов (bool, None и т.д.)
     return control == test
 
-def _compare_dicts(control: Dict[str, Any], test: Dict[str, Any], settings: ComparisonSettings) -> bool:
+async def _compare_dicts(control: Dict[str, Any], test: Dict[str, Any], settings: ComparisonSettings) -> bool:
     """
     Специализированная функция для рекурсивного сравнения словарей.
     Проверяет, что все ключи из эталонного словаря есть в тестовом, 
     игнорируя при этом лишние ключи в тестовом.
+    Значения без проверок валидатором сравниваются сразу, до первого несовпадения.
+    Значения с проверками валидатором сравниваются параллельно (попадают в один пакет)
+    и только если словарь еще может совпасть.
     """
     # Проверяем, что в тестовом словаре есть все ключи из эталонного
     if not all(key in test for key in control.keys()):
         return False
 
-    # Сравниваем значения для каждого ключа
+    # Сравниваем значения для каждого ключа, передавая контекст 'dict'
+    judged = []
     for key, control_value in control.items():
-        test_value = test[key]
-        # Вызываем рекурсивное сравнение, передавая контекст 'dict'
-        if not _compare_recursive(control_value, test_value, settings, context='dict'):
+        if _may_judge(control_value, 'dict', settings):
+            judged.append(key)
+        elif not await _compare_recursive(control_value, test[key], settings, context='dict'):
             return False
-            
-    return True
+    if any(_cannot_match(control[key], test[key], settings, 'dict') for key in judged):
+        return False
+    results = await asyncio.gather(*(
+        _compare_recursive(control[key], test[key], settings, context='dict') for key in judged
+    ))
+    return all(results)
 
-def _compare_lists(control: List[Any], test: List[Any], settings: ComparisonSettings) -> bool:
+async def _compare_lists(control: List[Any], test: List[Any], settings: ComparisonSettings) -> bool:
     """
     Специализированная функция для сравнения списков как "мешков" (без учета порядка).
+    Ищет паросочетание, в котором каждому эталонному элементу найдена своя пара:
+    1. Одинаковые элементы (по каноническому JSON) сразу составляют пары.
+    2. Для остальных строк при сравнении по схожести проценты считаются одной матрицей
+       (rapidfuzz.process.cdist), прочие пары сравниваются рекурсивно и только по мере надобности:
+       вся строка эталонного элемента сразу, параллельно.
+    3. Недостающие пары подбираются увеличивающими путями (алгоритм Куна), поэтому
+       результат не зависит от порядка элементов, в отличие от жадного перебора.
     """
     if len(control) != len(test):
         return False
+    n = len(control)
 
-    # Создаем копию, чтобы из нее можно было удалять элементы
-    test_copy = list(test)
-    
-    for control_item in control:
-        match_found_for_control_item = False
-        # Ищем подходящий элемент в тестовом списке
-        for i, test_item in enumerate(test_copy):
-            # Вызываем рекурсивное сравнение, передавая контекст 'list'
-            if _compare_recursive(control_item, test_item, settings, context='list'):
-                match_found_for_control_item = True
-                del test_copy[i] # Удаляем найденный элемент, чтобы он не участвовал в других сравнениях
-                break
-        
-        # Если для элемента из эталонного списка не нашлось пары в тестовом
-        if not match_found_for_control_item:
+    # pair_of_control[i] - индекс пары в test, pair_of_test[j] - индекс пары в control (-1 - нет пары)
+    pair_of_control = [-1] * n
+    pair_of_test = [-1] * n
+
+    # 1. Точные совпадения
+    free_by_key: Dict[str, List[int]] = {}
+    for j in reversed(range(n)):
+        free_by_key.setdefault(_canonical(test[j]), []).append(j)
+    for i, control_item in enumerate(control):
+        candidates = free_by_key.get(_canonical(control_item))
+        if candidates:
+            j = candidates.pop()
+            pair_of_control[i] = j
+            pair_of_test[j] = i
+
+    unmatched = [i for i in range(n) if pair_of_control[i] == -1]
+    if not unmatched:
+        return True
+
+    # 2. Совместимые пары. Строки (при сравнении по схожести) - одной матрицей,
+    # остальные элементы - при первой надобности, всей строкой сразу
+    neighbours: Dict[int, List[int]] = {}
+    if settings.list_str_comparison_method != 'model':
+        rows = [i for i in range(n) if isinstance(control[i], str)]
+        neighbours.update(_similarity_neighbours(control, test, rows, settings.list_str_similarity_threshold))
+
+    async def candidates_for(i: int) -> List[int]:
+        if i not in neighbours:
+            results = await asyncio.gather(*(
+                _compare_recursive(control[i], test_item, settings, context='list') for test_item in test
+            ))
+            neighbours[i] = [j for j, ok in enumerate(results) if ok]
+        return neighbours[i]
+
+    # 3. Увеличивающие пути (поиск в ширину по чередующимся ребрам)
+    for start in unmatched:
+        came_from = {}  # test j -> control i, из которого пришли в j
+        queue = [start]
+        found = -1
+        while queue and found == -1:
+            next_queue = []
+            for i in queue:
+                for j in await candidates_for(i):
+                    if j in came_from:
+                        continue
+                    came_from[j] = i
+                    if pair_of_test[j] == -1:
+                        found = j
+                        break
+                    next_queue.append(pair_of_test[j])
+                if found != -1:
+                    break
+            queue = next_queue
+
+        # Для элемента из эталонного списка не нашлось пары в тестовом
+        if found == -1:
             return False
-            
+
+        # Перестраиваем пары вдоль найденного пути
+        j = found
+        while j != -1:
+            i = came_from[j]
+            previous = pair_of_control[i]
+            pair_of_control[i] = j
+            pair_of_test[j] = i
+            j = previous
+
     return True
 
+def _string_method(context: str, settings: ComparisonSettings) -> Tuple[str, int]:
+    """Метод сравнения строк и порог схожести для контекста ('dict', 'list' или 'text')."""
+    if context == 'dict':
+        return settings.dict_str_comparison_method, settings.dict_str_similarity_threshold
+    if context == 'list':
+        return settings.list_str_comparison_method, settings.list_str_similarity_threshold
+    return settings.text_comparison_method, settings.text_similarity_threshold
+
+def _may_judge(control: Any, context: str, settings: ComparisonSettings) -> bool:
+    """Может ли сравнение с эталонным значением обратиться к модели-валидатору."""
+    if isinstance(control, str):
+        return _string_method(context, settings)[0] == 'model'
+    if isinstance(control, dict):
+        return any(_may_judge(value, 'dict', settings) for value in control.values())
+    if isinstance(control, list):
+        return any(_may_judge(item, 'list', settings) for item in control)
+    return False
+
+def _cannot_match(control: Any, test: Any, settings: ComparisonSettings, context: str) -> bool:
+    """
+    Несовпадение, видное без модели-валидатора: типы, ключи словарей, длины списков,
+    числа и строки, сравниваемые по схожести. Строки, проверяемые моделью, и пары
+    элементов списков не сравниваются (False - значения еще могут совпасть).
+    """
+    if type(control) != type(test):
+        return True
+    if isinstance(control, dict):
+        return any(
+            key not in test or _cannot_match(value, test[key], settings, 'dict')
+            for key, value in control.items()
+        )
+    if isinstance(control, list):
+        return len(control) != len(test)
+    if isinstance(control, (int, float)):
+        return abs(control - test) > settings.num_tolerance
+    if isinstance(control, str):
+        method, threshold = _string_method(context, settings)
+        return method != 'model' and not _compare_strings_by_similarity(control, test, threshold)
+    return control != test
+
+def _canonical(value: Any) -> str:
+    """
+    Канонический JSON значения: одинаковые значения дают одинаковую строку
+    (ключи отсортированы, пробелы и запись чисел в исходном тексте не важны).
+    Целые и дробные числа различаются, как и при сравнении (разные типы).
+    """
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+def _similarity_neighbours(
+    control: List[Any],
+    test: List[Any],
+    rows: List[int],
+    threshold: int
+) -> Dict[int, List[int]]:
+    """
+    Схожесть строк control[rows] со всеми строками test одной матрицей.
+    Проценты округляются до целого, как у fuzzywuzzy, поэтому результат
+    совпадает с _compare_strings_by_similarity (в том числе для пустых строк:
+    две пустые строки - 100, пустая и непустая - 0).
+    Без numpy (он нужен rapidfuzz.process.cdist) пары сравниваются по одной.
+
+    :return: {i: индексы строк test, схожесть с которыми не ниже порога}
+    """
+    columns = [j for j, item in enumerate(test) if isinstance(item, str)]
+    if not rows or not columns:
+        return {i: [] for i in rows}
+    if cdist is None:
+        return {
+            i: [j for j in columns if _compare_strings_by_similarity(control[i], test[j], threshold)]
+            for i in rows
+        }
+    scores = np.rint(cdist(
+        [control[i].lower() for i in rows],
+        [test[j].lower() for j in columns],
+        scorer=rf_fuzz.ratio,
+    ))
+    columns = np.array(columns)
+    return {i: columns[scores[r] >= threshold].tolist() for r, i in enumerate(rows)}
+
 
 # --- Публичная функция --- #
 
-def compare(control: Any, test: Any, settings: ComparisonSettings) -> bool:
+async def compare_async(control: Any, test: Any, settings: ComparisonSettings) -> bool:
     """
     Главная точка входа для сравнения. 
     Вызывает рекурсивную функцию с первоначальным контекстом 'text'.
     """
-    return _compare_recursive(control, test, settings, context='text')
+    return await _compare_recursive(control, test, settings, context='text')
+
+class VerdictMemo:
+    """
+    Вердикты сравнения на время запуска: {(хэш эталона, хэш ответа, настройки): вердикт}.
+    Хранится не больше max_size последних вердиктов. Доступ потокобезопасен.
+    """
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._verdicts: "OrderedDict[Tuple, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0  # Вердиктов, взятых из памяти
+        self.identical = 0  # Ответов, совпавших с эталоном по каноническому JSON
+
+    def get(self, key: Tuple) -> Optional[bool]:
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self._verdicts.move_to_end(key)
+                self.hits += 1
+            return verdict
+
+    def put(self, key: Tuple, verdict: bool) -> None:
+        with self._lock:
+            self._verdicts[key] = verdict
+            self._verdicts.move_to_end(key)
+            if len(self._verdicts) > self.max_size:
+                self._verdicts.popitem(last=False)
+
+
+# Общая память вердиктов на время запуска main.py (задается через set_verdict_memo)
+_memo: Optional[VerdictMemo] = None
+
+
+def set_verdict_memo(memo: Optional[VerdictMemo]) -> None:
+    """Задает общую память вердиктов. None - вердикты не запоминаются."""
+    global _memo
+    _memo = memo
+
+
+def get_verdict_memo() -> Optional[VerdictMemo]:
+    return _memo
+
+
+def _digest(value: Any) -> bytes:
+    return hashlib.blake2b(_canonical(value).encode("utf-8"), digest_size=16).digest()
+
+
+# Хэши эталонов: {id(эталон): (эталон, хэш)}. Эталоны - объекты из кэша разобранных тестов,
+# поэтому хэш одного и того же эталона считается один раз (объект проверяется по тождеству).
+_control_digests: Dict[int, Tuple[Any, bytes]] = {}
+_CONTROL_DIGESTS_MAX = 10_000
+
+
+def _control_digest(control: Any) -> bytes:
+    if not isinstance(control, (dict, list)):
+        return _digest(control)
+    cached = _control_digests.get(id(control))
+    if cached is not None and cached[0] is control:
+        return cached[1]
+    if len(_control_digests) >= _CONTROL_DIGESTS_MAX:
+        _control_digests.clear()
+    digest = _digest(control)
+    _control_digests[id(control)] = (control, digest)
+    return digest
+
+
+def _uses_model(control: Any, settings: ComparisonSettings) -> bool:
+    """Может ли сравнение с эталоном control обратиться к модели-валидатору."""
+    if isinstance(control, str):
+        return settings.text_comparison_method == "model"
+    if isinstance(control, (dict, list)):
+        return "model" in (settings.dict_str_comparison_method, settings.list_str_comparison_method)
+    return False
+
+
+def _settings_key(control: Any, settings: ComparisonSettings) -> Tuple:
+    """Настройки, от которых зависит вердикт (вопрос - только при проверке моделью)."""
+    if _uses_model(control, settings):
+        return astuple(settings)
+    return astuple(replace(settings, question=""))
+
+
+async def compare_answer(control: Any, test: Any, settings: ComparisonSettings) -> bool:
+    """
+    Сравнение с быстрым путем и запоминанием вердиктов:
+    1. Ответ, совпадающий с эталоном по каноническому JSON, верен без обхода структуры.
+    2. Вердикт для той же пары (эталон, ответ) с теми же настройками берется из памяти
+       (повторы и одинаковые ответы разных моделей проверяются один раз).
+    3. Иначе - полное сравнение compare_async.
+    Отрицательные вердикты с проверкой моделью не запоминаются: они могут быть
+    следствием ошибки запроса к валидатору (сами вердикты валидатора хранит report/judge.py).
+    """
+    if type(control) is not type(test):
+        return False
+    control_hash, test_hash = _control_digest(control), _digest(test)
+    memo = _memo
+    if control_hash == test_hash:
+        if memo is not None:
+            memo.identical += 1
+        return True
+    if memo is None:
+        return await compare_async(control, test, settings)
+
+    key = (control_hash, test_hash, _settings_key(control, settings))
+    verdict = memo.get(key)
+    if verdict is not None:
+        return verdict
+    verdict = await compare_async(control, test, settings)
+    if verdict or not _uses_model(control, settings):
+        memo.put(key, verdict)
+    return verdict
+
+def compare(control: Any, test: Any, settings: ComparisonSettings) -> bool:
+    """
+    Синхронная обертка над compare_async для вызова вне цикла событий
+    (например, из рабочего потока). Внутри цикла событий используйте compare_async.
+    """
+    return asyncio.run(compare_async(control, test, settings))
@@ -0,0 +1,332 @@
+"""
+Проверка структуры JSON-ответа по мере получения фрагментов (режим stream).
+
+Ответ разбирается потоково, без ожидания конца, и сверяется с формой эталона:
+тип значения верхнего уровня, обязательные ключи словарей, типы их значений
+и длина списков - то же, что требует сравнение report/check.py.
+Как только частичный ответ уже не может совпасть с эталоном (или перестал быть JSON),
+feed() возвращает причину, и запрос можно прервать, не дожидаясь остальных токенов.
+
+Проверяется только то, что приводит к отрицательному вердикту при любом продолжении ответа:
+строки и числа по значению не сравниваются (допуск, схожесть, валидатор).
+Повторяющийся ключ словаря, как и в json.loads, проверяется по последнему вхождению:
+несовпадение значения ключа становится окончательным, только когда словарь закрыт,
+а остаток такого значения проверяется только как JSON.
+"""
+import re
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional
+
+_TYPE_NAMES = {
+    dict: "объект",
+    list: "список",
+    str: "строка",
+    int: "целое число",
+    float: "дробное число",
+    bool: "логическое значение",
+    type(None): "null",
+}
+
+# Слова JSON по первому символу (NaN и Infinity принимает json.loads)
+_LITERALS = {"t": ("true", bool), "f": ("false", bool), "n": ("null", type(None)), "N": ("NaN", float), "I": ("Infinity", float)}
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+_STRING_RUN = re.compile(r'[^"\\\x00-\x1f]*')
+_ESCAPES = frozenset('"\\/bfnrtu')
+_WHITESPACE = " \t\n\r"
+
+
+@dataclass
+class _Shape:
+    """Форма эталонного значения: допустимые типы, обязательные ключи, длина списка."""
+    kinds: Optional[FrozenSet[type]] = None  # None - любой тип
+    keys: Dict[str, "_Shape"] = field(default_factory=dict)  # Обязательные ключи словаря
+    length: Optional[int] = None  # Длина списка
+    item: Optional["_Shape"] = None  # Форма элемента списка
+
+
+_ANY = _Shape()
+
+
+def _shape(value: Any) -> _Shape:
+    """
+    Форма эталона. Элементы списка сравниваются без учета порядка, поэтому для них
+    проверяются только типы, встречающиеся в эталоне, и ключи, общие для всех словарей-элементов.
+    """
+    if isinstance(value, dict):
+        return _Shape(frozenset({dict}), keys={key: _shape(item) for key, item in value.items()})
+    if isinstance(value, list):
+        kinds = frozenset(type(item) for item in value)
+        item = _Shape(kinds)
+        if kinds == {dict}:
+            common = set.intersection(*(set(element) for element in value))
+            item.keys = {key: _ANY for key in value[0] if key in common}
+        return _Shape(frozenset({list}), length=len(value), item=item)
+    return _Shape(frozenset({type(value)}))
+
+
+class _Frame:
+    """Открытый объект или список."""
+    __slots__ = ("kind", "shape", "state", "key", "seen", "failed", "count")
+
+    def __init__(self, kind: type, shape: _Shape):
+        self.kind = kind
+        self.shape = shape
+        self.state = "first"  # first, key, colon, value, next
+        self.key: Optional[str] = None
+        self.seen = set()
+        self.failed: Dict[str, str] = {}  # Ключи, значения которых не совпали с эталоном: {ключ: причина}
+        self.count = 0
+
+
+class JsonGuard:
+    """
+    Потоковая проверка JSON-ответа по форме эталона.
+    Один объект - на один вопрос; reset() перед каждой попыткой запроса.
+    """
+
+    def __init__(self, expected: Any):
+        """
+        :param expected: Эталонный ответ, разобранный как JSON
+        """
+        self.shape = _shape(expected)
+        self.reset()
+
+    def reset(self) -> None:
+        self.failure: Optional[str] = None  # Причина, по которой ответ уже не совпадет с эталоном
+        self._stack: List[_Frame] = []
+        self._done = False  # Значение верхнего уровня закончилось
+        self._token: Optional[str] = None  # Незаконченное значение: string, key, number, literal
+        self._buffer: List[str] = []
+        self._escape = False
+        self._literal = ""
+        self._literal_word = ""
+        self._literal_kind: type = type(None)
+        self._token_shape = _ANY
+
+    def feed(self, text: str) -> Optional[str]:
+        """
+        Разбирает очередной фрагмент ответа.
+
+        :return: Причина несовпадения с эталоном или None, если ответ еще может оказаться верным
+        """
+        if self.failure is None:
+            try:
+                self._feed(text)
+            except _Mismatch as e:
+                self.failure = str(e)
+        return self.failure
+
+    # --- Разбор --- #
+
+    def _feed(self, text: str) -> None:
+        i, n = 0, len(text)
+        while i < n:
+            if self._token in ("string", "key"):
+                i = self._string(text, i)
+                continue
+            c = text[i]
+            if self._token == "number":
+                if c in _NUMBER_CHARS:
+                    self._buffer.append(c)
+                    i += 1
+                    continue
+                if c == "I" and self._buffer == ["-"]:
+                    self._start_literal("-Infinity", float, self._token_shape)
+                    self._literal = "-"
+                else:
+                    self._end_number()
+                    continue
+            if self._token == "literal":
+                self._literal_char(c)
+                i += 1
+                continue
+            if c in _WHITESPACE:
+                i += 1
+                continue
+            self._structure(c)
+            i += 1
+
+    def _structure(self, c: str) -> None:
+        """Символ вне строк, чисел и слов."""
+        if self._done:
+            raise _Mismatch("после JSON идет лишний текст")
+        if not self._stack:
+            self._value(c, self.shape)
+            return
+        frame = self._stack[-1]
+        if frame.kind is dict:
+            if frame.state in ("first", "key"):
+                if c == '"':
+                    self._token = "key"
+                    self._buffer = []
+                elif c == "}" and frame.state == "first":
+                    self._close()
+                else:
+                    raise _Mismatch("ответ не является JSON (ожидался ключ)")
+            elif frame.state == "colon":
+                if c != ":":
+                    raise _Mismatch("ответ не является JSON (ожидалось ':')")
+                frame.state = "value"
+            elif frame.state == "value":
+                frame.seen.add(frame.key)
+                frame.failed.pop(frame.key, None)  # Повтор ключа заменяет прежнее значение
+                self._value(c, frame.shape.keys.get(frame.key, _ANY))
+            elif c == ",":
+                frame.state = "key"
+            elif c == "}":
+                self._close()
+            else:
+                raise _Mismatch("ответ не является JSON (ожидалось ',' или '}')")
+        else:
+            if frame.state == "first" and c == "]":
+                self._close()
+            elif frame.state in ("first", "value"):
+                frame.count += 1
+                if frame.shape.length is not None and frame.count > frame.shape.length:
+                    self._fail(f"в списке больше элементов, чем в эталоне ({frame.shape.length})")
+                self._value(c, frame.shape.item or _ANY)
+            elif c == ",":
+                frame.state = "value"
+            elif c == "]":
+                self._close()
+            else:
+                raise _Mismatch("ответ не является JSON (ожидалось ',' или ']')")
+
+    def _value(self, c: str, shape: _Shape) -> None:
+        """Начало значения с формой эталона shape."""
+        if c == "{":
+            self._stack.append(_Frame(dict, self._check({dict}, shape)))
+        elif c == "[":
+            self._stack.append(_Frame(list, self._check({list}, shape)))
+        elif c == '"':
+            self._check({str}, shape)
+            self._token = "string"
+        elif c == "-" or c.isdigit():
+            self._token = "number"
+            self._token_shape = self._check({int, float}, shape)
+            self._buffer = [c]
+        elif c in _LITERALS:
+            word, kind = _LITERALS[c]
+            self._start_literal(word, kind, self._check({kind}, shape))
+            self._literal = c
+            self._complete_literal()
+        else:
+            raise _Mismatch("ответ не является JSON")
+
+    def _check(self, kinds: set, shape: _Shape) -> _Shape:
+        """Проверяет тип значения. Возвращает форму, по которой разбирать значение дальше."""
+        if shape.kinds is not None and not kinds & shape.kinds:
+            expected = " или ".join(sorted(_TYPE_NAMES[kind] for kind in shape.kinds))
+            actual = "число" if len(kinds) > 1 else _TYPE_NAMES[next(iter(kinds))]
+            self._fail(f"в ответе {actual}, в эталоне {expected}")
+            return _ANY
+        return shape
+
+    def _fail(self, reason: str) -> None:
+        """
+        Несовпадение с эталоном в текущем значении. Если значение относится к ключу словаря,
+        ключ еще может повториться с верным значением: причина запоминается до закрытия словаря,
+        а остаток значения разбирается без формы эталона. Иначе ответ уже не совпадет.
+        """
+        for depth in range(len(self._stack) - 1, -1, -1):
+            owner = self._stack[depth]
+            if owner.kind is dict and owner.state == "value":
+                owner.failed[owner.key] = reason
+                for frame in self._stack[depth + 1:]:
+                    frame.shape = _ANY
+                self._token_shape = _ANY
+                return
+        raise _Mismatch(reason)
+
+    def _close(self) -> None:
+        frame = self._stack.pop()
+        if frame.kind is dict:
+            missing = [key for key in frame.shape.keys if key not in frame.seen]
+            if frame.failed:
+                self._fail(next(iter(frame.failed.values())))
+            elif missing:
+                self._fail("нет ключей: " + ", ".join(missing))
+        elif frame.shape.length is not None and frame.count < frame.shape.length:
+            self._fail(f"в списке {frame.count} элементов вместо {frame.shape.length}")
+        self._end_value()
+
+    def _end_value(self) -> None:
+        self._token = None
+        if self._stack:
+            self._stack[-1].state = "next"
+        else:
+            self._done = True
+
+    def _string(self, text: str, i: int) -> int:
+        """Продолжение строки или ключа с позиции i. Возвращает позицию после разобранной части."""
+        while i < len(text):
+            if self._escape:
+                if text[i] not in _ESCAPES:
+                    raise _Mismatch("ответ не является JSON (ошибка в строке)")
+                if self._token == "key":
+                    self._buffer.append(text[i])
+                self._escape = False
+                i += 1
+                continue
+            run = _STRING_RUN.match(text, i).end()
+            if self._token == "key":
+                self._buffer.append(text[i:run])
+            i = run
+            if i >= len(text):
+                break
+            c = text[i]
+            i += 1
+            if c == "\\":
+                self._escape = True
+                if self._token == "key":
+                    self._buffer.append(c)
+            elif c == '"':
+                if self._token == "key":
+                    self._end_key()
+                else:
+                    self._end_value()
+                return i
+            else:
+                raise _Mismatch("ответ не является JSON (управляющий символ в строке)")
+        return i
+
+    def _end_key(self) -> None:
+        try:
+            key = json.loads('"' + "".join(self._buffer) + '"')
+        except ValueError:
+            raise _Mismatch("ответ не является JSON (ошибка в ключе)")
+        frame = self._stack[-1]
+        frame.key = key
+        frame.state = "colon"
+        self._token = None
+
+    def _end_number(self) -> None:
+        match = _NUMBER.fullmatch("".join(self._buffer))
+        if match is None:
+            raise _Mismatch("ответ не является JSON (ошибка в числе)")
+        kind = float if match.group(1) or match.group(2) else int
+        self._check({kind}, self._token_shape)
+        self._end_value()
+
+    def _start_literal(self, word: str, kind: type, shape: _Shape) -> None:
+        self._token = "literal"
+        self._literal_word = word
+        self._literal_kind = kind
+        self._token_shape = shape
+
+    def _literal_char(self, c: str) -> None:
+        self._literal += c
+        if not self._literal_word.startswith(self._literal):
+            raise _Mismatch("ответ не является JSON")
+        self._complete_literal()
+
+    def _complete_literal(self) -> None:
+        if self._literal == self._literal_word:
+            self._check({self._literal_kind}, self._token_shape)
+            self._end_value()
+
+
+class _Mismatch(Exception):
+    """Частичный ответ уже не может совпасть с эталоном."""
@@ -0,0 +1,294 @@
+"""
+Проверка ответов моделью-валидатором с пакетной отправкой и запоминанием вердиктов.
+
+Запросы на проверку (вопрос, эталон, ответ), поступившие почти одновременно
+(например, от параллельно выполняемых вопросов), собираются в пакет и
+отправляются валидатору одним запросом, который возвращает массив вердиктов.
+Вердикты сохраняются в файл по ключу от нормализованной тройки, поэтому
+одинаковые ответы не проверяются повторно ни в этом, ни в следующих запусках.
+"""
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from providers.open_router import openrouter_async, run_sync
+
+JUDGE_MODEL = "mistralai/codestral-2508"
+
+
+def _single_prompt(control_answer: str, model_answer: str, question: str) -> str:
+    """Промпт для проверки одного ответа."""
+    return f"""
+    Ты должен проверить смысловую схожесть 
+    проверяемого ответа "{model_answer}"
+    с контрольным "{control_answer}".
+    Для проверки может понадобиться вопрос на который дан ответ
+    "{question}".
+    Ответь цифрой: 1 - если правильно или 0 - если не правильно.
+    Не комментируй, без знаков препинания.
+    """
+
+
+def _batch_prompt(triples: List[Tuple[str, str, str]]) -> str:
+    """Промпт для проверки нескольких ответов одним запросом."""
+    items = "\n".join(
+        f"{n}.\n"
+        f"Вопрос: \"{question}\"\n"
+        f"Контрольный ответ: \"{control}\"\n"
+        f"Проверяемый ответ: \"{candidate}\"\n"
+        for n, (question, control, candidate) in enumerate(triples, start=1)
+    )
+    return f"""
+    Ты должен проверить смысловую схожесть каждого проверяемого ответа с контрольным.
+    Для проверки может понадобиться вопрос, на который дан ответ.
+    Верни JSON вида {{"verdicts": [1, 0, ...]}} - ровно {len(triples)} чисел в порядке пунктов:
+    1 - если правильно или 0 - если не правильно.
+    Не комментируй.
+
+{items}"""
+
+
+def normalize(text: str) -> str:
+    """Нормализация текста для ключа: нижний регистр, пробелы схлопнуты."""
+    return " ".join(str(text).split()).lower()
+
+
+def verdict_key(question: str, control: str, candidate: str) -> str:
+    """Ключ вердикта - хэш нормализованной тройки (вопрос, эталон, ответ)."""
+    data = json.dumps([normalize(question), normalize(control), normalize(candidate)], ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """
+    Постоянный кэш вердиктов в JSON-файле {ключ: 0/1}.
+    """
+
+    def __init__(self, file_path: Optional[str] = "cache/judge_verdicts.json"):
+        """
+        :param file_path: Файл кэша, None - хранить только в памяти
+        """
+        self.file_path = file_path
+        self._verdicts: Dict[str, bool] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if file_path:
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    self._verdicts = {k: bool(v) for k, v in json.load(f).items()}
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+
+    def get(self, key: str) -> Optional[bool]:
+        return self._verdicts.get(key)
+
+    def put(self, key: str, verdict: bool) -> None:
+        with self._lock:
+            self._verdicts[key] = verdict
+            self._dirty = True
+
+    def save(self) -> None:
+        """Сохраняет кэш на диск, если он изменился."""
+        with self._lock:
+            if not self.file_path or not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({k: int(v) for k, v in self._verdicts.items()}, f)
+            os.replace(tmp_path, self.file_path)
+            self._dirty = False
+
+
+class BatchJudge:
+    """
+    Модель-валидатор с пакетной отправкой запросов.
+
+    Запрос на проверку ждет в очереди не дольше batch_window секунд или пока
+    не наберется batch_size запросов, затем вся очередь отправляется одним промптом.
+    Одинаковые запросы, ожидающие ответа, объединяются.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[VerdictCache] = None,
+        batch_size: int = 20,
+        batch_window: float = 0.05,
+        model: str = JUDGE_MODEL,
+    ):
+        """
+        :param cache: Кэш вердиктов (None - только в памяти на время запуска)
+        :param batch_size: Максимум проверок в одном запросе
+        :param batch_window: Сколько ждать других проверок перед отправкой, сек
+        :param model: Модель-валидатор
+        """
+        self.cache = cache or VerdictCache(None)
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.model = model
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: List[Tuple[str, Tuple[str, str, str]]] = []
+        self._waiting: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks = set()
+        self._queue_loop: Optional[asyncio.AbstractEventLoop] = None  # Цикл событий очереди и таймера
+
+    def start(self) -> "BatchJudge":
+        """Привязывает валидатор к текущему циклу событий (нужно для verdict_sync из потоков)."""
+        self.loop = asyncio.get_running_loop()
+        return self
+
+    async def close(self) -> None:
+        """Отправляет оставшиеся проверки и сохраняет кэш."""
+        if self._queue:
+            await self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.cache.save()
+        self.loop = None
+
+    # --- Проверка --- #
+
+    async def verdict(self, question: str, control: str, candidate: str) -> bool:
+        """
+        Возвращает True, если валидатор считает ответ правильным.
+        """
+        key = verdict_key(question, control, candidate)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        self._bind_queue()
+        future = self._waiting.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting[key] = future
+            self._queue.append((key, (question, control, candidate)))
+            if len(self._queue) >= self.batch_size:
+                self._spawn(self._flush())
+            elif self._timer is None:
+                self._timer = self._spawn(self._flush_later())
+        return await asyncio.shield(future)
+
+    def verdict_sync(self, question: str, control: str, candidate: str) -> bool:
+        """
+        Синхронная проверка (для вызова из рабочих потоков).
+        Если цикл событий валидатора работает в другом потоке, проверка попадает
+        в общий пакет, иначе выполняется отдельным запросом.
+        """
+        loop = self.loop
+        if loop is not None and loop.is_running():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is not loop:
+                return asyncio.run_coroutine_threadsafe(self.verdict(question, control, candidate), loop).result()
+
+        key = verdict_key(question, control, candidate)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = run_sync(self._ask_single(question, control, candidate))
+        if result is not None:
+            self.cache.put(key, result)
+        return bool(result)
+
+    # --- Отправка пакетов --- #
+
+    def _bind_queue(self) -> None:
+        """
+        Привязывает очередь к текущему циклу событий. Синхронный compare() выполняет каждую
+        проверку в своем asyncio.run, и при его завершении таймер и ожидающие проверки
+        прежнего цикла отменяются - в новом цикле очередь начинается заново.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._queue_loop:
+            self._queue_loop = loop
+            self._queue = []
+            self._waiting = {}
+            self._timer = None
+            self._tasks = set()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        self._timer = None
+        await self._flush()
+
+    async def _flush(self) -> None:
+        """Отправляет очередь пакетами не больше batch_size."""
+        while self._queue:
+            batch = self._queue[:self.batch_size]
+            del self._queue[:self.batch_size]
+            try:
+                verdicts = await self._judge_batch([triple for _, triple in batch])
+            except Exception:
+                verdicts = [None] * len(batch)
+            for (key, _), verdict in zip(batch, verdicts):
+                if verdict is not None:
+                    self.cache.put(key, verdict)
+                future = self._waiting.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_result(bool(verdict))
+
+    async def _judge_batch(self, triples: List[Tuple[str, str, str]]) -> List[Optional[bool]]:
+        """
+        Проверяет пакет. Если ответ валидатора не удалось разобрать
+        (или он не совпадает по длине), пункты проверяются по одному.
+        None - вердикт не получен (ошибка API), такой вердикт не кэшируется.
+        """
+        if len(triples) > 1:
+            result = await openrouter_async(
+                model=self.model,
+                role="Ты проверяешь правильность ответов",
+                prompt=_batch_prompt(triples),
+                param={"temperature": 0.2},
+                response_format={"type": "json_object"},
+            )
+            try:
+                data = json.loads(result.get("answer", ""))
+                verdicts = data.get("verdicts") if isinstance(data, dict) else data
+                if isinstance(verdicts, list) and len(verdicts) == len(triples):
+                    return [v in (1, True) or str(v).strip() == "1" for v in verdicts]
+            except (TypeError, ValueError):
+                pass
+
+        return list(await asyncio.gather(*(self._ask_single(*triple) for triple in triples)))
+
+    async def _ask_single(self, question: str, control: str, candidate: str) -> Optional[bool]:
+        """Проверка одного ответа отдельным запросом."""
+        result = await openrouter_async(
+            model=self.model,
+            role="Ты проверяешь правильность ответа",
+            prompt=_single_prompt(control, candidate, question),
+            param={"temperature": 0.2},
+        )
+        if "error" in result:
+            return None
+        return result.get("answer", "") == "1"
+
+
+# Общий валидатор на весь запуск main.py (задается через set_judge)
+_judge: Optional[BatchJudge] = None
+# Валидатор по умолчанию: пакеты по batch_size по умолчанию, без файла кэша (вердикты помнит только в памяти)
+_default_judge = BatchJudge()
+
+
+def set_judge(judge: Optional[BatchJudge]) -> None:
+    """Задает общий валидатор для report.check. None - вернуть валидатор по умолчанию."""
+    global _judge
+    _judge = judge
+
+
+def get_judge() -> BatchJudge:
+    """Возвращает общий валидатор или валидатор по умолчанию, если общий не задан."""
+    return _judge or _default_judge
@@ -0,0 +1,138 @@
+"""
+Замеры задержек по фазам обработки вопроса и их выгрузка.
+
+Фазы:
+- queue_wait - ожидание слота параллельности (concurrency) перед запросом;
+- throttle_wait - ожидание ограничителя частоты и паузы между повторами запроса;
+- pool_wait - ожидание свободного соединения в пуле клиента;
+- connect - установка соединения (DNS, TCP, TLS; 0 для keep-alive соединения);
+- server - от отправки запроса до получения заголовков ответа (работа модели и сеть);
+- body_read - чтение тела ответа (в режиме stream - весь поток);
+- parse - разбор JSON ответа;
+- compare - проверка ответа (включая модель-валидатор);
+- total - время ответа, по которому считается балл.
+
+По каждой паре (модель, тест) и по модели в целом считаются p50/p90/p99/max.
+Результат сохраняется в JSON и в текстовом формате Prometheus.
+"""
+import os
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+PHASES = ("queue_wait", "throttle_wait", "pool_wait", "connect", "server", "body_read", "parse", "compare", "total")
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Тест "все тесты" в сводке по модели
+ALL_TESTS = "*"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль с линейной интерполяцией по отсортированному списку (как numpy.percentile)."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class LatencyRecorder:
+    """
+    Накопитель замеров: {(модель, тест, фаза): [секунды, ...]}.
+    Запись потокобезопасна.
+    """
+
+    def __init__(self):
+        self._samples: Dict[Tuple[str, str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, test: str, phase: str, seconds: Optional[float]) -> None:
+        """Добавляет замер фазы (None пропускается)."""
+        if seconds is None:
+            return
+        with self._lock:
+            self._samples.setdefault((model, test, phase), []).append(float(seconds))
+
+    def record_many(self, model: str, test: str, timings: Dict[str, Optional[float]]) -> None:
+        """Добавляет замеры нескольких фаз: {фаза: секунды}."""
+        for phase, seconds in timings.items():
+            self.record(model, test, phase, seconds)
+
+    def summary(self) -> List[Dict]:
+        """
+        Сводка по (модель, тест, фаза) и по (модель, все тесты, фаза).
+
+        :return: [{"model", "test", "phase", "count", "sum", "p50", "p90", "p99", "max"}, ...]
+        """
+        with self._lock:
+            samples = {key: list(values) for key, values in self._samples.items()}
+
+        groups: Dict[Tuple[str, str, str], List[float]] = {}
+        for (model, test, phase), values in samples.items():
+            groups.setdefault((model, test, phase), []).extend(values)
+            groups.setdefault((model, ALL_TESTS, phase), []).extend(values)
+
+        phase_order = {phase: n for n, phase in enumerate(PHASES)}
+        rows = []
+        for (model, test, phase), values in sorted(
+            groups.items(), key=lambda item: (item[0][0], item[0][1], phase_order.get(item[0][2], len(PHASES)), item[0][2])
+        ):
+            values.sort()
+            row = {"model": model, "test": test, "phase": phase, "count": len(values), "sum": sum(values)}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}"] = percentile(values, q)
+            row["max"] = values[-1]
+            rows.append(row)
+        return rows
+
+    def export_json(self, file_path: str) -> None:
+        """Сохраняет сводку в JSON-файл."""
+        _write_file(file_path, json.dumps({"phases": list(PHASES), "metrics": self.summary()}, ensure_ascii=False, indent=2))
+
+    def export_prometheus(self, file_path: str, prefix: str = "llm_tester") -> None:
+        """Сохраняет сводку в текстовом формате Prometheus (summary с квантилями и gauge с максимумом)."""
+        name = f"{prefix}_phase_seconds"
+        lines = [
+            f"# HELP {name} Задержка фазы обработки вопроса, сек.",
+            f"# TYPE {name} summary",
+        ]
+        max_lines = [
+            f"# HELP {name}_max Максимальная задержка фазы, сек.",
+            f"# TYPE {name}_max gauge",
+        ]
+        for row in self.summary():
+            labels = f'model="{_escape(row["model"])}",test="{_escape(row["test"])}",phase="{row["phase"]}"'
+            for q in QUANTILES:
+                lines.append(f'{name}{{{labels},quantile="{q}"}} {row[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f"{name}_sum{{{labels}}} {row['sum']:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {row['count']}")
+            max_lines.append(f"{name}_max{{{labels}}} {row['max']:.6f}")
+        _write_file(file_path, "\n".join(lines + max_lines) + "\n")
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки Prometheus."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_file(file_path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, file_path)
+
+
+# Общий накопитель замеров на время запуска main.py (задается через set_metrics)
+_metrics: Optional[LatencyRecorder] = None
+
+
+def set_metrics(metrics: Optional[LatencyRecorder]) -> None:
+    """Задает общий накопитель замеров. None - замеры не сохраняются."""
+    global _metrics
+    _metrics = metrics
+
+
+def get_metrics() -> Optional[LatencyRecorder]:
+    return _metrics
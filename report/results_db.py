@@ -0,0 +1,201 @@
+"""
+База результатов report/results.db (SQLite).
+
+- runs - прогоны теста: модель, тест, повтор, хэши конфигурации и файла теста, итоги;
+- answers - ответы на вопросы прогона: ответ модели, вердикт, токены, задержка, стоимость,
+  для дублированного запроса - какой запрос ответил первым и стоимость второго.
+
+Индексы по модели, тесту, хэшу конфигурации и хэшу файла теста позволяют выбирать
+результаты запросами, а в режиме --incremental находить прогоны с неизменными входными
+данными, чтобы не выполнять их повторно.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    model TEXT NOT NULL,
+    test TEXT NOT NULL,
+    repeat INTEGER NOT NULL,
+    config_hash TEXT NOT NULL,
+    test_hash TEXT NOT NULL,
+    questions INTEGER NOT NULL,
+    right INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    percent_correct INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    median_latency REAL,
+    median_ttft REAL,
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model);
+CREATE INDEX IF NOT EXISTS runs_test ON runs (test);
+CREATE INDEX IF NOT EXISTS runs_config_hash ON runs (config_hash);
+CREATE INDEX IF NOT EXISTS runs_test_hash ON runs (test_hash);
+CREATE INDEX IF NOT EXISTS runs_inputs ON runs (model, test, config_hash, test_hash, repeat);
+
+CREATE TABLE IF NOT EXISTS answers (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    number INTEGER NOT NULL,
+    question TEXT,
+    expected TEXT,
+    answer TEXT,
+    verdict INTEGER,
+    error TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cached_tokens INTEGER,
+    latency REAL,
+    cost REAL,
+    hedge TEXT,
+    hedge_cost REAL,
+    PRIMARY KEY (run_id, number)
+);
+"""
+
+# Столбцы, добавленные после создания схемы: {таблица: {столбец: тип}} (для баз прежних версий)
+_ADDED_COLUMNS = {
+    "answers": {"hedge": "TEXT", "hedge_cost": "REAL"},
+}
+
+# Поля прогона, которые возвращает find_run
+RUN_FIELDS = ("questions", "right", "errors", "percent_correct", "score", "median_latency", "median_ttft", "cost")
+
+
+def config_hash(config: dict) -> str:
+    """Хэш конфигурации набора (ключи сортируются, порядок в файле не важен)."""
+    text = json.dumps(config, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# {путь: ((mtime_ns, размер), хэш)}
+_file_hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+
+def file_hash(file_path: str) -> Optional[str]:
+    """
+    Хэш содержимого файла (None, если файла нет).
+    Пока файл не изменился, хэш берется из кэша.
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _file_hashes.get(file_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(file_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _file_hashes[file_path] = (stamp, digest)
+    return digest
+
+
+class ResultsDB:
+    """
+    Хранилище результатов. Все записи одного прогона сохраняются одной транзакцией.
+    Доступ потокобезопасен.
+    """
+
+    def __init__(self, file_path: str = "report/results.db"):
+        """
+        :param file_path: Путь к файлу базы
+        """
+        self.file_path = file_path
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._add_columns()
+        self._conn.commit()
+
+    def _add_columns(self) -> None:
+        """Добавляет в таблицы базы прежней версии недостающие столбцы."""
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def add_run(
+        self,
+        model: str,
+        test: str,
+        repeat: int,
+        config_hash: str,
+        test_hash: str,
+        totals: Dict,
+        answers: List[Dict],
+    ) -> int:
+        """
+        Сохраняет прогон и ответы на его вопросы.
+
+        :param totals: Итоги прогона (поля RUN_FIELDS)
+        :param answers: [{"number", "question", "expected", "answer", "verdict", "error",
+                          "prompt_tokens", "completion_tokens", "cached_tokens", "latency", "cost",
+                          "hedge", "hedge_cost"}, ...]
+        :return: id прогона
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"INSERT INTO runs (created_at, model, test, repeat, config_hash, test_hash, {', '.join(RUN_FIELDS)}) "
+                f"VALUES (?, ?, ?, ?, ?, ?, {', '.join('?' * len(RUN_FIELDS))})",
+                (datetime.now().isoformat(timespec="seconds"), model, test, repeat, config_hash, test_hash,
+                 *(totals.get(name) for name in RUN_FIELDS)),
+            )
+            run_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO answers (run_id, number, question, expected, answer, verdict, error, "
+                "prompt_tokens, completion_tokens, cached_tokens, latency, cost, hedge, hedge_cost) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, a["number"], a.get("question"), a.get("expected"), a.get("answer"),
+                     None if a.get("verdict") is None else int(a["verdict"]), a.get("error"),
+                     a.get("prompt_tokens"), a.get("completion_tokens"), a.get("cached_tokens"),
+                     a.get("latency"), a.get("cost"), a.get("hedge"), a.get("hedge_cost"))
+                    for a in answers
+                ],
+            )
+        return run_id
+
+    def find_run(self, model: str, test: str, config_hash: str, test_hash: str, repeat: int) -> Optional[Dict]:
+        """
+        Последний успешный прогон (без ошибок API) с такими же входными данными.
+
+        :return: {поле RUN_FIELDS: значение} или None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(RUN_FIELDS)} FROM runs "
+                "WHERE model = ? AND test = ? AND config_hash = ? AND test_hash = ? AND repeat = ? "
+                "AND errors = 0 AND questions > 0 ORDER BY id DESC LIMIT 1",
+                (model, test, config_hash, test_hash, repeat),
+            ).fetchone()
+        return dict(zip(RUN_FIELDS, row)) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Общая база результатов на время запуска main.py (задается через set_results_db)
+_db: Optional[ResultsDB] = None
+
+
+def set_results_db(db: Optional[ResultsDB]) -> None:
+    """Задает общую базу результатов. None - результаты в базу не сохраняются."""
+    global _db
+    _db = db
+
+
+def get_results_db() -> Optional[ResultsDB]:
+    return _db
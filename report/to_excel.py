@@ -1,6 +1,215 @@
+import os
+import threading
+from copy import copy
+from time import time, sleep
+from contextlib import contextmanager
 from openpyxl import load_workbook
 from datetime import datetime
 from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Столбцы отчета. Новые столбцы добавляются только в конец, чтобы старые файлы оставались совместимыми.
+REPORT_COLUMNS = [
+    "Дата/время", "Модель", "Тест", "Задержка", "% верно", "Балл", "Цена", "Комментарий",
+    "TTFT", "Токенов/сек",
+]
+
+
+@contextmanager
+def _file_lock(file_path: Path, timeout: float = 60.0, stale_after: float = 300.0):
+    """
+    Межпроцессная блокировка файла отчета через файл <отчет>.lock.
+    Блокировка старше stale_after секунд считается оставшейся от упавшего процесса и снимается.
+
+    :raises TimeoutError: Если блокировку не удалось получить за timeout секунд
+    """
+    lock_path = f"{file_path}.lock"
+    deadline = time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time() > deadline:
+                raise TimeoutError(f"Файл отчета '{file_path}' занят другим процессом ({lock_path})")
+            sleep(0.1)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+
+def _write_rows(file_path: Path, rows: List[list]) -> None:
+    """
+    Дописывает строки в конец существующей Excel-таблицы одним открытием и сохранением файла.
+    Файл сохраняется через временный файл, поэтому при сбое отчет не повреждается.
+    """
+    with _file_lock(file_path):
+        wb = load_workbook(file_path)
+        ws = wb.active  # Если нужна конкретная вкладка — wb["ИмяЛиста"]
+        if any(len(row) > 7 for row in rows):
+            _ensure_header(ws)
+        for row in rows:
+            ws.append(row)
+        tmp_path = file_path.with_name(file_path.name + ".tmp")
+        wb.save(tmp_path)
+        os.replace(tmp_path, file_path)
+
+
+def _ensure_header(ws) -> None:
+    """Дописывает заголовки недостающих столбцов (в стиле первого заголовка)."""
+    style = ws.cell(row=1, column=1)
+    for column, name in enumerate(REPORT_COLUMNS, start=1):
+        cell = ws.cell(row=1, column=column)
+        if cell.value is None:
+            cell.value = name
+            cell.font = copy(style.font)
+            cell.fill = copy(style.fill)
+            cell.alignment = copy(style.alignment)
+            cell.border = copy(style.border)
+
+
+def _make_row(
+    model: str,
+    test: str,
+    median_latency,
+    percent_correct,
+    score: float,
+    price: float,
+    ttft: Optional[float] = None,
+    tokens_per_second: Optional[float] = None,
+) -> list:
+    """
+    Запись в порядке столбцов отчета (REPORT_COLUMNS).
+    Метрики потокового режима записываются, только если они есть.
+    """
+    row = [
+        datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
+        model,
+        test,
+        median_latency,
+        percent_correct,
+        score,
+        price
+    ]
+    if ttft is not None or tokens_per_second is not None:
+        row += [None, ttft, tokens_per_second]  # Столбец "Комментарий" остается пустым
+    return row
+
+
+class ExcelReportSink:
+    """
+    Буфер записей отчета на время запуска.
+    Записи копятся в памяти и дописываются в XLSX-файл одним сохранением при flush()
+    (в конце запуска или периодически), а не открытием и сохранением файла на каждую запись.
+    Если файл сохранить не удалось (например, он открыт в Excel), записи остаются в буфере
+    до следующей попытки.
+
+    Запись, добавленная с hold=True, не сохраняется при flush(): ее сохраняет commit() вместе
+    с записью итогов прогона (база результатов, журнал). Так запись прогона, прерванного
+    до commit(), не попадает в отчет и не дублируется, когда прогон выполняется заново при resume.
+    """
+
+    def __init__(self, file_path: str = "report/report.xlsx"):
+        """
+        :param file_path: Путь к XLSX-файлу
+        """
+        self.file_path = Path(file_path)
+        self._pending: List[list] = []
+        self._held: Dict[int, list] = {}  # Записи, ожидающие commit(): {номер: запись}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Сохранения файла идут по очереди
+        self._added = 0
+        self.written = 0  # Сколько записей уже сохранено в файл
+
+    @property
+    def pending(self) -> int:
+        """Количество записей, еще не сохраненных в файл."""
+        return len(self._pending)
+
+    def add(self, model: str, test: str, median_latency, percent_correct, score: float, price: float,
+            ttft: Optional[float] = None, tokens_per_second: Optional[float] = None, hold: bool = False) -> int:
+        """
+        Добавляет запись в буфер (время записи фиксируется сейчас).
+
+        :param hold: Не сохранять запись до commit()
+        :return: Номер записи (для commit)
+        """
+        row = _make_row(model, test, median_latency, percent_correct, score, price, ttft, tokens_per_second)
+        with self._lock:
+            self._added += 1
+            if hold:
+                self._held[self._added - 1] = row
+            else:
+                self._pending.append(row)
+            return self._added - 1
+
+    def flush(self) -> int:
+        """
+        Сохраняет накопленные записи в файл.
+
+        :return: Количество сохраненных записей
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self, row: Optional[list] = None) -> int:
+        with self._lock:
+            rows, self._pending = self._pending + ([row] if row is not None else []), []
+        if not rows:
+            return 0
+        try:
+            _write_rows(self.file_path, rows)
+        except Exception as e:
+            print(f"Не удалось сохранить отчет '{self.file_path}': {e}. Записей в буфере: {len(rows)}")
+            with self._lock:
+                self._pending = rows + self._pending
+            return 0
+        self.written += len(rows)
+        return len(rows)
+
+    def commit(self, number: int, then: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Сохраняет в файл отложенную запись с номером number (вместе с остальными записями буфера)
+        и вызывает then(). Пока then() не выполнен, другие сохранения файла ждут, поэтому
+        завершение запуска не разрывает сохранение записи и запись итогов ее прогона.
+        Если файл сохранить не удалось, запись остается в буфере как обычная.
+
+        :return: True, если запись в файле
+        """
+        with self._flush_lock:
+            with self._lock:
+                row = self._held.pop(number)
+            saved = self._flush(row) > 0
+            if then is not None:
+                then()
+            return saved
+
+
+# Общий буфер отчета на время запуска main.py (задается через set_report_sink)
+_sink: Optional[ExcelReportSink] = None
+
+
+def set_report_sink(sink: Optional[ExcelReportSink]) -> None:
+    """Задает общий буфер отчета. None - записывать каждую запись сразу в файл."""
+    global _sink
+    _sink = sink
+
+
+def get_report_sink() -> Optional[ExcelReportSink]:
+    return _sink
+
 
 def append_record_to_excel(
     model: str,
@@ -9,10 +218,15 @@ def append_record_to_excel(
     percent_correct,
     score: float,
     price: float,
-    file_path: str = "report/report.xlsx"
-) -> None:
+    file_path: str = "report/report.xlsx",
+    ttft: Optional[float] = None,
+    tokens_per_second: Optional[float] = None,
+    hold: bool = False,
+) -> Optional[int]:
     """
     Добавляет запись в конец существующей Excel-таблицы, не изменяя стили и формат столбцов.
+    Если задан общий буфер отчета для этого файла, запись попадает в буфер
+    и сохраняется вместе с остальными при его сбросе.
 
     :param model: Название модели
     :param test: Название теста или его идентификатор
@@ -21,21 +235,14 @@ def append_record_to_excel(
     :param score: Числовой балл
     :param price: Цена за тест
     :param file_path: Путь к XLSX-файлу
+    :param ttft: Медианное время до первого токена (режим stream)
+    :param tokens_per_second: Медианная скорость генерации, токенов/сек (режим stream)
+    :param hold: Запись в общем буфере сохраняется только по ExcelReportSink.commit()
+    :return: Номер записи в общем буфере (None - запись уже сохранена в файл)
     """
-    file_path = Path(file_path)  # Загружаем существующий файл
-    wb = load_workbook(file_path)
-    ws = wb.active  # Если нужна конкретная вкладка — wb["ИмяЛиста"]
-
-    # Формируем запись: дата/время, модель, тест, балл
-    ws.append([
-        datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
-        model,
-        test,
-        median_latency,
-        percent_correct,
-        score,
-        price
-    ])
+    if _sink is not None and _sink.file_path == Path(file_path):
+        return _sink.add(model, test, median_latency, percent_correct, score, price, ttft, tokens_per_second, hold)
 
-    # Сохраняем файл
-    wb.save(file_path)
+    row = _make_row(model, test, median_latency, percent_correct, score, price, ttft, tokens_per_second)
+    _write_rows(Path(file_path), [row])
+    return None
@@ -0,0 +1,163 @@
+"""
+Фоновая запись детальных логов моделей (result/<модель>.txt).
+
+Вместо открытия и закрытия файла на каждую запись тексты ставятся в очередь,
+а отдельный поток держит по одному буферизованному файлу на модель и дописывает
+в него тексты в порядке поступления. Каждый вызов write() попадает в файл целиком,
+поэтому блоки параллельно выполняемых вопросов не перемешиваются.
+"""
+import os
+import queue
+import atexit
+import threading
+from typing import Dict, Optional, TextIO, Tuple
+
+
+def log_file_name(model: str) -> str:
+    """Имя файла лога модели ("/" и ":" префикса провайдера недопустимы в именах файлов)."""
+    return f"{model.replace("/", "_").replace(":", "_")}.txt"
+
+
+class ResultLogWriter:
+    """
+    Писатель логов с фоновым потоком.
+
+    Файлы сбрасываются на диск, когда очередь пуста больше flush_interval секунд,
+    по flush() и при закрытии. Если задан max_bytes, файл, превысивший этот размер,
+    переименовывается в <модель>.1.txt (старые копии сдвигаются до backup_count),
+    и запись продолжается в новый файл.
+    """
+
+    def __init__(
+        self,
+        directory: str = "result",
+        max_bytes: Optional[int] = None,
+        backup_count: int = 5,
+        buffer_size: int = 64 * 1024,
+        flush_interval: float = 1.0,
+    ):
+        """
+        :param directory: Папка логов
+        :param max_bytes: Размер файла для ротации, байт (None - без ротации)
+        :param backup_count: Сколько старых копий хранить при ротации
+        :param buffer_size: Размер буфера файла, байт
+        :param flush_interval: Через сколько секунд простоя сбрасывать буферы на диск
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backup_count = max(1, backup_count)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+        self._files: Dict[str, TextIO] = {}
+        self._sizes: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ResultLogWriter":
+        """Запускает фоновый поток записи."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="result-log", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def write(self, text: str, model: str) -> None:
+        """Ставит текст в очередь записи в лог модели (с переводом строки в конце)."""
+        if self._thread is None:
+            self.start()
+        self._queue.put((model, text + "\n"))
+
+    def flush(self) -> None:
+        """Дожидается записи всех текстов из очереди и сбрасывает буферы на диск."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(("", done))
+        done.wait()
+
+    def close(self) -> None:
+        """Записывает очередь, закрывает файлы и останавливает поток."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(("", None))
+        thread.join()
+        atexit.unregister(self.close)
+
+    # --- Фоновый поток --- #
+
+    def _run(self) -> None:
+        while True:
+            try:
+                model, item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush_files()
+                continue
+
+            if item is None:
+                self._close_files()
+                return
+            if isinstance(item, threading.Event):
+                self._flush_files()
+                item.set()
+                continue
+            try:
+                self._write(model, item)
+            except OSError as e:
+                print(f"Ошибка записи лога модели {model}: {e}")
+
+    def _write(self, model: str, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        f = self._file(model)
+        if self.max_bytes and self._sizes[model] and self._sizes[model] + size > self.max_bytes:
+            self._rotate(model)
+            f = self._file(model)
+        f.write(text)
+        self._sizes[model] += size
+
+    def _file(self, model: str) -> TextIO:
+        f = self._files.get(model)
+        if f is None:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, log_file_name(model))
+            f = open(path, "a", encoding="utf-8", buffering=self.buffer_size)
+            self._files[model] = f
+            self._sizes[model] = f.tell()
+        return f
+
+    def _rotate(self, model: str) -> None:
+        """<модель>.txt -> <модель>.1.txt, <модель>.1.txt -> <модель>.2.txt и т.д."""
+        self._files.pop(model).close()
+        path = os.path.join(self.directory, log_file_name(model))
+        base = path[:-len(".txt")]
+        oldest = f"{base}.{self.backup_count}.txt"
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for n in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{base}.{n}.txt"):
+                os.replace(f"{base}.{n}.txt", f"{base}.{n + 1}.txt")
+        os.replace(path, f"{base}.1.txt")
+
+    def _flush_files(self) -> None:
+        for f in self._files.values():
+            f.flush()
+
+    def _close_files(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        self._sizes.clear()
+
+
+# Общий писатель логов на время запуска main.py (задается через set_result_log)
+_writer: Optional[ResultLogWriter] = None
+
+
+def set_result_log(writer: Optional[ResultLogWriter]) -> None:
+    """Задает общий писатель логов для func.output. None - писать в файл сразу."""
+    global _writer
+    _writer = writer
+
+
+def get_result_log() -> Optional[ResultLogWriter]:
+    return _writer
@@ -0,0 +1,115 @@
+import json
+from dataclasses import dataclass, field, fields
+from typing import Dict, Optional
+
+
+@dataclass
+class RunSettings:
+    """
+    Датакласс для хранения общих настроек запуска main.py.
+    В отличие от configs/*.json, эти настройки не зависят от набора тестов
+    и действуют на весь запуск. Тут приведены настройки по умолчанию,
+    их можно переопределить в файле run_settings.json в корне проекта.
+    """
+    # Адрес API провайдера (например, http://127.0.0.1:8000/api/v1 для providers/mock_openrouter.py)
+    base_url: str = "https://openrouter.ai/api/v1"
+
+    # Дополнительные провайдеры (providers/registry.py): {"префикс": настройки}.
+    # Модель "local:llama3" в наборе тестов запрашивается у провайдера "local" как "llama3",
+    # настройки OpenAI-совместимого сервера - см. providers/openai_compat.py
+    providers: Dict[str, Dict] = field(default_factory=lambda: {
+        "local": {"type": "openai", "base_url": "http://127.0.0.1:8080/v1"},
+    })
+
+    # Пул соединений с провайдером
+    pool_limit: int = 100  # Всего одновременных соединений (0 - без ограничений)
+    pool_limit_per_host: int = 0  # Соединений к одному хосту (0 - без ограничений)
+    dns_cache_ttl: int = 300  # Время жизни DNS-кэша, сек
+    keepalive_timeout: float = 30.0  # Сколько держать простаивающее соединение, сек
+
+    # Каталог моделей
+    catalog_cache_path: str = "cache/models.json"  # Файл кэша каталога
+    catalog_ttl: float = 86400  # Время жизни кэша каталога, сек
+
+    # Планировщик заданий (модель, тест, повтор)
+    max_parallel_jobs: int = 4  # Всего одновременно выполняемых заданий
+    per_model_parallel_jobs: int = 1  # Одновременных заданий одной модели
+    model_parallel_jobs: Dict[str, int] = field(default_factory=dict)  # Индивидуально для моделей
+
+    # Повтор запросов при 429 и временных ошибках (5xx, обрыв соединения)
+    retry_max_retries: int = 3  # Повторов одного запроса (0 - не повторять)
+    retry_base_delay: float = 0.5  # Начальная задержка, сек (удваивается, со случайным разбросом)
+    retry_max_delay: float = 30.0  # Максимальная задержка, сек
+    retry_budget: Optional[int] = None  # Повторов на весь запуск (None - без ограничения)
+
+    # Дублирование медленных запросов к OpenRouter (providers/hedging.py)
+    hedge_percentile: Optional[float] = None  # Перцентиль недавних задержек модели для дубля (None - не дублировать)
+    hedge_min_samples: int = 10  # Сколько ответов модели нужно, чтобы начать дублировать
+    hedge_window: int = 100  # Сколько последних ответов модели учитывать
+    hedge_min_delay: float = 0.0  # Не отправлять дубль раньше, сек
+    hedge_budget: Optional[int] = None  # Дублирующих запросов на весь запуск (None - без ограничения)
+    hedge_routing: Dict[str, Dict] = field(default_factory=dict)  # {"id модели" или "*": extra_body.provider дубля}
+
+    # Ограничение частоты запросов, запросов в секунду (None - без ограничения)
+    rate_limit_rps: Optional[float] = None  # К одной модели по умолчанию
+    model_rate_limits: Dict[str, float] = field(default_factory=dict)  # {"id модели": запросов в секунду}
+    provider_rate_limits: Dict[str, float] = field(default_factory=dict)  # {"mistralai": запросов в секунду}
+    rate_limit_burst: Optional[float] = None  # Сколько запросов можно отправить подряд
+
+    # Модель-валидатор
+    judge_batch_size: int = 20  # Максимум проверок в одном запросе к валидатору
+    judge_batch_window: float = 0.05  # Сколько ждать других проверок перед отправкой, сек
+    judge_cache_path: str = "cache/judge_verdicts.json"  # Файл с запомненными вердиктами
+
+    # Кэш ответов провайдера
+    response_cache_mode: str = "off"  # off, record, replay, read-through
+    response_cache_path: str = "cache/responses"  # Папка кэша
+    response_cache_max_age_days: Optional[float] = None  # Максимальный возраст записи, дней
+    response_cache_max_size_mb: Optional[float] = None  # Максимальный размер кэша, МБ
+
+    # Отчет report/report.xlsx
+    report_flush_interval: Optional[float] = None  # Сохранять записи каждые N сек (None - только в конце)
+
+    # Метрики задержек по фазам (None - не сохранять)
+    metrics_json_path: Optional[str] = "report/metrics.json"
+    metrics_prometheus_path: Optional[str] = "report/metrics.prom"
+
+    # База результатов (report/results_db.py, None - не сохранять)
+    results_db_path: Optional[str] = "report/results.db"
+    incremental: bool = False  # Не выполнять задания с неизменными входными данными (или флаг --incremental)
+
+    # Расходы
+    budget_usd: Optional[float] = None  # Общий бюджет запуска, $ (None - без ограничения)
+    cost_preflight: bool = True  # Выводить оценку стоимости перед выполнением
+
+    # Журнал запуска для продолжения после сбоя (journal.py, None - не вести)
+    journal_path: Optional[str] = "cache/journal.jsonl"
+
+    # Детальные логи моделей result/<модель>.txt
+    result_log_max_mb: Optional[float] = None  # Размер файла для ротации, МБ (None - без ротации)
+    result_log_backups: int = 5  # Сколько старых файлов хранить при ротации
+
+
+def load_run_settings(file_path: str = "run_settings.json") -> RunSettings:
+    """
+    Загружает общие настройки запуска из JSON-файла.
+    Если файла нет, возвращаются настройки по умолчанию.
+    Неизвестные поля пропускаются с предупреждением.
+
+    :param file_path: Путь к JSON-файлу с настройками
+    :return: Объект RunSettings
+    """
+    settings = RunSettings()
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return settings
+
+    known = {f.name for f in fields(RunSettings)}
+    for key, value in data.items():
+        if key in known:
+            setattr(settings, key, value)
+        else:
+            print(f"Предупреждение: неизвестная настройка '{key}' в файле '{file_path}'.")
+    return settings
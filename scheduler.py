@@ -0,0 +1,167 @@
+"""
+Планировщик матрицы тестов.
+Разворачивает разрешенные наборы тестов в плоский список заданий
+(модель, тест, повтор) и выполняет их параллельно с общим ограничением
+и ограничениями на каждую модель.
+Адаптивные повторы (с досрочной остановкой и отсевом моделей) - в adaptive.py.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from tester_engine import IterationResult, run_test_iteration_async
+from report.results_db import ResultsDB, config_hash, file_hash
+from journal import get_journal, job_key
+from budget import RunBudget
+
+
+@dataclass
+class Job:
+    """
+    Одно задание матрицы: один прогон одного теста на одной модели.
+    """
+    suite: str  # Заголовок набора, например "Набор тестов 1"
+    model: str
+    test: str
+    repeat: int  # Номер повтора, с 1
+    repeats: int  # Всего повторов
+    config: dict = field(default_factory=dict)
+    concurrency: Optional[int] = None  # Параллельность вопросов внутри теста
+    cost: float = 0.0  # Стоимость прогона, заполняется после выполнения
+    result: Optional[IterationResult] = None  # Итоги прогона, заполняются после выполнения
+    reused: bool = False  # Итоги взяты из базы результатов, прогон не выполнялся
+    cancelled: bool = False  # Задание отменено: бюджет исчерпан до его начала
+
+    @property
+    def title(self) -> str:
+        """Заголовок задания для консоли."""
+        repeat_header = f" (Повтор {self.repeat}/{self.repeats})" if self.repeats > 1 else ""
+        return f"Модель: {self.model}, Тест: {self.test}.md{repeat_header}"
+
+
+def expand_suite(
+    suite: str,
+    models: List[str],
+    tests: List[str],
+    repeats: int,
+    config: dict,
+    concurrency: Optional[int] = None,
+) -> List[Job]:
+    """
+    Разворачивает набор тестов в список заданий в порядке модели -> тесты -> повторы.
+    """
+    return [
+        Job(suite, model, test, i + 1, repeats, config, concurrency)
+        for model in models
+        for test in tests
+        for i in range(repeats)
+    ]
+
+
+class JobRunner:
+    """
+    Исполнитель заданий с общим ограничением параллельности и ограничениями на каждую модель.
+    Один исполнитель можно использовать из нескольких мест одновременно
+    (например, для фиксированных и адаптивных наборов) - ограничения общие.
+
+    Сначала задание занимает слот своей модели, затем общий слот,
+    поэтому ожидающие своей модели задания не занимают общие слоты.
+    Ошибка в одном задании не останавливает остальные, его стоимость остается 0.
+
+    Если задана база результатов (режим --incremental), задание, для которого в базе
+    есть успешный прогон с той же конфигурацией и тем же содержимым файла теста,
+    не выполняется: его итоги берутся из базы, а стоимость считается нулевой.
+
+    При продолжении прерванного запуска (--resume) задания, завершенные до сбоя,
+    не выполняются: их итоги и стоимость берутся из журнала запуска (journal.py).
+
+    Если задан бюджет (budget.py), расход каждого задания учитывается в бюджете его набора
+    и в общем бюджете; после исчерпания бюджета ожидающие задания отменяются.
+    """
+
+    def __init__(
+        self,
+        max_parallel: int = 4,
+        per_model_parallel: int = 1,
+        model_limits: Optional[Dict[str, int]] = None,
+        results_db: Optional[ResultsDB] = None,
+        budget: Optional[RunBudget] = None,
+    ):
+        """
+        :param max_parallel: Всего одновременно выполняемых заданий
+        :param per_model_parallel: Одновременных заданий одной модели по умолчанию
+        :param model_limits: Индивидуальные ограничения для моделей {модель: число}
+        :param results_db: База, из которой берутся итоги неизмененных заданий (None - выполнять все)
+        :param budget: Бюджеты запуска и наборов (None - без ограничения)
+        """
+        self.per_model_parallel = per_model_parallel
+        self.model_limits = model_limits or {}
+        self.results_db = results_db
+        self.reused = 0  # Сколько заданий взято из базы
+        self.resumed = 0  # Сколько заданий взято из журнала прерванного запуска
+        self.budget = budget
+        self.cancelled = 0  # Сколько заданий отменено из-за бюджета
+        self._global_semaphore = asyncio.Semaphore(max(1, max_parallel))
+        self._model_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _model_semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._model_semaphores:
+            limit = self.model_limits.get(model, self.per_model_parallel)
+            self._model_semaphores[model] = asyncio.Semaphore(max(1, limit))
+        return self._model_semaphores[model]
+
+    def _stored_result(self, job: Job) -> Optional[IterationResult]:
+        """Итоги прогона с теми же входными данными из базы (None - нужно выполнить)."""
+        if self.results_db is None:
+            return None
+        test_hash = file_hash(f"tests/{job.test}.md")
+        if test_hash is None:
+            return None
+        stored = self.results_db.find_run(job.model, job.test, config_hash(job.config), test_hash, job.repeat)
+        return IterationResult(**stored) if stored else None
+
+    async def run(self, job: Job) -> Job:
+        """Выполняет одно задание и заполняет его итоги."""
+        journal = get_journal()
+        journaled = journal.iteration(job_key(job.model, job.test, job.repeat, job.config)) if journal else None
+        if journaled is not None:
+            job.result = IterationResult(**journaled)
+            job.cost = job.result.cost  # Потрачено в прерванном запуске, учитывается в итогах
+            self.resumed += 1
+            print(f"\n--- Выполнено до сбоя, итоги из журнала. {job.title} ---")
+            return job
+
+        stored = self._stored_result(job)
+        if stored is not None:
+            job.result = stored
+            job.reused = True
+            self.reused += 1
+            print(f"\n--- Без изменений, итоги из базы. {job.title}: {stored.percent_correct}% верно, балл {stored.score} ---")
+            return job
+
+        async with self._model_semaphore(job.model):
+            async with self._global_semaphore:
+                guard = self.budget.guard(job.suite) if self.budget is not None else None
+                exhausted = guard.exhausted if guard is not None else None
+                if exhausted is not None:
+                    job.cancelled = True
+                    self.cancelled += 1
+                    print(f"\n--- Отменено (исчерпан бюджет '{exhausted.name}'). {job.title} ---")
+                    return job
+
+                print(f"\n--- Запуск. {job.title} ---")
+                try:
+                    job.result = await run_test_iteration_async(
+                        job.model, job.test, job.config, job.concurrency, job.repeat, guard
+                    )
+                    job.cost = job.result.cost
+                except Exception as e:
+                    print(f"Ошибка при выполнении ({job.title}): {e}")
+                print(f"--- Завершено. {job.title} ---")
+        return job
+
+    async def run_all(self, jobs: List[Job]) -> List[Job]:
+        """Выполняет задания параллельно. Возвращает тот же список (в исходном порядке)."""
+        await asyncio.gather(*(self.run(job) for job in jobs))
+        return jobs
+
@@ -1,106 +1,149 @@
 import json
 import asyncio
 from time import time
+from dataclasses import dataclass, replace
 from datetime import datetime
 from statistics import median
+from typing import Optional
 from tabulate import tabulate
 
-from func import get_section, output
-from report.check import compare
+from func import output
+from md_parser import QuestionAnswer, load_test_file
+from report.check import compare_answer
+from report.json_guard import JsonGuard
 from report.calc_ball import calculate_model_score
-from report.to_excel import append_record_to_excel
-from providers.open_router import openrouter_async
-from providers.open_router import get_model_details
-from comparison_settings import ComparisonSettings
+from report.to_excel import append_record_to_excel, get_report_sink
+from report.metrics import get_metrics
+from report.results_db import config_hash, file_hash, get_results_db
+from journal import get_journal, job_key
+from budget import BudgetGuard, estimate_question
+from providers.registry import get_registry
 
 
-def run_test_iteration(model: str, test_name: str, config: dict) -> float:
+@dataclass
+class IterationResult:
+    """
+    Итоги одного прогона теста.
+    Если тест не выполнялся (модель или файл не найдены), questions = 0.
+    """
+    cost: float = 0.0
+    questions: int = 0  # Выполнено вопросов
+    right: int = 0  # Правильных ответов
+    errors: int = 0  # Вопросов с ошибкой API
+    percent_correct: int = 0
+    score: int = 0
+    median_latency: float = 0.0
+    median_ttft: Optional[float] = None
+    interrupted: bool = False  # Прогон прерван (исчерпан бюджет), итогов нет
+
+    @property
+    def completed(self) -> bool:
+        """Прогон дал результат (был хотя бы один ответ модели)."""
+        return self.questions > self.errors and not self.interrupted
+
+
+def run_test_iteration(
+    model: str, test_name: str, config: dict, concurrency: int = None, repeat: int = 1,
+    budget: Optional[BudgetGuard] = None,
+) -> float:
     """
     Выполняет один полный тестовый прогон для одной модели и одного файла с тестами.
+    Синхронная обертка над run_test_iteration_async.
     Возвращает итоговую стоимость теста.
     """
+    return asyncio.run(run_test_iteration_async(model, test_name, config, concurrency, repeat, budget)).cost
+
+
+async def run_test_iteration_async(
+    model: str, test_name: str, config: dict, concurrency: int = None, repeat: int = 1,
+    budget: Optional[BudgetGuard] = None,
+) -> IterationResult:
+    """
+    Выполняет один полный тестовый прогон для одной модели и одного файла с тестами.
+    Вопросы теста отправляются модели параллельно, не более concurrency одновременно
+    (по умолчанию берется из поля "concurrency" конфигурации, иначе 1).
+    Проверка ответа идет вне этого ограничения: пока ответ на один вопрос
+    проверяется валидатором, модели уже задается следующий.
+    Результаты выводятся в порядке вопросов.
+    При "stream": true в параметрах дополнительно выводятся время до первого токена
+    и скорость генерации; в балле вместо полного времени ответа можно учитывать
+    время до первого токена (поле конфигурации "score": {"latency": "ttft"}).
+    Если задана база результатов (report/results_db.py), прогон и ответы на вопросы
+    сохраняются в нее с номером повтора repeat.
+    Если ведется журнал запуска (journal.py), каждый выполненный вопрос записывается в него,
+    а вопросы, уже записанные в журнал прерванного запуска, модели повторно не задаются.
+    Завершенным прогон отмечается в журнале вместе с сохранением его записи в отчет report.xlsx
+    и в базу результатов: прогон, прерванный раньше, не попадает ни в отчет, ни в базу.
+    Если задан бюджет (budget.py), перед каждым вопросом резервируется его оценочная стоимость
+    (при дублировании запросов - на два запроса);
+    вопросы, не поместившиеся в бюджет, не задаются, и прогон считается прерванным.
+    При "stream_guard": true в конфигурации ответ читается потоком и по мере получения
+    сверяется с формой эталонного JSON (report/json_guard.py); запрос прерывается, как только
+    ответ уже не может быть верным, и вопрос засчитывается как неверный с фактически полученными токенами.
+    Если запрос дублировался (providers/hedging.py), цена вопроса включает токены второго запроса,
+    а в логе и базе результатов отмечается, какой из запросов ответил первым.
+    Возвращает итоги прогона (стоимость, правильные ответы, балл).
+    """
     # --- Извлечение конфигурации ---
     param = config.get("param", {})
     response_format = config.get("response_format")
     extra_body = config.get("extra_body")
+    prompt_cache = bool(config.get("prompt_cache", False))
+    max_tokens = param.get("max_tokens")
+    stream_guard = bool(config.get("stream_guard", False))
+    if stream_guard:
+        param = {**param, "stream": True}
 
     date_time = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
 
     # --- ПАРАМЕТРЫ МОДЕЛИ ---
-    model_details = get_model_details(model)
+    # Провайдер выбирается по префиксу модели ("local:llama3"), без префикса - OpenRouter.
+    # Каталог загружается один раз за запуск, повторные обращения - поиск по индексу.
+    # Первая загрузка может идти по сети, поэтому не блокируем цикл событий.
+    provider, model_id = get_registry().resolve(model)
+    catalog = provider.catalog
+    model_details = await asyncio.to_thread(catalog.get, model_id)
     if model_details is None:
         print(f"Модель {model} не найдена. Пропускаем...")
-        return 0
-
-    price_input = float(model_details.get("pricing", {}).get("prompt", 0))
-    price_output = float(model_details.get("pricing", {}).get("completion", 0))
+        return IterationResult()
+
+    pricing = catalog.pricing(model_id)
+    price_input = pricing["prompt"]
+    price_output = pricing["completion"]
+    # Цены токенов промпта, прочитанных из кэша провайдера и записанных в него
+    # (если модель их не указывает - как у обычного ввода)
+    price_cache_read = pricing.get("input_cache_read", price_input)
+    price_cache_write = pricing.get("input_cache_write", price_input)
+
+    def token_price(tokens_input: int, tokens_cache_read: int, tokens_cache_write: int, tokens_output: int) -> float:
+        """Цена запроса: промпт без кэша, из кэша и записанный в кэш - каждый по своей цене."""
+        tokens_uncached = max(0, tokens_input - tokens_cache_read - tokens_cache_write)
+        return (
+            tokens_uncached * price_input
+            + tokens_cache_read * price_cache_read
+            + tokens_cache_write * price_cache_write
+            + tokens_output * price_output
+        )
 
     # --- РАЗБОР ТЕСТА ---
+    # Файл разбирается один раз и кэшируется, пока не изменится
     test_filename = f"{test_name}.md"
     try:
-        with open(f"tests/{test_filename}", "r", encoding="utf-8") as file:
-            test_content = file.read()
+        test_file = load_test_file(f"tests/{test_filename}")
     except FileNotFoundError:
         print(f"Файл теста 'tests/{test_filename}' не найден. Пропускаем...")
-        return 0
+        return IterationResult()
 
-    description = get_section(test_content, "Описание").strip()
-    role = get_section(test_content, "Роль").strip()
-    prompt = get_section(test_content, "Промпт")
+    description = test_file.description
+    role = test_file.role
+    prompt = test_file.prompt
 
     # Настройки сравнения элементов ответа модели
-    comparison_settings = ComparisonSettings()
-    settings = get_section(test_content, "Настройки")
-    try:
-        if settings:
-            for_numbers = float(get_section(settings, "Допуск при сравнении чисел", 2).strip())
-            if for_numbers:
-                comparison_settings.num_tolerance = float(for_numbers)
-    except:
-        pass
-
-    try:
-        for_strings_text = get_section(settings, "Сравнение ответа модели текстом", 2).strip()
-        if for_strings_text:
-            if for_strings_text.lower() == "модель":
-                comparison_settings.text_comparison_method = "model"
-            else:
-                _, threshold = for_strings_text.split()
-                comparison_settings.text_comparison_method = "similarity"  # Метод сравнения
-                comparison_settings.text_similarity_threshold = int(threshold)  # Процент похожести
-    except:
-        pass
+    comparison_settings = test_file.settings
 
-    try:
-        for_strings_dict = get_section(settings, "Сравнение строк в словаре", 2).strip()
-        if for_strings_dict:
-            if for_strings_dict.lower() == "модель":
-                comparison_settings.dict_str_comparison_method = "model"
-            else:
-                _, threshold = for_strings_dict.split()
-                comparison_settings.dict_str_comparison_method = "similarity"
-                comparison_settings.dict_str_similarity_threshold = int(threshold)
-    except:
-        pass
-
-    try:
-        for_string_list = get_section(settings, "Сравнение строк в списке", 2).strip()
-        if for_string_list:
-            if for_string_list.lower() == "модель":
-                comparison_settings.list_str_comparison_method = "model"
-            else:
-                _, threshold = for_string_list.split()
-                comparison_settings.list_str_comparison_method = "similarity"
-                comparison_settings.list_str_similarity_threshold = int(threshold)
-    except:
-        pass
-
-    # Создаем объект настроек сравнения
-    question_answer = get_section(test_content, "Тесты").strip()
-
-    if not question_answer:
+    if not test_file.questions:
         print(f"Тест '{test_name}' не содержит вопросов и ответов. Пропускаем...")
-        return 0
+        return IterationResult()
 
     # --- ВЫВОД ЗАГОЛОВКА ТЕСТА ---
     rows = [
@@ -114,103 +157,297 @@ def run_test_iteration(model: str, test_name: str, config: dict) -> float:
     table_str = tabulate(rows, tablefmt="outline")
     output(table_str, model)
 
-    # --- ИНИЦИАЛИЗАЦИЯ ПЕРЕМЕННЫХ ---
-    i = 1
-    exe_sum = 0
-    right_sum = 0
-    times_list = []
-    total_time_start = time()
-    total_tokens_input = 0
-    total_tokens_output = 0
-    total_price = 0
-
-    # --- ОСНОВНОЙ ЦИКЛ ПО ВОПРОСАМ ---
-    while True:
-        question = get_section(question_answer, f"Вопрос {i}", 2)
-        answer = get_section(question_answer, f"Ответ {i}", 2)
-        if not question:
-            break
-
-        question = question.strip()
-        comparison_settings.question = question  # Запоминаем вопрос
-
-        try:
-            answer = answer.strip()
-            dict_answer = json.loads(answer)
-        except:
-            dict_answer = None
-
-        # Запрос к модели
-        start_time = time()
-        result = asyncio.run(openrouter_async(
-            model=model,
-            role=role,
-            prompt=prompt + "\nВопрос:\n" + question,
-            param=param,
-            response_format=response_format,
-            extra_body=extra_body,
-        ))
+    # Количество одновременно выполняемых запросов к модели
+    if concurrency is None:
+        concurrency = config.get("concurrency", 1)
+    semaphore = asyncio.Semaphore(max(1, int(concurrency or 1)))
+
+    # Журнал запуска для продолжения после сбоя
+    journal = get_journal()
+    journal_key = job_key(model, test_name, repeat, config) if journal is not None else None
+
+    async def ask(item: QuestionAnswer) -> dict:
+        """
+        Задает модели один вопрос и проверяет ответ.
+        Возвращает словарь с результатом для последующего вывода по порядку.
+        """
+        number, question = item.number, item.question
+        answer = (item.answer or "").strip()
+        dict_answer = item.expected  # Эталон, заранее разобранный как JSON (или None)
+
+        if journal is not None:
+            stored = journal.question(journal_key, number)
+            if stored is not None:
+                return {**stored, "resumed": True}
+
+        # Отдельные настройки для каждого вопроса, т.к. вопросы выполняются параллельно
+        question_settings = replace(comparison_settings, question=question)
+        guard = JsonGuard(dict_answer) if stream_guard and dict_answer is not None else None
+
+        # Запрос к модели. Время замеряется только после получения слота,
+        # ожидание в очереди в задержку не входит. Слот освобождается до проверки ответа.
+        # Роль и промпт теста одинаковы для всех вопросов, вопрос передается отдельно,
+        # чтобы при prompt_cache неизменная часть кэшировалась у провайдера.
+        queue_start = time()
+        async with semaphore:
+            # Резерв в бюджете: оценка ввода и max_tokens (или оценка) вывода,
+            # при дублировании запросов - на оба запроса
+            reserved = 0.0
+            if budget is not None:
+                tokens_input_estimate, tokens_output_estimate = estimate_question(role, prompt, question, answer)
+                reserved = tokens_input_estimate * price_input + (max_tokens or tokens_output_estimate) * price_output
+                if provider.hedging():
+                    reserved *= 2
+                if not await budget.reserve(reserved):
+                    return {"number": number, "question": question, "expected": answer, "budget_exceeded": True}
+
+            start_time = time()
+            result = await provider.chat(
+                model=model_id,
+                role=role,
+                prompt=prompt + "\nВопрос:\n",
+                suffix=question,
+                cache_prompt=prompt_cache,
+                param=param,
+                response_format=response_format,
+                extra_body=extra_body,
+                guard=guard,
+            )
+            response_time = time() - start_time
 
         if "error" in result:
-            error_message = result["error"]
-            print(f"Вопрос {i} - ОШИБКА API: {error_message}")
-            error_text = f"Вопрос {i}:\n{question}\n\nОШИБКА API: {error_message}"
-            output(error_text, model)
-            i += 1
-            exe_sum += 1
-            continue
+            if budget is not None:
+                budget.settle(reserved, 0.0)
+            return {"number": number, "question": question, "expected": answer, "error": result["error"]}
 
-        response_time = time() - start_time
-        times_list.append(response_time)
+        # Время, замеренное провайдером (для ответа из кэша - исходное время ответа)
+        response_time = result.get("latency", response_time)
         tokens_input = result.get("prompt_tokens", 0)
         tokens_output = result.get("completion_tokens", 0)
-        total_tokens_input += tokens_input
-        total_tokens_output += tokens_output
-        price = tokens_input * price_input + tokens_output * price_output
-        total_price += price
-
-        print(f"Вопрос {i}", end=" - ")
-        text = f"Вопрос {i}:\n{question}\n"
-        if dict_answer is not None:
+        tokens_cache_read = result.get("cached_tokens", 0)
+        tokens_cache_write = result.get("cache_write_tokens", 0)
+        aborted = result.get("aborted")
+        if aborted and not tokens_input:
+            # В прерванном потоке usage не приходит - токены промпта оцениваются по длине текста
+            tokens_input = estimate_question(role, prompt, question, answer)[0]
+        price = token_price(tokens_input, tokens_cache_read, tokens_cache_write, tokens_output)
+        # Дублирующий запрос (providers/hedging.py): токены второго запроса - по тем же ценам
+        hedge = result.get("hedge")
+        hedge_cost = 0.0
+        if hedge is not None:
+            hedge_cost = token_price(
+                hedge["prompt_tokens"], hedge.get("cached_tokens", 0),
+                hedge.get("cache_write_tokens", 0), hedge["completion_tokens"],
+            )
+            price += hedge_cost
+        if budget is not None:
+            budget.settle(reserved, price)
+
+        text = f"Вопрос {number}:\n{question}\n"
+        compare_start = time()
+        if aborted:
+            check = False
+            text += f"Ответ модели (прерван: {aborted}):\n" + result.get("answer", "")
+        elif dict_answer is not None:
             try:
                 dict_result = json.loads(result.get("answer", "{{}}"))
-                check = compare(dict_answer, dict_result, comparison_settings)  # Проверка ответа
+                check = await compare_answer(dict_answer, dict_result, question_settings)
                 text += "Ответ модели:\n" + json.dumps(dict_result, ensure_ascii=False, indent=4)
             except:
                 check = False
                 text += "Ответ модели:\n" + result.get("answer", "{{}}")
         else:
-            check = compare(answer, result.get("answer", ""), comparison_settings)
+            check = await compare_answer(answer, result.get("answer", ""), question_settings)
             text += "Ответ модели:\n" + result.get("answer", "{{}}")
         text += "\nПравильный ответ:\n" + answer
 
-        right = ("ВЕРНО" if check else "ОШИБКА")
-        output(text, model)
-        print(right, f" (Время: {response_time:.2f})")
+        # Замеры фаз для выгрузки метрик (report/metrics.py)
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.record_many(model, test_name, {
+                "queue_wait": start_time - queue_start,
+                **result.get("timings", {}),
+                "compare": time() - compare_start,
+                "total": response_time,
+            })
+
+        res = {
+            "number": number,
+            "question": question,
+            "expected": answer,
+            "text": text,
+            "answer": result.get("answer", ""),
+            "check": check,
+            "tokens_input": tokens_input,
+            "tokens_output": tokens_output,
+            "tokens_cache_read": tokens_cache_read,
+            "tokens_cache_write": tokens_cache_write,
+            "price": price,
+            "response_time": response_time,
+            "ttft": result.get("ttft"),
+            "inter_token_latency": result.get("inter_token_latency"),
+            "tokens_per_second": result.get("tokens_per_second"),
+            "cached": result.get("cached", False),
+            "retries": result.get("retries", 0),
+            "aborted": aborted,
+            "hedge": hedge["winner"] if hedge is not None else None,
+            "hedge_delay": hedge["delay"] if hedge is not None else None,
+            "hedge_cost": hedge_cost,
+            "hedge_estimated": hedge["estimated"] if hedge is not None else False,
+        }
+        if journal is not None:
+            journal.add_question(journal_key, number, res)
+        return res
+
+    # --- ИНИЦИАЛИЗАЦИЯ ПЕРЕМЕННЫХ ---
+    exe_sum = 0
+    right_sum = 0
+    error_sum = 0
+    budget_skipped = 0  # Вопросов, не заданных из-за бюджета
+    aborted_sum = 0  # Ответов, прерванных проверкой потока
+    hedged_sum = 0  # Вопросов с дублирующим запросом
+    hedge_won_sum = 0  # Из них дубль ответил первым
+    total_hedge_cost = 0.0
+    times_list = []
+    ttft_list = []
+    tokens_per_second_list = []
+    total_time_start = time()
+    total_tokens_input = 0
+    total_tokens_output = 0
+    total_tokens_cache_read = 0
+    total_tokens_cache_write = 0
+    total_price = 0
+    db_answers = []  # Ответы для базы результатов
+
+    # --- ВЫПОЛНЕНИЕ ВОПРОСОВ ---
+    results = await asyncio.gather(*(ask(item) for item in test_file.questions))
+
+    # --- ВЫВОД РЕЗУЛЬТАТОВ В ПОРЯДКЕ ВОПРОСОВ ---
+    for res in results:
+        number = res["number"]
+        exe_sum += 1
+
+        if res.get("budget_exceeded"):
+            error_sum += 1
+            budget_skipped += 1
+            print(f"Вопрос {number} - ПРОПУЩЕН (бюджет исчерпан)")
+            continue
+
+        if "error" in res:
+            error_message = res["error"]
+            error_sum += 1
+            print(f"Вопрос {number} - ОШИБКА API: {error_message}")
+            error_text = f"Вопрос {number}:\n{res['question']}\n\nОШИБКА API: {error_message}"
+            output(error_text, model)
+            db_answers.append({
+                "number": number, "question": res["question"], "expected": res["expected"], "error": error_message,
+            })
+            continue
+
+        response_time = res["response_time"]
+        times_list.append(response_time)
+        total_tokens_input += res["tokens_input"]
+        total_tokens_output += res["tokens_output"]
+        total_tokens_cache_read += res["tokens_cache_read"]
+        total_tokens_cache_write += res["tokens_cache_write"]
+        total_price += res["price"]
+
+        right = ("ВЕРНО" if res["check"] else "ОШИБКА")
+        print(f"Вопрос {number}", end=" - ")
+        source = ", из кэша" if res["cached"] else ", из журнала" if res.get("resumed") else ""
+        if res.get("aborted"):
+            aborted_sum += 1
+            source += f", прерван: {res['aborted']}"
+        if res.get("hedge"):
+            hedged_sum += 1
+            hedge_won_sum += res["hedge"] == "hedge"
+            total_hedge_cost += res["hedge_cost"]
+            source += ", дубль ответил первым" if res["hedge"] == "hedge" else ", с дублем"
+        print(right, f" (Время: {response_time:.2f}{source})")
 
         rows_q = [
             ["Проверка", right],
-            ["Токенов Ввод", tokens_input],
-            ["Токенов Вывод", tokens_output],
-            ["Цена запроса", f"{price:.10f}".rstrip('0').rstrip('.')],
+            ["Токенов Ввод", res["tokens_input"]],
+            ["Токенов Вывод", res["tokens_output"]],
+        ]
+        if res["tokens_cache_read"]:
+            rows_q.append(["Токенов Ввод из кэша", res["tokens_cache_read"]])
+        if res["tokens_cache_write"]:
+            rows_q.append(["Токенов Ввод в кэш", res["tokens_cache_write"]])
+        rows_q += [
+            ["Цена запроса", f"{res['price']:.10f}".rstrip('0').rstrip('.')],
             ["Время выполнения", f"{response_time:.2f}"],
         ]
+        if res["ttft"] is not None:
+            ttft_list.append(res["ttft"])
+            rows_q.append(["Время до первого токена", f"{res['ttft']:.2f}"])
+        if res["inter_token_latency"] is not None:
+            rows_q.append(["Между токенами, мс", f"{res['inter_token_latency'] * 1000:.1f}"])
+        if res["tokens_per_second"] is not None:
+            tokens_per_second_list.append(res["tokens_per_second"])
+            rows_q.append(["Токенов в секунду", f"{res['tokens_per_second']:.1f}"])
+        if res["retries"]:
+            rows_q.append(["Повторных запросов", res["retries"]])
+        if res.get("aborted"):
+            rows_q.append(["Прерван", res["aborted"]])
+        if res.get("hedge"):
+            winner = "дублирующий" if res["hedge"] == "hedge" else "основной"
+            rows_q.append(["Дублирующий запрос", f"через {res['hedge_delay']:.2f}, первым ответил {winner}"])
+            hedge_cost_str = f"{res['hedge_cost']:.10f}".rstrip('0').rstrip('.')
+            if res.get("hedge_estimated"):
+                hedge_cost_str += " (оценка: запрос отменен, учтен только промпт)"
+            rows_q.append(["Цена дубля", hedge_cost_str])
+        if res["cached"]:
+            rows_q.append(["Из кэша", "да"])
+        if res.get("resumed"):
+            rows_q.append(["Из журнала", "да"])
         table_str_q = tabulate(rows_q, tablefmt="outline", disable_numparse=True)
-        output(table_str_q, model)
+        # Вопрос и его таблица - одним блоком, чтобы не перемешались с записями параллельных заданий
+        output(res["text"] + "\n" + table_str_q, model)
 
-        i += 1
-        exe_sum += 1
-        if check:
+        if res["check"]:
             right_sum += 1
 
+        db_answers.append({
+            "number": number,
+            "question": res["question"],
+            "expected": res["expected"],
+            "answer": res["answer"],
+            "verdict": bool(res["check"]),
+            "prompt_tokens": res["tokens_input"],
+            "completion_tokens": res["tokens_output"],
+            "cached_tokens": res["tokens_cache_read"],
+            "latency": response_time,
+            "cost": res["price"],
+            "hedge": res.get("hedge"),
+            "hedge_cost": res.get("hedge_cost") if res.get("hedge") else None,
+        })
+
+    # Прогон, прерванный из-за бюджета, не попадает в отчет, базу и журнал как завершенный
+    if budget_skipped:
+        print(f"\nТест '{test_name}' для модели '{model}' прерван: бюджет исчерпан, пропущено вопросов - {budget_skipped}")
+        print(f"Цена - {total_price:.10f}".rstrip('0').rstrip('.'))
+        return IterationResult(
+            cost=total_price, questions=exe_sum, right=right_sum, errors=error_sum, interrupted=True,
+        )
+
     # --- ПОДВЕДЕНИЕ ИТОГОВ ---
     if exe_sum == 0:
         print("Не было выполнено ни одного вопроса.")
-        return 0
+        return IterationResult()
 
     percent_correct = int(right_sum / exe_sum * 100)
     median_latency = median(times_list) if times_list else 0
-    score = calculate_model_score(exe_sum, right_sum, median_latency)
+    median_ttft = median(ttft_list) if ttft_list else None
+    median_tokens_per_second = median(tokens_per_second_list) if tokens_per_second_list else None
+
+    # Настройки балла: какое время учитывать ("total" - полное время ответа, "ttft" - до первого токена)
+    score_settings = config.get("score") or {}
+    score_latency = median_latency
+    if score_settings.get("latency") == "ttft" and median_ttft is not None:
+        score_latency = median_ttft
+    limits = {k: score_settings[k] for k in ("t_min", "t_max") if k in score_settings}
+    score = calculate_model_score(exe_sum, right_sum, score_latency, **limits)
 
     text_total = "\nИТОГ:\n"
     rows_total = [
@@ -223,24 +460,82 @@ def run_test_iteration(model: str, test_name: str, config: dict) -> float:
         ["Цена", f"{total_price:.10f}".rstrip('0').rstrip('.')],
         ["Время выполнения", f"{time() - total_time_start:.2f}"],
     ]
+    if total_tokens_cache_read or total_tokens_cache_write:
+        rows_total.append(["Токенов Ввод из кэша", total_tokens_cache_read])
+        rows_total.append(["Токенов Ввод в кэш", total_tokens_cache_write])
+    if aborted_sum:
+        rows_total.append(["Прервано досрочно", aborted_sum])
+    if hedged_sum:
+        rows_total.append(["Дублирующих запросов", f"{hedged_sum} (ответили первыми: {hedge_won_sum})"])
+        rows_total.append(["Цена дублей", f"{total_hedge_cost:.10f}".rstrip('0').rstrip('.')])
+    if median_ttft is not None:
+        rows_total.append(["Медианное время до первого токена", f"{median_ttft:.2f}"])
+    if median_tokens_per_second is not None:
+        rows_total.append(["Медианная скорость, токенов/сек", f"{median_tokens_per_second:.1f}"])
     table_str_total = tabulate(rows_total, tablefmt="outline", disable_numparse=True)
     sep = "\n" + "/\\" * 40
     output(text_total + table_str_total + sep, model)
 
     print(f"\nИтоги по тесту '{test_name}' для модели '{model}':")
     print(f"Медианное время выполнения - {median_latency:.2f}")
+    if median_ttft is not None:
+        print(f"Медианное время до первого токена - {median_ttft:.2f}")
+    if median_tokens_per_second is not None:
+        print(f"Медианная скорость генерации - {median_tokens_per_second:.1f} токенов/сек")
+    if aborted_sum:
+        print(f"Прервано досрочно - {aborted_sum}")
+    if hedged_sum:
+        print(f"Дублирующих запросов - {hedged_sum}, ответили первыми - {hedge_won_sum}, "
+              f"цена дублей - {total_hedge_cost:.10f}".rstrip('0').rstrip('.'))
     print(f"Процент правильных ответов - {percent_correct}")
     print(f"Баллов за тест - {score}")
     print(f"Цена - {total_price:.10f}".rstrip('0').rstrip('.'))
 
-    append_record_to_excel(
+    report_row = append_record_to_excel(
         model=model,
         test=test_name,
         median_latency=median_latency,
         percent_correct=int(right_sum / exe_sum * 100),
         score=score,
-        price=total_price
+        price=total_price,
+        ttft=median_ttft,
+        tokens_per_second=median_tokens_per_second,
+        hold=journal is not None,
     )
 
-    return total_price
+    iteration = IterationResult(
+        cost=total_price,
+        questions=exe_sum,
+        right=right_sum,
+        errors=error_sum,
+        percent_correct=percent_correct,
+        score=score,
+        median_latency=median_latency,
+        median_ttft=median_ttft,
+    )
+
+    results_db = get_results_db()
+
+    def save_run():
+        if results_db is not None:
+            try:
+                results_db.add_run(
+                    model, test_name, repeat, config_hash(config), file_hash(f"tests/{test_filename}") or "",
+                    vars(iteration), db_answers,
+                )
+            except Exception as e:
+                print(f"Не удалось сохранить результаты в базу '{results_db.file_path}': {e}")
+        if journal is not None:
+            journal.add_iteration(journal_key, vars(iteration))
+
+    if report_row is not None and journal is not None:
+        # Запись отчета, прогон в базе и отметка в журнале сохраняются вместе в отдельном потоке:
+        # прерывание запуска не оставляет в отчете и базе прогон, который resume выполнит заново,
+        # а сбой после отметки в журнале - не теряет запись отчета
+        await asyncio.to_thread(get_report_sink().commit, report_row, save_run)
+        await asyncio.to_thread(journal.sync)  # Завершенный прогон - на диске до возврата итогов
+    else:
+        save_run()
+
+    return iteration
 
@@ -0,0 +1,5 @@
+"""Модульные тесты тестера: python -m pytest unit_tests"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,53 @@
+"""Адаптивные повторы (adaptive.py): остановка по доверительному интервалу."""
+import asyncio
+from itertools import count
+
+from adaptive import AdaptiveRepeats, run_adaptive_suite
+from tester_engine import IterationResult
+
+
+class FakeRunner:
+    """Исполнитель заданий: балл прогона задает функция score(модель, номер прогона)."""
+
+    def __init__(self, score):
+        self.score = score
+        self.runs = {}
+
+    async def run_all(self, jobs):
+        for job in jobs:
+            number = self.runs[job.model] = self.runs.get(job.model, 0) + 1
+            value = self.score(job.model, number)
+            job.result = IterationResult(questions=10, right=value // 10, percent_correct=value, score=value)
+        return jobs
+
+
+def run(runner, models, settings):
+    return asyncio.run(run_adaptive_suite(runner, "набор", models, ["тест"], settings, {}))
+
+
+def test_stable_scores_stop_at_min_repeats():
+    settings = AdaptiveRepeats(min_repeats=3, max_repeats=10, precision=5.0)
+    runner = FakeRunner(lambda model, n: 50)
+    run(runner, ["m"], settings)
+    assert runner.runs == {"m": 3}
+
+
+def test_noisy_scores_run_to_max_repeats():
+    settings = AdaptiveRepeats(min_repeats=2, max_repeats=6, precision=1.0)
+    runner = FakeRunner(lambda model, n: 0 if n % 2 else 100)
+    run(runner, ["m"], settings)
+    assert runner.runs == {"m": 6}
+
+
+def test_settings_are_not_changed():
+    settings = AdaptiveRepeats(min_repeats=1, max_repeats=1, precision=5.0)
+    run(FakeRunner(lambda model, n: 50), ["m"], settings)
+    assert (settings.min_repeats, settings.max_repeats) == (1, 1)
+
+
+def test_model_that_cannot_catch_up_is_eliminated():
+    settings = AdaptiveRepeats(min_repeats=3, max_repeats=10, precision=0.5)
+    noise = count()
+    runner = FakeRunner(lambda model, n: (90 if model == "лидер" else 10) + next(noise) % 3)
+    run(runner, ["лидер", "отстающая"], settings)
+    assert runner.runs["отстающая"] < runner.runs["лидер"] == 10
@@ -0,0 +1,43 @@
+"""Резервирование и учет расходов (budget.py)."""
+import asyncio
+
+from budget import Budget, BudgetGuard, RunBudget
+
+
+def test_reserve_and_settle():
+    async def run():
+        guard = BudgetGuard([Budget("набор", 1.0)])
+        assert await guard.reserve(0.6)
+        guard.settle(0.6, 0.4)
+        assert await guard.reserve(0.6)
+        return guard.budgets[0]
+
+    budget = asyncio.run(run())
+    assert budget.spent == 0.4
+    assert budget.reserved == 0.6
+
+
+def test_reserve_waits_for_running_questions():
+    """Резерв, не помещающийся из-за чужих резервов, ждет их замены фактической стоимостью."""
+    async def run():
+        guard = BudgetGuard([Budget("набор", 1.0)])
+        assert await guard.reserve(0.8)
+        waiting = asyncio.ensure_future(guard.reserve(0.5))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        guard.settle(0.8, 0.3)
+        return await waiting
+
+    assert asyncio.run(run())
+
+
+def test_question_that_does_not_fit_stops_the_budget():
+    async def run():
+        budgets = RunBudget(limit=1.0, suite_limits={"набор": 0.5})
+        guard = budgets.guard("набор")
+        assert not await guard.reserve(0.6)
+        return guard, budgets
+
+    guard, budgets = asyncio.run(run())
+    assert guard.exhausted is budgets.suites["набор"]
+    assert not budgets.total.stopped
@@ -0,0 +1,53 @@
+"""Сравнение ответов с эталоном (report/check.py)."""
+import asyncio
+
+import pytest
+
+import report.check
+from comparison_settings import ComparisonSettings
+from report.check import _compare_strings_by_similarity, _similarity_neighbours, compare_async
+
+
+def compare(control, test, **settings) -> bool:
+    return asyncio.run(compare_async(control, test, ComparisonSettings(**settings)))
+
+
+def test_list_matching_does_not_depend_on_order():
+    """Жадный перебор отдал бы 1.5 элементу 2.0, и для 1.0 пары бы не нашлось."""
+    assert compare([2.0, 1.0], [1.5, 3.0], num_tolerance=1)
+    assert compare([1.0, 2.0], [3.0, 1.5], num_tolerance=1)
+    assert not compare([1.0, 1.0], [1.5, 3.0], num_tolerance=1)
+
+
+def test_list_of_strings_by_similarity():
+    assert compare(["кошка", "собака"], ["собаки", "кошки"], list_str_similarity_threshold=70)
+    assert not compare(["кошка", "собака"], ["собаки", "собаки"], list_str_similarity_threshold=70)
+
+
+@pytest.mark.parametrize("threshold", [0, 60, 100])
+def test_similarity_matrix_agrees_with_pairwise_comparison(threshold):
+    control = ["", "a", "", "abc", "Кошка"]
+    test = ["", "x", "abc", "ab", "кошки"]
+    rows = list(range(len(control)))
+    expected = {
+        i: [j for j in range(len(test)) if _compare_strings_by_similarity(control[i], test[j], threshold)]
+        for i in rows
+    }
+    assert _similarity_neighbours(control, test, rows, threshold) == expected
+
+
+def test_judge_is_not_called_for_a_dict_that_already_failed(monkeypatch):
+    calls = []
+
+    async def fake_judge(control, answer, question):
+        calls.append(answer)
+        return True
+
+    monkeypatch.setattr(report.check, "_compare_by_model", fake_judge)
+    settings = {"dict_str_comparison_method": "model", "list_str_comparison_method": "model"}
+    assert not compare({"n": 1, "s": "текст"}, {"n": 2, "s": "другой"}, **settings)
+    assert not compare({"s": "текст", "items": [1, 2]}, {"s": "другой", "items": [1]}, **settings)
+    assert not compare({"s": "текст", "d": {"k": 1}}, {"s": "другой", "d": {}}, **settings)
+    assert calls == []
+    assert compare({"n": 1, "s": "текст"}, {"n": 1, "s": "другой"}, **settings)
+    assert calls == ["другой"]
@@ -0,0 +1,127 @@
+"""Журнал запуска (journal.py), отложенные записи отчета и продолжение прерванного запуска (--resume)."""
+import os
+import json
+import shutil
+import sqlite3
+import asyncio
+
+import pytest
+from openpyxl import load_workbook
+
+from benchmarks import e2e
+from benchmarks.micro import TEMPLATE_REPORT, make_test_markdown
+from journal import RunJournal
+from main import main_async
+from providers.mock_openrouter import start_mock_server
+from report.to_excel import ExcelReportSink
+from run_settings import RunSettings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def report_rows(path) -> int:
+    return load_workbook(path).active.max_row
+
+
+def test_journal_restores_questions_and_iterations(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path).start()
+    journal.add_question("k1", 1, {"answer": "a"})
+    journal.add_iteration("k2", {"score": 5})
+    journal.close(finished=False)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"type": "question", "key": "k1", "num')  # Строка, недописанная при сбое
+
+    restored = RunJournal(path, resume=True)
+    assert restored.found and not restored.finished
+    assert restored.question("k1", 1) == {"answer": "a"}
+    assert restored.question("k1", 2) is None
+    assert restored.iteration("k2") == {"score": 5}
+    assert restored.restored == 1
+
+
+def test_sync_writes_queue_to_disk(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path).start()
+    journal.add_iteration("k", {"score": 1})
+    journal.sync()
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["type"] for line in f] == ["start", "iteration"]
+    journal.close(finished=True)
+    assert RunJournal(path, resume=True).finished
+
+
+@pytest.fixture
+def report(tmp_path):
+    path = tmp_path / "report.xlsx"
+    shutil.copyfile(os.path.join(ROOT, TEMPLATE_REPORT), path)
+    return path
+
+
+def test_held_row_is_saved_only_by_commit(report):
+    sink = ExcelReportSink(str(report))
+    base = report_rows(report)
+    number = sink.add("m", "t", 1.0, 100, 50, 0.1, hold=True)
+    sink.add("m", "t2", 1.0, 100, 50, 0.1)
+    assert sink.flush() == 1
+    assert report_rows(report) == base + 1
+
+    done = []
+    assert sink.commit(number, lambda: done.append(True))
+    assert done == [True]
+    assert report_rows(report) == base + 2
+
+
+def test_failed_commit_keeps_row_and_calls_then(tmp_path):
+    sink = ExcelReportSink(str(tmp_path / "нет" / "report.xlsx"))
+    number = sink.add("m", "t", 1.0, 100, 50, 0.1, hold=True)
+    done = []
+    assert not sink.commit(number, lambda: done.append(True))
+    assert done == [True]
+    assert sink.pending == 1
+
+
+MODELS = [f"bench/m{n}" for n in range(6)]
+
+
+async def _run(resume: bool, cancel_after: float = None):
+    """Запуск на имитаторе OpenRouter; cancel_after - прервать через столько секунд (как Ctrl-C)."""
+    port = e2e._free_port()
+    latency = {model: {"latency": {"type": "fixed", "value": 0.3 if n % 2 else 0.02}} for n, model in enumerate(MODELS)}
+    server = await start_mock_server(port=port, config={"latency": {"type": "fixed", "value": 0.02}, "models": latency})
+    settings = RunSettings(
+        base_url=f"http://127.0.0.1:{port}/api/v1", catalog_cache_path="cache/models.json",
+        judge_cache_path="cache/judge.json", metrics_json_path=None, metrics_prometheus_path=None,
+        results_db_path="report/results.db", journal_path="cache/journal.jsonl", cost_preflight=False,
+    )
+    try:
+        task = asyncio.ensure_future(main_async(settings, resume=resume))
+        if cancel_after is None:
+            await task
+        else:
+            await asyncio.sleep(cancel_after)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    finally:
+        await server.cleanup()
+
+
+@pytest.mark.parametrize("cancel_after", [0.1, 0.35, 0.5, 0.7])
+def test_resume_after_interrupt_writes_each_run_once(tmp_path, monkeypatch, cancel_after):
+    """Прерванный и продолженный запуск дает в отчете и базе ровно по одной записи на прогон."""
+    for directory in ("tests", "configs", "report"):
+        os.makedirs(tmp_path / directory)
+    shutil.copyfile(os.path.join(ROOT, TEMPLATE_REPORT), tmp_path / "report" / "report.xlsx")
+    (tmp_path / "tests" / "bench_e2e.md").write_text(make_test_markdown(4), encoding="utf-8")
+    (tmp_path / "configs" / "bench.json").write_text(json.dumps(e2e.CONFIG), encoding="utf-8")
+    suite = e2e.SUITE.format(concurrency=2).replace("bench/model-a, bench/model-b", ", ".join(MODELS))
+    (tmp_path / "test_suites.md").write_text(suite, encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    base = report_rows("report/report.xlsx")
+
+    asyncio.run(_run(resume=False, cancel_after=cancel_after))
+    asyncio.run(_run(resume=True))
+
+    assert report_rows("report/report.xlsx") - base == len(MODELS)
+    with sqlite3.connect("report/results.db") as db:
+        assert db.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == len(MODELS)
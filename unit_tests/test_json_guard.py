@@ -0,0 +1,97 @@
+"""Потоковая проверка JSON-ответа (report/json_guard.py): ответ, который еще может быть верным, не прерывается."""
+import json
+import random
+import asyncio
+
+import pytest
+
+from comparison_settings import ComparisonSettings
+from report.check import compare_async
+from report.json_guard import JsonGuard
+
+EXPECTED = {"items": [{"value": 1, "unit": "м"}, {"value": 2.5, "unit": "кг"}], "ok": True, "name": "x"}
+
+
+def feed(expected, text: str, step: int):
+    """Причина прерывания при подаче ответа фрагментами по step символов (None - не прерван)."""
+    guard = JsonGuard(expected)
+    for i in range(0, len(text), step):
+        failure = guard.feed(text[i:i + step])
+        if failure:
+            return failure
+    return None
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(EXPECTED, ensure_ascii=False, indent=2),
+    json.dumps(EXPECTED),  # Кириллица экранирована (\u...)
+    '{"ok": false, "extra": [1, {"a": null}], "name": "y", '
+    '"items": [{"unit": "кг", "value": 7, "more": 1}, {"value": -1e3, "unit": ""}]}',
+    # Повторяющийся ключ: действует последнее значение, как в json.loads
+    '{"items": "нет", "items": [{"value": 1, "unit": "м"}, {"value": 2, "unit": "кг"}], "ok": true, "name": "x"}',
+    '{"items": [{"value": 1}, {"value": 2, "unit": "кг"}], "items": [{"value": 1, "unit": "м"}, {"value": 2, "unit": "кг"}], '
+    '"ok": true, "name": "x"}',
+    '{"items": [{"value": "1", "value": 1, "unit": "м"}, {"value": 2, "unit": "кг"}], "ok": true, "name": "x"}',
+])
+@pytest.mark.parametrize("step", [1, 2, 3, 7, 1000])
+def test_valid_answer_is_not_aborted(text, step):
+    assert feed(EXPECTED, text, step) is None
+
+
+def test_duplicate_key_checked_by_last_occurrence():
+    assert feed({"a": 1}, '{"a": "x", "a": 1}', 1) is None
+    assert feed({"a": 1}, '{"a": 1, "a": "x"}', 1) == "в ответе строка, в эталоне целое число"
+
+
+@pytest.mark.parametrize("text, reason", [
+    ('```json\n{}', "ответ не является JSON"),
+    ('{"items": {"a": 1}}', "в ответе объект, в эталоне список"),
+    ('{"ok": true, "name": "x"}', "нет ключей: items"),
+    ('[1]', "в ответе список, в эталоне объект"),
+    ('{"items": [{"value": 1, "unit": "м"}, {"value": 2.5, "unit": "кг"}], "ok": true, "name": "x"} ок',
+     "после JSON идет лишний текст"),
+])
+def test_mismatch_is_aborted(text, reason):
+    assert feed(EXPECTED, text, 3) == reason
+
+
+def test_too_long_list_is_aborted_before_the_end():
+    guard = JsonGuard([1, 2])
+    assert guard.feed("[1, 2, 3") is not None
+
+
+def _mutate(value, rng: random.Random):
+    if isinstance(value, dict):
+        result = {key: _mutate(item, rng) for key, item in value.items()}
+        if rng.random() < .3:
+            result["extra"] = rng.choice([1, "s", [1], {"a": None}])
+        if rng.random() < .1:
+            result.pop(rng.choice(list(result)))
+        items = list(result.items())
+        rng.shuffle(items)
+        return dict(items)
+    if isinstance(value, list):
+        result = [_mutate(item, rng) for item in value]
+        rng.shuffle(result)
+        if rng.random() < .1:
+            result.append(1)
+        return result
+    if rng.random() < .1:
+        return rng.choice([1, 1.5, "s", None, True, [], {}])
+    if isinstance(value, bool):
+        return rng.choice([True, False])
+    if isinstance(value, (int, float)):
+        return rng.choice([value, 1, 1.5])
+    return rng.choice(["a\"b", "\\", "юникод", ""])
+
+
+def test_never_aborts_an_answer_that_compares_equal():
+    """Ответ, признанный верным при сравнении, не прерывается ни при какой разбивке на фрагменты."""
+    settings = ComparisonSettings(
+        text_comparison_method="similarity", dict_str_similarity_threshold=0, list_str_similarity_threshold=0
+    )
+    rng = random.Random(1)
+    for _ in range(500):
+        text = json.dumps(_mutate(EXPECTED, rng), ensure_ascii=rng.random() < .5)
+        if asyncio.run(compare_async(EXPECTED, json.loads(text), settings)):
+            assert feed(EXPECTED, text, rng.randint(1, 7)) is None, text
@@ -0,0 +1,58 @@
+"""Пакетная проверка моделью-валидатором (report/judge.py)."""
+import json
+import asyncio
+
+import pytest
+
+import report.judge
+from report.judge import BatchJudge
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """Имитация запросов к валидатору: пакет - все вердикты true (JSON), одиночный запрос - "1"."""
+    sent = []
+
+    async def fake_openrouter(model, role, prompt, param=None, response_format=None, **kwargs):
+        sent.append(prompt)
+        if response_format:
+            return {"answer": json.dumps({"verdicts": [True] * prompt.count("Проверяемый ответ:")})}
+        return {"answer": "1"}
+
+    monkeypatch.setattr(report.judge, "openrouter_async", fake_openrouter)
+    return sent
+
+
+def test_batch_accepts_json_true(requests):
+    judge = BatchJudge(batch_size=3, batch_window=0.01)
+
+    async def check():
+        return await asyncio.gather(*(judge.verdict("q", "a", f"b{n}") for n in range(3)))
+
+    assert asyncio.run(check()) == [True, True, True]
+    assert len(requests) == 1
+
+
+def test_identical_checks_are_merged(requests):
+    judge = BatchJudge(batch_size=10, batch_window=0.01)
+
+    async def check():
+        return await asyncio.gather(judge.verdict("q", "a", "b"), judge.verdict("q", "a", "b"))
+
+    assert asyncio.run(check()) == [True, True]
+    assert len(requests) == 1
+
+
+def test_queue_works_across_event_loops(requests):
+    """
+    Синхронный compare() выполняет каждую проверку в своем asyncio.run: после пакета,
+    заполненного по размеру, таймер прежнего цикла отменен, но следующая проверка не зависает.
+    """
+    judge = BatchJudge(batch_size=2, batch_window=0.01)
+
+    async def pair():
+        return await asyncio.gather(judge.verdict("q", "a", "b"), judge.verdict("q", "a", "c"))
+
+    assert asyncio.run(pair()) == [True, True]
+    assert asyncio.run(asyncio.wait_for(judge.verdict("q", "a", "d"), 2)) is True
+    assert asyncio.run(asyncio.wait_for(pair(), 2)) == [True, True]  # Из кэша вердиктов